@@ -139,3 +139,132 @@ ZAMMAD_TOKEN = config('TOKEN_ZAMMAD', default='')
 ZAMMAD_URL = config('URL_ZAMMAD', default='')
 
 
+
+# Cache persistant des réponses LLM
+LLM_CACHE_ENABLED = config('LLM_CACHE_ENABLED', default=True, cast=bool)
+LLM_CACHE_TTL = config('LLM_CACHE_TTL', default=7 * 24 * 3600, cast=int)  # secondes
+LLM_CACHE_MAX_ENTRIES = config('LLM_CACHE_MAX_ENTRIES', default=5000, cast=int)
+
+# Client LLM asynchrone (appels parallèles des branches de l'analyse), concurrence: voir LLM_ASYNC_MAX_CONCURRENCY
+LLM_ASYNC_TIMEOUT = config('LLM_ASYNC_TIMEOUT', default=60, cast=int)  # secondes par appel
+
+# Limitation de débit LLM (partagée entre threads et workers) et backoff
+LLM_RATE_LIMIT_RPM = config('LLM_RATE_LIMIT_RPM', default=60, cast=int)
+LLM_RATE_LIMIT_TPM = config('LLM_RATE_LIMIT_TPM', default=100000, cast=int)
+LLM_RATE_LIMIT_BACKEND = config('LLM_RATE_LIMIT_BACKEND', default='file')  # file | memory
+LLM_RATE_LIMIT_STATE_DIR = config('LLM_RATE_LIMIT_STATE_DIR', default='/tmp')
+LLM_RATE_LIMIT_MAX_WAIT = config('LLM_RATE_LIMIT_MAX_WAIT', default=120, cast=int)  # secondes
+LLM_ESTIMATED_OUTPUT_TOKENS = config('LLM_ESTIMATED_OUTPUT_TOKENS', default=500, cast=int)
+LLM_RETRY_BASE_DELAY = config('LLM_RETRY_BASE_DELAY', default=1.0, cast=float)
+LLM_RETRY_MAX_DELAY = config('LLM_RETRY_MAX_DELAY', default=30.0, cast=float)
+
+# Disjoncteur du fournisseur LLM
+LLM_CIRCUIT_FAILURE_THRESHOLD = config('LLM_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+LLM_CIRCUIT_RECOVERY_TIMEOUT = config('LLM_CIRCUIT_RECOVERY_TIMEOUT', default=60, cast=int)  # secondes
+LLM_CIRCUIT_HALF_OPEN_MAX_CALLS = config('LLM_CIRCUIT_HALF_OPEN_MAX_CALLS', default=1, cast=int)
+
+# Backend LLM: cohere | local (gpt4all) | fake (déterministe, hors ligne)
+LLM_BACKEND = config('LLM_BACKEND', default='cohere')
+LLM_LOCAL_MODEL = config('LLM_LOCAL_MODEL', default='Meta-Llama-3-8B-Instruct.Q4_0.gguf')
+LLM_LOCAL_MODEL_PATH = config('LLM_LOCAL_MODEL_PATH', default='')
+LLM_LOCAL_MAX_TOKENS = config('LLM_LOCAL_MAX_TOKENS', default=1024, cast=int)
+LLM_FAKE_LATENCY = config('LLM_FAKE_LATENCY', default=0.5, cast=float)  # secondes
+LLM_FAKE_LATENCY_JITTER = config('LLM_FAKE_LATENCY_JITTER', default=0.1, cast=float)
+LLM_FAKE_ERROR_RATE = config('LLM_FAKE_ERROR_RATE', default=0.0, cast=float)  # 0..1
+LLM_FAKE_SEED = config('LLM_FAKE_SEED', default=42, cast=int)
+
+# Comptabilité et budget LLM
+LLM_DAILY_TOKEN_BUDGET = config('LLM_DAILY_TOKEN_BUDGET', default=0, cast=int)  # 0 = illimité
+# Prix par 1000 tokens (entrée, sortie) pour l'estimation de coût
+LLM_TOKEN_COSTS = {
+    'command-a-03-2025': (0.0025, 0.01),
+    'command-r7b-12-2024': (0.0000375, 0.00015),
+    'command-r-08-2024': (0.00015, 0.0006),
+}
+
+# Construction des prompts de tickets (budget de tokens et résumés d'articles)
+LLM_PROMPT_TOKEN_BUDGET = config('LLM_PROMPT_TOKEN_BUDGET', default=3000, cast=int)  # tokens du fil
+LLM_PROMPT_RECENT_ARTICLES = config('LLM_PROMPT_RECENT_ARTICLES', default=3, cast=int)  # gardés intégralement
+LLM_SUMMARY_MAX_WORDS = config('LLM_SUMMARY_MAX_WORDS', default=60, cast=int)
+LLM_TOKENIZER_ENCODING = config('LLM_TOKENIZER_ENCODING', default='cl100k_base')  # si tiktoken est installé
+
+# Routage des appels LLM par tâche: modèle, timeout (secondes) et tokens de sortie max
+LLM_DEFAULT_MODEL = config('LLM_DEFAULT_MODEL', default='command-a-03-2025')
+LLM_FAST_MODEL = config('LLM_FAST_MODEL', default='command-r7b-12-2024')
+LLM_TASK_ROUTES = {
+    'ticket_triage': {'model': LLM_FAST_MODEL, 'timeout': 20, 'max_tokens': 500},
+    'ticket_analysis': {'model': LLM_DEFAULT_MODEL, 'timeout': 60, 'max_tokens': 1000},
+    'ticket_reply': {'model': LLM_DEFAULT_MODEL, 'timeout': 45, 'max_tokens': 600},
+    'kb_article': {'model': LLM_DEFAULT_MODEL, 'timeout': 60, 'max_tokens': 1200},
+    'lead_justification': {'model': LLM_FAST_MODEL, 'timeout': 20, 'max_tokens': 250},
+    'lead_generation': {'model': LLM_DEFAULT_MODEL, 'timeout': 120, 'max_tokens': 4000},
+    'article_summary': {'model': LLM_FAST_MODEL, 'timeout': 20, 'max_tokens': 200},
+    'json_repair': {'model': LLM_FAST_MODEL, 'timeout': 20, 'max_tokens': 1500},
+}
+
+# Analyse de ticket: multi (tri sur la route rapide 'ticket_triage', puis réponse) |
+# single (classification + réponse en un appel sur la route 'ticket_analysis')
+TICKET_ANALYSIS_MODE = config('TICKET_ANALYSIS_MODE', default='multi')
+# Échéance de chaque branche parallèle (réponse, KB) en secondes, comptée à son départ,
+# et analyses simultanées attendues des requêtes HTTP (threads du serveur WSGI)
+TICKET_ANALYSIS_DEADLINE = config('TICKET_ANALYSIS_DEADLINE', default=90, cast=float)
+TICKET_ANALYSIS_WORKERS = config('TICKET_ANALYSIS_WORKERS', default=8, cast=int)
+TICKET_ANALYSIS_BRANCHES = 2
+
+# Analyse en masse (analyze_tickets_bulk): tickets analysés en parallèle et taille des lots entre checkpoints
+BULK_ANALYSIS_WORKERS = config('BULK_ANALYSIS_WORKERS', default=4, cast=int)
+BULK_ANALYSIS_BATCH_SIZE = config('BULK_ANALYSIS_BATCH_SIZE', default=50, cast=int)
+
+# Modèles locaux entraînés (fichiers .npz, hors dépôt)
+ML_MODELS_DIR = config('ML_MODELS_DIR', default=str(BASE_DIR / 'ml_models'))
+# Tri local (train_triage_classifier): le LLM n'est appelé pour le tri que sous ce seuil de confiance
+TRIAGE_CLASSIFIER_ENABLED = config('TRIAGE_CLASSIFIER_ENABLED', default=True, cast=bool)
+TRIAGE_CONFIDENCE_THRESHOLD = config('TRIAGE_CONFIDENCE_THRESHOLD', default=0.8, cast=float)
+TRIAGE_MODEL_PATH = config('TRIAGE_MODEL_PATH', default=str(Path(ML_MODELS_DIR) / 'triage_classifier.npz'))
+
+# Cache sémantique des réponses validées (build_answer_index): réutilisation au-dessus de ce seuil de similarité
+ANSWER_CACHE_ENABLED = config('ANSWER_CACHE_ENABLED', default=True, cast=bool)
+ANSWER_CACHE_THRESHOLD = config('ANSWER_CACHE_THRESHOLD', default=0.85, cast=float)
+ANSWER_CACHE_DIR = config('ANSWER_CACHE_DIR', default=ML_MODELS_DIR)
+
+# Analyses en arrière-plan (analyze/?async=1): workers dédiés, hors des workers HTTP
+ANALYSIS_JOB_WORKERS = config('ANALYSIS_JOB_WORKERS', default=4, cast=int)
+# Vieillissement dans la file: +1 point de pré-score d'urgence par N secondes d'attente
+ANALYSIS_QUEUE_AGING_SECONDS = config('ANALYSIS_QUEUE_AGING_SECONDS', default=60, cast=float)
+# Flux SSE d'un job: chaque flux ouvert occupe un thread du serveur WSGI. Il est fermé
+# après N secondes (le client poursuit par analysis_job_status) et leur nombre est limité
+ANALYSIS_JOB_STREAM_MAX_SECONDS = config('ANALYSIS_JOB_STREAM_MAX_SECONDS', default=120, cast=float)
+ANALYSIS_JOB_MAX_STREAMS = config('ANALYSIS_JOB_MAX_STREAMS', default=max(1, TICKET_ANALYSIS_WORKERS // 2), cast=int)
+
+# Appels simultanés du client LLM asynchrone: une place par branche de chaque analyse
+# simultanée (requêtes HTTP, analyse en masse, analyses en arrière-plan)
+LLM_ASYNC_MAX_CONCURRENCY = config(
+    'LLM_ASYNC_MAX_CONCURRENCY',
+    default=(TICKET_ANALYSIS_WORKERS + BULK_ANALYSIS_WORKERS + ANALYSIS_JOB_WORKERS) * TICKET_ANALYSIS_BRANCHES,
+    cast=int
+)
+
+# Pré-analyse des nouveaux tickets après synchronisation Zammad: analyses simultanées et tickets par synchronisation
+SYNC_PRE_ANALYSIS_ENABLED = config('SYNC_PRE_ANALYSIS_ENABLED', default=False, cast=bool)
+SYNC_PRE_ANALYSIS_CONCURRENCY = config('SYNC_PRE_ANALYSIS_CONCURRENCY', default=2, cast=int)
+SYNC_PRE_ANALYSIS_BUDGET = config('SYNC_PRE_ANALYSIS_BUDGET', default=20, cast=int)
+# sync_zammad_tickets attend ses pré-analyses N secondes, puis rend les jobs non démarrés aux processus durables
+SYNC_PRE_ANALYSIS_WAIT = config('SYNC_PRE_ANALYSIS_WAIT', default=600, cast=float)
+
+# Client HTTP Zammad: pool de connexions, timeouts (secondes) et retry avec backoff
+ZAMMAD_POOL_SIZE = config('ZAMMAD_POOL_SIZE', default=10, cast=int)
+ZAMMAD_CONNECT_TIMEOUT = config('ZAMMAD_CONNECT_TIMEOUT', default=5.0, cast=float)
+ZAMMAD_READ_TIMEOUT = config('ZAMMAD_READ_TIMEOUT', default=30.0, cast=float)
+ZAMMAD_MAX_RETRIES = config('ZAMMAD_MAX_RETRIES', default=3, cast=int)
+ZAMMAD_RETRY_BACKOFF = config('ZAMMAD_RETRY_BACKOFF', default=0.5, cast=float)
+ZAMMAD_MAX_RETRY_AFTER = config('ZAMMAD_MAX_RETRY_AFTER', default=30.0, cast=float)  # attente 429 max
+ZAMMAD_PAGE_WINDOW = config('ZAMMAD_PAGE_WINDOW', default=4, cast=int)  # pages demandées en parallèle (<= pool)
+
+# Synchronisation incrémentale Zammad (curseur updated_at, recherche côté serveur)
+# La syntaxe de requête (state_id:(...), updated_at:[... TO *]) exige Zammad avec Elasticsearch;
+# sans lui (erreur ou résultat vide), la synchronisation parcourt /tickets en entier.
+# États importés à la première synchronisation; ensuite toute modification est suivie (clôtures comprises)
+ZAMMAD_SYNC_STATE_IDS = [int(state_id) for state_id in config('ZAMMAD_SYNC_STATE_IDS', default='1,2,3').split(',')]
+ZAMMAD_SYNC_OVERLAP_SECONDS = config('ZAMMAD_SYNC_OVERLAP_SECONDS', default=120, cast=int)  # retard d'indexation
+# Résultats accessibles par recherche (index.max_result_window d'Elasticsearch); au-delà, relance depuis le curseur
+ZAMMAD_SEARCH_MAX_RESULTS = config('ZAMMAD_SEARCH_MAX_RESULTS', default=10000, cast=int)
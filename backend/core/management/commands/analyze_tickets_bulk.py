@@ -0,0 +1,70 @@
+# backend/core/management/commands/analyze_tickets_bulk.py
+from django.core.management.base import BaseCommand, CommandError
+from core.services.bulk_analysis import BulkAnalysisConflict, BulkAnalysisService
+
+
+class Command(BaseCommand):
+    help = "Analyse en masse des tickets sans analyse ou périmés (workers parallèles, reprise au checkpoint)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Analyses simultanées (défaut BULK_ANALYSIS_WORKERS)')
+        parser.add_argument('--batch-size', type=int, help='Tickets par lot entre deux checkpoints (défaut BULK_ANALYSIS_BATCH_SIZE)')
+        parser.add_argument('--limit', type=int, help='Nombre maximum de tickets à analyser')
+        parser.add_argument('--all', action='store_true', help='Réanalyser tous les tickets, même à jour')
+        parser.add_argument('--no-stale', action='store_true',
+                            help='Ignorer les tickets modifiés depuis leur dernière analyse')
+        parser.add_argument('--resume', nargs='?', type=int, const=0, metavar='JOB_ID',
+                            help='Reprendre un job interrompu (le dernier si aucun id)')
+
+    def handle(self, *args, **options):
+        service = BulkAnalysisService()
+        try:
+            job = self._reserve_job(service, options)
+        except BulkAnalysisConflict as e:
+            raise CommandError(f'{e} (job #{e.job.id})' if e.job else str(e))
+
+        job = service.run(job, on_batch=self._report)
+        self._summary(job)
+
+    def _reserve_job(self, service, options):
+        if options['resume'] is not None:
+            job = service.resumable_job(options['resume'] or None)
+            if job is None:
+                raise CommandError('Aucun job à reprendre')
+            if options['workers']:
+                job.workers = options['workers']
+            if options['batch_size']:
+                job.batch_size = options['batch_size']
+            self.stdout.write(f'Reprise du job #{job.id}: {job.processed}/{job.total} déjà traités')
+        else:
+            job = service.create_job(
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                include_stale=not options['no_stale'],
+                reanalyze_all=options['all'],
+            )
+            self.stdout.write(
+                f'Job #{job.id}: {job.total} tickets à analyser '
+                f'({job.workers} workers, lots de {job.batch_size})'
+            )
+        return job
+
+    def _summary(self, job):
+        summary = (
+            f'Job #{job.id} {job.get_status_display().lower()}: {job.succeeded} réussis, '
+            f'{job.failed} échecs sur {job.processed} tickets en {job.elapsed_seconds:.1f} s '
+            f'({job.tickets_per_minute} tickets/min)'
+        )
+        if job.status == job.Status.COMPLETED:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.ERROR(f'{summary}\n{job.last_error}'))
+            self.stdout.write(f'Reprendre avec: manage.py analyze_tickets_bulk --resume {job.id}')
+
+    def _report(self, job, batch):
+        self.stdout.write(
+            f'  lot de {batch["size"]} en {batch["seconds"]} s ({batch["tickets_per_minute"]} tickets/min, '
+            f'{batch["failed"]} échecs) | {job.processed}/{job.total} | '
+            f'moyenne {job.tickets_per_minute} tickets/min | checkpoint ticket {job.checkpoint_ticket_id}'
+        )
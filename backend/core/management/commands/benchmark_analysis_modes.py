@@ -0,0 +1,129 @@
+# backend/core/management/commands/benchmark_analysis_modes.py
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from core.models import LLMCallLog, Ticket, TicketAnalysis
+from core.services.clients import get_zammad_api
+from core.services.knowledge_base_service import KnowledgeBaseService
+from core.services.llm_client import LLMClient
+from core.services.ticket_analyzer import TicketAnalyzerService
+
+
+class _NoArticles:
+    """Remplace l'API Zammad pour mesurer uniquement le LLM"""
+
+    def get_ticket_articles(self, ticket_id):
+        return []
+
+
+class _NoAnswerCache:
+    def lookup(self, ticket, category=None):
+        return None
+
+
+class _BenchmarkAnalyzer(TicketAnalyzerService):
+    """Analyse sans écriture des analyses en base (les analyses et réponses validées restent
+    intactes) ni raccourci hors LLM (tri local, cache des réponses) qui fausserait la comparaison"""
+
+    def __init__(self, *args, with_kb: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.answer_cache = _NoAnswerCache()
+        self.with_kb = with_kb
+
+    def _local_triage(self, ticket):
+        return None
+
+    def _kb_call(self, ticket, parsed_analysis, use_cache=True):
+        if not self.with_kb:
+            return None
+        return super()._kb_call(ticket, parsed_analysis, use_cache)
+
+    def _save_analysis(self, ticket, parsed_analysis, ai_response, degraded=False, triage_source='llm'):
+        return TicketAnalysis(
+            ticket=ticket,
+            intention=parsed_analysis.get('intention'),
+            category=parsed_analysis.get('category'),
+            priority=parsed_analysis.get('priority'),
+            ai_response=ai_response,
+            triage_source=triage_source
+        )
+
+    @staticmethod
+    def _store_result(analysis_obj, fingerprint, result):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Compare latence et tokens de l'analyse de tickets en mode single (1 appel) et multi (2 appels)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=10, help='Nombre de tickets locaux analysés par mode')
+        parser.add_argument('--with-zammad', action='store_true',
+                            help='Récupérer les articles Zammad (mesure aussi le réseau Zammad)')
+        parser.add_argument('--with-kb', action='store_true',
+                            help='Inclure la suggestion KB (identique dans les deux modes)')
+
+    def handle(self, *args, **options):
+        tickets = list(Ticket.objects.order_by('-updated_at')[:options['tickets']])
+        if not tickets:
+            self.stdout.write(self.style.WARNING('Aucun ticket local: lancez sync_zammad_tickets'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'=== Analyse de {len(tickets)} tickets par mode (cache LLM, tri local et cache des réponses '
+            f'désactivés, analyses non enregistrées) ===\n'
+        ))
+        reports = {mode: self._run(mode, tickets, options) for mode in ('multi', 'single')}
+
+        for mode, report in reports.items():
+            self.stdout.write(
+                f"{mode:<7} latence moyenne {report['mean']:.0f} ms | p95 {report['p95']:.0f} ms | "
+                f"appels LLM {report['calls']} | tokens entrée {report['input_tokens']} | "
+                f"sortie {report['output_tokens']} | échecs {report['failures']}"
+            )
+
+        multi, single = reports['multi'], reports['single']
+        if single['mean'] and single['input_tokens'] + single['output_tokens']:
+            self.stdout.write(self.style.SUCCESS(
+                f"single vs multi: latence x{multi['mean'] / single['mean']:.2f}, "
+                f"tokens x{(multi['input_tokens'] + multi['output_tokens']) / (single['input_tokens'] + single['output_tokens']):.2f}"
+            ))
+
+    def _run(self, mode: str, tickets, options):
+        # Client dédié sans cache: chaque mode paie réellement ses appels
+        llm_client = LLMClient()
+        llm_client.cache = None
+        zammad_api = get_zammad_api() if options['with_zammad'] else _NoArticles()
+        analyzer = _BenchmarkAnalyzer(
+            llm_client=llm_client,
+            zammad_api=zammad_api,
+            kb_service=KnowledgeBaseService(llm_client),
+            mode=mode,
+            with_kb=options['with_kb']
+        )
+
+        last_log = LLMCallLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        timings = []
+        failures = 0
+        for ticket in tickets:
+            started = time.perf_counter()
+            result = analyzer.analyze_ticket(ticket, force=True)
+            timings.append((time.perf_counter() - started) * 1000)
+            if not result.get('success') or result.get('degraded'):
+                failures += 1
+
+        usage = LLMCallLog.objects.filter(id__gt=last_log).aggregate(
+            calls=Count('id'),
+            input_tokens=Sum('input_tokens'),
+            output_tokens=Sum('output_tokens')
+        )
+        timings.sort()
+        return {
+            'mean': statistics.mean(timings),
+            'p95': timings[max(0, int(len(timings) * 0.95) - 1)],
+            'calls': usage['calls'] or 0,
+            'input_tokens': usage['input_tokens'] or 0,
+            'output_tokens': usage['output_tokens'] or 0,
+            'failures': failures,
+        }
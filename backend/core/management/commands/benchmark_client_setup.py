@@ -0,0 +1,66 @@
+# backend/core/management/commands/benchmark_client_setup.py
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from core.services.clients import registry
+from core.services.knowledge_base_service import KnowledgeBaseService
+from core.services.llm_backends import create_llm_backend
+from core.services.llm_client import LLMClient
+from core.services.ticket_analyzer import TicketAnalyzerService
+from core.services.zammad_api import ZammadAPIService
+
+
+class Command(BaseCommand):
+    help = "Mesure le coût de construction des services par requête: clients recréés vs registre partagé"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Nombre de requêtes simulées')
+        parser.add_argument('--zammad-ticket', type=int, default=None,
+                            help='ID de ticket Zammad pour mesurer aussi un appel HTTP réel par requête')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        ticket_id = options['zammad_ticket']
+
+        self.stdout.write(self.style.SUCCESS('=== Coût de mise en place par requête ===\n'))
+        before = self._measure(iterations, self._build_per_request, ticket_id)
+        registry.reset()
+        after = self._measure(iterations, TicketAnalyzerService, ticket_id)
+
+        self._report('Avant (clients recréés)', before)
+        self._report('Après (registre partagé)', after)
+        if after['mean'] > 0:
+            self.stdout.write(self.style.SUCCESS(f"Gain moyen: x{before['mean'] / after['mean']:.1f}"))
+
+    def _build_per_request(self) -> TicketAnalyzerService:
+        """Reproduit l'ancien comportement: 2 LLMClient, 2 ZammadAPIService et un client
+        fournisseur neuf à chaque requête"""
+        backend = create_llm_backend()
+        kb_service = KnowledgeBaseService(LLMClient(backend), ZammadAPIService())
+        return TicketAnalyzerService(
+            llm_client=LLMClient(create_llm_backend()),
+            zammad_api=ZammadAPIService(),
+            kb_service=kb_service
+        )
+
+    def _measure(self, iterations: int, build, ticket_id):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            service = build()
+            if ticket_id is not None:
+                service.zammad_api.get_ticket_details(ticket_id)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return {
+            'mean': statistics.mean(timings),
+            'p50': timings[len(timings) // 2],
+            'p95': timings[int(len(timings) * 0.95) - 1],
+            'total': sum(timings),
+        }
+
+    def _report(self, label: str, stats):
+        self.stdout.write(
+            f"{label:<28} moyenne {stats['mean']:.3f} ms | p50 {stats['p50']:.3f} ms | "
+            f"p95 {stats['p95']:.3f} ms | total {stats['total']:.0f} ms"
+        )
@@ -0,0 +1,23 @@
+# backend/core/management/commands/build_answer_index.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.services.answer_cache import AnswerIndex
+
+
+class Command(BaseCommand):
+    help = "Construit l'index de similarité des réponses validées (cache sémantique des réponses)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-features', type=int, default=20000, help='Taille du vocabulaire TF-IDF')
+        parser.add_argument('--output-dir', default=settings.ANSWER_CACHE_DIR, help="Dossier de l'index")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = AnswerIndex.build(options['output_dir'], max_features=options['max_features'])
+        if not report['entries']:
+            self.stdout.write(self.style.WARNING('Aucune réponse validée (published=True): index vide'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Index construit en {time.perf_counter() - started:.1f} s: {report['entries']} réponses validées, "
+            f"{report['terms']} termes ({report['path']})"
+        ))
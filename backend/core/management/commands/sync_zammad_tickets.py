@@ -1,13 +1,37 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from core.services.analysis_jobs import AnalysisJobService
 from core.services.zammad_sync import ZammadSyncService
 
 class Command(BaseCommand):
-    help = 'Synchronise les tickets depuis Zammad'
+    help = 'Synchronise les tickets modifiés dans Zammad depuis la dernière exécution'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Ignore le curseur et resynchronise tous les tickets')
+        parser.add_argument(
+            '--pre-analysis-wait', type=float, default=None,
+            help='Attente des pré-analyses en secondes (défaut SYNC_PRE_ANALYSIS_WAIT)'
+        )
     
     def handle(self, *args, **options):
         sync_service = ZammadSyncService()
         try:
-            count = sync_service.sync_new_tickets()
-            self.stdout.write(f'{count} tickets synchronisés')
+            count = sync_service.sync_new_tickets(full=options['full'])
+            self.stdout.write(
+                f'{count} tickets synchronisés, {sync_service.updated_count} mis à jour '
+                f'({sync_service.fetched_count} transférés par Zammad)'
+            )
+            if sync_service.pre_analysis_jobs:
+                self._wait_pre_analysis(sync_service.pre_analysis_jobs, options['pre_analysis_wait'])
         except Exception as e:
             self.stdout.write(f'Erreur: {e}')
+    
+    def _wait_pre_analysis(self, job_ids, wait):
+        # Les workers de pré-analyse vivent dans ce processus: sortir tout de suite les tuerait
+        wait = settings.SYNC_PRE_ANALYSIS_WAIT if wait is None else wait
+        self.stdout.write(f'{len(job_ids)} tickets mis en pré-analyse, attente (au plus {wait:.0f}s)...')
+        outcome = AnalysisJobService().wait(job_ids, timeout=wait)
+        self.stdout.write(
+            f"Pré-analyse: {outcome['completed']} terminées, {outcome['failed']} en échec, "
+            f"{outcome['released']} rendues aux workers, {outcome['running']} interrompues"
+        )
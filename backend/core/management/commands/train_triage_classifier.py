@@ -0,0 +1,90 @@
+# backend/core/management/commands/train_triage_classifier.py
+import random
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from core.models import TicketAnalysis
+from core.services.text_vectors import ticket_text
+from core.services.triage_classifier import TARGETS, TriageClassifier
+
+
+class Command(BaseCommand):
+    help = "Entraîne le classifieur local de tri (catégorie, priorité) sur les analyses LLM enregistrées"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-samples', type=int, default=50, help="Nombre minimum d'analyses pour entraîner")
+        parser.add_argument('--max-samples', type=int, default=5000, help='Analyses les plus récentes utilisées')
+        parser.add_argument('--max-features', type=int, default=5000, help='Taille du vocabulaire TF-IDF')
+        parser.add_argument('--epochs', type=int, default=300, help='Itérations de descente de gradient')
+        parser.add_argument('--holdout', type=float, default=0.2,
+                            help='Part des analyses réservée à l\'évaluation (0 pour tout utiliser)')
+        parser.add_argument('--output', default=settings.TRIAGE_MODEL_PATH, help='Fichier du modèle (.npz)')
+
+    def handle(self, *args, **options):
+        # Seulement les classifications LLM réelles: ni tri local, ni analyse par défaut (LLM indisponible)
+        rows = list(
+            TicketAnalysis.objects
+            .filter(triage_source='llm')
+            .exclude(Q(analyzed_at__isnull=True) & Q(intention='Demande de support'))
+            .exclude(category='').exclude(priority='')
+            .select_related('ticket')
+            .order_by('-id')[:options['max_samples']]
+        )
+        if len(rows) < options['min_samples']:
+            raise CommandError(
+                f"{len(rows)} analyses disponibles, {options['min_samples']} requises (--min-samples)"
+            )
+
+        random.Random(42).shuffle(rows)
+        split = int(len(rows) * (1 - options['holdout'])) if options['holdout'] > 0 else len(rows)
+        train, test = rows[:split], rows[split:]
+
+        started = time.perf_counter()
+        classifier = self._train(train, options)
+        self.stdout.write(f'Entraînement sur {len(train)} analyses en {time.perf_counter() - started:.1f} s '
+                          f'({classifier.vectorizer.size} termes)')
+
+        if test:
+            self._evaluate(classifier, test)
+            # Modèle final entraîné sur toutes les analyses
+            classifier = self._train(rows, options)
+
+        classifier.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(f'Modèle enregistré: {options["output"]}'))
+
+    def _train(self, rows, options) -> TriageClassifier:
+        return TriageClassifier.train(
+            [ticket_text(row.ticket.title, row.ticket.body) for row in rows],
+            {target: [getattr(row, target) for row in rows] for target in TARGETS},
+            max_features=options['max_features'],
+            epochs=options['epochs'],
+        )
+
+    def _evaluate(self, classifier: TriageClassifier, rows):
+        """Précision globale et, au seuil configuré, part des tickets triés localement et leur précision"""
+        started = time.perf_counter()
+        predictions = classifier.predict_many([ticket_text(row.ticket.title, row.ticket.body) for row in rows])
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(rows)
+
+        threshold = settings.TRIAGE_CONFIDENCE_THRESHOLD
+        confident = [
+            (row, prediction) for row, prediction in zip(rows, predictions)
+            if min(prediction[target]['confidence'] for target in TARGETS) >= threshold
+        ]
+        for target in TARGETS:
+            correct = sum(prediction[target]['label'] == getattr(row, target) for row, prediction in zip(rows, predictions))
+            self.stdout.write(f'  {target:<9} précision {correct / len(rows):.1%} sur {len(rows)} analyses de test')
+
+        if confident:
+            correct = sum(
+                all(prediction[target]['label'] == getattr(row, target) for target in TARGETS)
+                for row, prediction in confident
+            )
+            self.stdout.write(
+                f'  seuil {threshold}: {len(confident) / len(rows):.1%} triés localement, '
+                f'précision {correct / len(confident):.1%}'
+            )
+        else:
+            self.stdout.write(self.style.WARNING(f'  seuil {threshold}: aucun ticket trié localement'))
+        self.stdout.write(f'  {elapsed_ms:.3f} ms par ticket')
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_llmcalllog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article_id', models.IntegerField(unique=True)),
+                ('ticket_zammad_id', models.IntegerField(db_index=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('summary', models.TextField()),
+                ('source_tokens', models.PositiveIntegerField(default=0)),
+                ('summary_tokens', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
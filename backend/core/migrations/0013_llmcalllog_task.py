@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_articlesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='llmcalllog',
+            name='task',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='llmcalllog',
+            index=models.Index(fields=['task', 'created_at'], name='core_llmcal_task_0d2e19_idx'),
+        ),
+    ]
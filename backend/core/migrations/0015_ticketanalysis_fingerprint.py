@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_bulkanalysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketanalysis',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ticketanalysis',
+            name='result',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
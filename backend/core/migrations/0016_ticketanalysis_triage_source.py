@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_ticketanalysis_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketanalysis',
+            name='triage_source',
+            field=models.CharField(default='llm', max_length=10),
+        ),
+    ]
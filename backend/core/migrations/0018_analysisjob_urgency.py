@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_analysisjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisjob',
+            name='expected_priority',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='analysisjob',
+            name='urgency_score',
+            field=models.FloatField(default=0),
+        ),
+    ]
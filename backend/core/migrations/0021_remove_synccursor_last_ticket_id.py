@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_analysisjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='synccursor',
+            name='last_ticket_id',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-17 06:58
+
+from django.db import migrations, models
+
+
+def fail_extra_running_jobs(apps, schema_editor):
+    # Jobs restés en cours (workers perdus): seul le plus récent garde ce statut
+    BulkAnalysisJob = apps.get_model('core', 'BulkAnalysisJob')
+    running = BulkAnalysisJob.objects.filter(status='running').order_by('-updated_at')
+    latest = running.first()
+    if latest is not None:
+        running.exclude(id=latest.id).update(status='failed', last_error='Worker perdu (plus de signe de vie)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_remove_synccursor_last_ticket_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_extra_running_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bulkanalysisjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='unique_running_bulk_analysis'),
+        ),
+    ]
@@ -49,6 +49,14 @@ class TicketAnalysis(models.Model):
     publish_mode = models.CharField(max_length=20, choices=PublishMode.choices, default=PublishMode.SUGGESTION)
     published = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Date de la dernière analyse: comparée à Ticket.updated_at pour repérer les analyses périmées
+    analyzed_at = models.DateTimeField(null=True, blank=True)
+    # Empreinte (titre, message, ids d'articles, version des prompts) du contenu analysé
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    # Dernier résultat complet d'analyze_ticket, renvoyé tant que l'empreinte ne change pas
+    result = models.JSONField(default=dict, blank=True)
+    # Origine de la classification: LLM ou classifieur local (exclu de son propre entraînement)
+    triage_source = models.CharField(max_length=10, default='llm')
 
 class Lead(models.Model):
     class LeadType(models.TextChoices):
@@ -151,3 +159,146 @@ class ClientLocation(models.Model):
     
     def __str__(self):
         return self.name
+
+class LLMCacheEntry(models.Model):
+    """Réponse LLM mise en cache, adressée par le hash (modèle, prompt système, prompt)"""
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    content = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_accessed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} - {self.key[:12]}"
+
+class LLMCallLog(models.Model):
+    """Un appel LLM: tokens, latence et service appelant (comptabilité et budget)"""
+    service = models.CharField(max_length=50, blank=True)
+    task = models.CharField(max_length=50, blank=True)
+    model = models.CharField(max_length=100)
+    backend = models.CharField(max_length=20)
+    input_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    success = models.BooleanField(default=True)
+    cached = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['service', 'created_at']),
+            models.Index(fields=['task', 'created_at']),
+        ]
+
+class ArticleSummary(models.Model):
+    """Résumé LLM d'un article Zammad, calculé une seule fois par article (et par contenu)"""
+    article_id = models.IntegerField(unique=True)
+    ticket_zammad_id = models.IntegerField(db_index=True)
+    content_hash = models.CharField(max_length=64)
+    summary = models.TextField()
+    source_tokens = models.PositiveIntegerField(default=0)
+    summary_tokens = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Article {self.article_id} (ticket {self.ticket_zammad_id})"
+
+class BulkAnalysisJob(models.Model):
+    """Analyse en masse des tickets sans analyse (ou périmés), reprise au dernier checkpoint"""
+    class Status(models.TextChoices):
+        PENDING = "pending", "En attente"
+        RUNNING = "running", "En cours"
+        COMPLETED = "completed", "Terminé"
+        FAILED = "failed", "Échec"
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    include_stale = models.BooleanField(default=True)
+    reanalyze_all = models.BooleanField(default=False)
+    workers = models.PositiveSmallIntegerField(default=4)
+    batch_size = models.PositiveIntegerField(default=50)
+    limit = models.PositiveIntegerField(null=True, blank=True)
+    # Plus grand id de Ticket dont le lot est entièrement enregistré
+    checkpoint_ticket_id = models.IntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    succeeded = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    # Temps d'exécution cumulé sur toutes les reprises (débit en tickets/minute)
+    elapsed_seconds = models.FloatField(default=0)
+    last_error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Un seul job en cours: deux lancements simultanés ne peuvent pas démarrer tous les deux
+            models.UniqueConstraint(
+                fields=['status'], condition=models.Q(status='running'), name='unique_running_bulk_analysis'
+            ),
+        ]
+
+    @property
+    def tickets_per_minute(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return round(self.processed / self.elapsed_seconds * 60, 1)
+
+    def __str__(self):
+        return f"Analyse en masse #{self.id} ({self.status})"
+
+
+class AnalysisJob(models.Model):
+    """Analyse d'un ticket exécutée en arrière-plan (endpoint d'analyse non bloquant)"""
+    class Status(models.TextChoices):
+        PENDING = "pending", "En attente"
+        RUNNING = "running", "En cours"
+        COMPLETED = "completed", "Terminé"
+        FAILED = "failed", "Échec"
+
+    ticket_zammad_id = models.IntegerField()
+    ticket = models.ForeignKey(Ticket, on_delete=models.SET_NULL, null=True, blank=True, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    force = models.BooleanField(default=False)
+    # Origine de la demande: api (agent) ou sync (pré-analyse après synchronisation)
+    source = models.CharField(max_length=20, default='api')
+    # Pré-score d'urgence (sans LLM) qui ordonne la file, et priorité attendue correspondante
+    urgency_score = models.FloatField(default=0)
+    expected_priority = models.CharField(max_length=20, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Rafraîchi par le processus qui détient le job (en file ou en cours); sans signe de vie, le job est perdu
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ticket_zammad_id', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Analyse du ticket {self.ticket_zammad_id} ({self.status})"
+
+
+class SyncCursor(models.Model):
+    """Position de la synchronisation incrémentale: dernier updated_at Zammad traité"""
+    name = models.CharField(max_length=50, unique=True)
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    # Tickets transférés lors de la dernière exécution (coût de la synchronisation)
+    last_fetched = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Curseur {self.name} ({self.last_updated_at})"
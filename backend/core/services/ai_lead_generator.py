@@ -1,16 +1,18 @@
 # backend/core/services/ai_lead_generator.py
 import logging
-import json
 from typing import List, Dict, Any
 from .llm_client import LLMClient
+from .clients import get_llm_client
+from .llm_json import StructuredOutputService
 
 logger = logging.getLogger(__name__)
 
 class AILeadGenerator:
     """Service pour générer des leads GTB/GTEB via IA"""
     
-    def __init__(self):
-        self.llm_client = LLMClient()
+    def __init__(self, llm_client: LLMClient = None):
+        self.llm_client = llm_client or get_llm_client()
+        self.structured = StructuredOutputService(self.llm_client)
     
     def generate_leads(self, countries: List[str] = None, sectors: List[str] = None) -> Dict[str, Any]:
         """Génère des leads commerciaux via IA"""
@@ -70,53 +72,33 @@ Réponds UNIQUEMENT avec un JSON valide au format suivant :
         try:
             logger.info(f"Génération de leads IA pour {countries}")
             
-            response = self.llm_client.call_api(
+            response = self.structured.call(
+                'lead_generation',
                 prompt=user_prompt,
                 system_prompt=system_prompt,
-                model="command-a-03-2025"
+                use_cache=False,  # chaque génération doit proposer de nouveaux leads
+                service='ai_lead_generator',
+                task='lead_generation'
             )
             
             if not response.get('success'):
-                return {
+                failure = {
                     'success': False,
                     'error': response.get('error', 'Erreur API'),
                     'leads': []
                 }
+                if response.get('parse_failed'):
+                    failure['raw_content'] = response.get('content', '')[:500]
+                return failure
             
-            content = response.get('content', '')
+            leads_data = response['data']['leads']
+            logger.info(f"IA a généré {len(leads_data)} leads")
             
-            # Parser le JSON
-            try:
-                # Nettoyer le contenu (enlever les markdown code blocks si présents)
-                content = content.strip()
-                if content.startswith('```json'):
-                    content = content[7:]
-                if content.startswith('```'):
-                    content = content[3:]
-                if content.endswith('```'):
-                    content = content[:-3]
-                content = content.strip()
-                
-                data = json.loads(content)
-                leads_data = data.get('leads', [])
-                
-                logger.info(f"IA a généré {len(leads_data)} leads")
-                
-                return {
-                    'success': True,
-                    'leads': leads_data,
-                    'total': len(leads_data)
-                }
-            
-            except json.JSONDecodeError as e:
-                logger.error(f"Erreur parsing JSON: {e}")
-                logger.error(f"Contenu reçu: {content[:500]}")
-                return {
-                    'success': False,
-                    'error': f'Erreur parsing JSON: {str(e)}',
-                    'leads': [],
-                    'raw_content': content[:500]
-                }
+            return {
+                'success': True,
+                'leads': leads_data,
+                'total': len(leads_data)
+            }
         
         except Exception as e:
             logger.error(f"Erreur génération leads IA: {e}")
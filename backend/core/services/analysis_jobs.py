@@ -0,0 +1,453 @@
+# backend/core/services/analysis_jobs.py
+"""
+Analyses de tickets en arrière-plan: file de jobs persistés en base, ordonnée par
+pré-score d'urgence et exécutée par des workers dédiés (ANALYSIS_JOB_WORKERS),
+hors des workers HTTP
+"""
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import AnalysisJob, Ticket
+from .ticket_analyzer import TicketAnalyzerService
+from .urgency import UrgencyScorer
+from .zammad_sync import ZammadSyncService
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de lecture de l'état d'un job par le flux SSE (secondes)
+JOB_POLL_INTERVAL = 0.5
+# Commentaire de maintien de connexion SSE toutes les N secondes sans changement
+JOB_KEEPALIVE_INTERVAL = 15
+# Signe de vie des jobs détenus par un processus (en file ou en cours), en secondes
+JOB_HEARTBEAT_INTERVAL = 15
+# Sans signe de vie depuis ce délai, un job actif est perdu (processus arrêté)
+JOB_STALE_AFTER = JOB_HEARTBEAT_INTERVAL * 4
+
+# Flux SSE ouverts dans ce processus: chacun occupe un thread WSGI jusqu'à sa fermeture
+_stream_slots = threading.BoundedSemaphore(settings.ANALYSIS_JOB_MAX_STREAMS)
+
+PRIORITY_ORDER = ['urgent', 'high', 'medium', 'low']
+
+
+class AnalysisScheduler:
+    """File à priorité des jobs: le worker libre prend le job au score effectif le plus
+    élevé (pré-score + vieillissement dans la file, pour ne pas affamer les jobs peu urgents).
+    `source_limits` plafonne les jobs simultanés par origine (ex. pré-analyse après sync).
+    `heartbeat` reçoit toutes les JOB_HEARTBEAT_INTERVAL secondes les ids des jobs détenus."""
+
+    def __init__(self, workers: int, aging_seconds: float, source_limits: Dict[str, int] = None,
+                 heartbeat: Callable[[List[int]], None] = None):
+        self.workers = workers
+        self.aging_seconds = aging_seconds
+        self.source_limits = source_limits or {}
+        self.heartbeat = heartbeat
+        self._pending: List[Dict[str, Any]] = []
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._running_by_source: Dict[str, int] = {}
+        self._running_ids = set()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        # Processus sur le point de s'arrêter: plus de reprise de jobs perdus
+        self.closed = False
+
+    def start_heartbeat(self):
+        with self._condition:
+            if self.heartbeat is None or self._heartbeat_thread is not None:
+                return
+            self._heartbeat_thread = threading.Thread(target=self._beat, name='analysis-job-heartbeat', daemon=True)
+            self._heartbeat_thread.start()
+
+    def held_job_ids(self) -> List[int]:
+        """Jobs en file ou en cours dans ce processus"""
+        with self._condition:
+            return [item['job_id'] for item in self._pending] + list(self._running_ids)
+
+    def submit(self, job_id: int, score: float, priority: str, run: Callable[[int], None], source: str = 'api'):
+        with self._condition:
+            self._pending.append({
+                'job_id': job_id, 'score': score, 'priority': priority, 'source': source,
+                'run': run, 'enqueued': time.monotonic()
+            })
+            self._start_workers()
+            self._condition.notify()
+
+    def close(self) -> List[int]:
+        """Vide la file et cesse de reprendre des jobs perdus; retourne les ids des jobs
+        qui n'avaient pas démarré"""
+        with self._condition:
+            self.closed = True
+            dropped, self._pending = self._pending, []
+            return [item['job_id'] for item in dropped]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            now = time.monotonic()
+            depth = {priority: 0 for priority in PRIORITY_ORDER}
+            oldest = {priority: 0.0 for priority in PRIORITY_ORDER}
+            for item in self._pending:
+                depth[item['priority']] = depth.get(item['priority'], 0) + 1
+                oldest[item['priority']] = max(oldest.get(item['priority'], 0.0), now - item['enqueued'])
+            return {
+                'workers': self.workers,
+                'running': self._running,
+                'running_by_source': dict(self._running_by_source),
+                'source_limits': dict(self.source_limits),
+                'queued': len(self._pending),
+                'queued_by_priority': depth,
+                'oldest_wait_seconds': {priority: round(value, 1) for priority, value in oldest.items()},
+            }
+
+    def _start_workers(self):
+        # Appelé sous le verrou: les workers démarrent avec le premier job
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(
+                target=self._work, name=f'analysis-job-{len(self._threads)}', daemon=True
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _eligible(self) -> List[Dict[str, Any]]:
+        """Jobs en attente dont l'origine n'a pas atteint son plafond"""
+        return [
+            entry for entry in self._pending
+            if self._running_by_source.get(entry['source'], 0) < self.source_limits.get(entry['source'], self.workers)
+        ]
+
+    def _next(self) -> Dict[str, Any]:
+        with self._condition:
+            while not self._eligible():
+                self._condition.wait()
+            now = time.monotonic()
+            item = max(
+                self._eligible(),
+                key=lambda entry: entry['score'] + (now - entry['enqueued']) / self.aging_seconds
+            )
+            self._pending.remove(item)
+            self._running += 1
+            self._running_ids.add(item['job_id'])
+            self._running_by_source[item['source']] = self._running_by_source.get(item['source'], 0) + 1
+            return item
+
+    def _work(self):
+        while True:
+            item = self._next()
+            try:
+                item['run'](item['job_id'])
+            except Exception as e:
+                logger.error(f"Worker d'analyse: job {item['job_id']} en erreur: {e}")
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._running_by_source[item['source']] -= 1
+                    self._running_ids.discard(item['job_id'])
+                    # Un job bloqué par le plafond de son origine peut maintenant partir
+                    self._condition.notify_all()
+
+    def _beat(self):
+        # Premier battement immédiat: reprise des jobs perdus au démarrage du processus
+        while True:
+            try:
+                self.heartbeat(self.held_job_ids())
+            except Exception as e:
+                logger.error(f"Signe de vie des jobs d'analyse: {e}")
+            time.sleep(JOB_HEARTBEAT_INTERVAL)
+
+
+_scheduler: Optional[AnalysisScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_analysis_scheduler() -> AnalysisScheduler:
+    """Ordonnanceur dédié aux analyses en arrière-plan, distinct du pool des branches de l'analyse.
+    Créé au premier usage dans le processus; son signe de vie reprend alors les jobs perdus."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AnalysisScheduler(
+                workers=settings.ANALYSIS_JOB_WORKERS,
+                aging_seconds=settings.ANALYSIS_QUEUE_AGING_SECONDS,
+                source_limits={'sync': settings.SYNC_PRE_ANALYSIS_CONCURRENCY},
+                heartbeat=AnalysisJobService.heartbeat
+            )
+        scheduler = _scheduler
+    scheduler.start_heartbeat()
+    return scheduler
+
+
+class AnalysisJobService:
+    """Mise en file, exécution et suivi des analyses en arrière-plan"""
+
+    ACTIVE_STATUSES = [AnalysisJob.Status.PENDING, AnalysisJob.Status.RUNNING]
+
+    def __init__(self, analyzer: Optional[TicketAnalyzerService] = None):
+        self._analyzer = analyzer
+        self.scorer = UrgencyScorer()
+
+    @property
+    def analyzer(self) -> TicketAnalyzerService:
+        # Créé dans le worker: la requête HTTP n'instancie aucun client
+        if self._analyzer is None:
+            self._analyzer = TicketAnalyzerService()
+        return self._analyzer
+
+    def enqueue(self, ticket_zammad_id: int, force: bool = False, user=None,
+                source: str = 'api') -> Tuple[AnalysisJob, bool]:
+        """Job d'analyse du ticket; un job actif récent pour le même ticket est réutilisé.
+        Retourne (job, créé)."""
+        active = self.active_job(ticket_zammad_id)
+        if active and not force:
+            return active, False
+
+        # Pré-score sur le ticket local s'il existe déjà (synchronisé), sans appel réseau
+        urgency = self.scorer.score(Ticket.objects.filter(zammad_id=ticket_zammad_id).first())
+        job = AnalysisJob.objects.create(
+            ticket_zammad_id=ticket_zammad_id,
+            force=force,
+            source=source,
+            urgency_score=urgency['score'],
+            expected_priority=urgency['priority'],
+            requested_by=user if user is not None and user.is_authenticated else None,
+            heartbeat_at=timezone.now()
+        )
+        # Soumis après le commit: le worker doit voir le job en base
+        transaction.on_commit(lambda: get_analysis_scheduler().submit(
+            job.id, job.urgency_score, job.expected_priority, self.run, source=job.source
+        ))
+        return job, True
+
+    @classmethod
+    def active_job(cls, ticket_zammad_id: int) -> Optional[AnalysisJob]:
+        """Job en attente ou en cours pour ce ticket, détenu par un processus vivant.
+        L'attente dans la file ne rend pas un job perdu: seul compte son signe de vie."""
+        get_analysis_scheduler()
+        return AnalysisJob.objects.filter(
+            ticket_zammad_id=ticket_zammad_id,
+            status__in=cls.ACTIVE_STATUSES,
+            heartbeat_at__gte=cls._stale_before()
+        ).first()
+
+    def wait(self, job_ids: List[int], timeout: float) -> Dict[str, int]:
+        """Attend la fin des jobs mis en file par ce processus (commande de courte durée,
+        dont les workers s'arrêtent avec elle). Passé `timeout`, les jobs pas encore démarrés
+        sont rendus aux processus durables (reprise des jobs perdus), comme ceux que ce
+        processus avait repris, et seuls ceux en cours sont encore attendus, au plus
+        `timeout` secondes."""
+        deadline = time.monotonic() + timeout
+        while self._unfinished(job_ids, self.ACTIVE_STATUSES) and time.monotonic() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+
+        released = 0
+        dropped = get_analysis_scheduler().close()
+        if dropped:
+            # Sans signe de vie, le job est adopté au prochain battement d'un autre processus
+            released = AnalysisJob.objects.filter(id__in=dropped, status=AnalysisJob.Status.PENDING).update(
+                heartbeat_at=None
+            )
+
+        deadline = time.monotonic() + timeout
+        while self._unfinished(job_ids, [AnalysisJob.Status.RUNNING]) and time.monotonic() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+
+        statuses = list(AnalysisJob.objects.filter(id__in=job_ids).values_list('status', flat=True))
+        return {
+            'completed': statuses.count(AnalysisJob.Status.COMPLETED),
+            'failed': statuses.count(AnalysisJob.Status.FAILED),
+            'released': released,
+            'running': statuses.count(AnalysisJob.Status.RUNNING),
+        }
+
+    @staticmethod
+    def _unfinished(job_ids: List[int], statuses: List[str]) -> bool:
+        return AnalysisJob.objects.filter(id__in=job_ids, status__in=statuses).exists()
+
+    @classmethod
+    def heartbeat(cls, job_ids: List[int]):
+        """Signe de vie des jobs détenus par ce processus, puis reprise des jobs perdus"""
+        try:
+            if job_ids:
+                AnalysisJob.objects.filter(id__in=job_ids, status__in=cls.ACTIVE_STATUSES).update(
+                    heartbeat_at=timezone.now()
+                )
+            cls.recover_lost_jobs()
+        finally:
+            connections.close_all()
+
+    @classmethod
+    def recover_lost_jobs(cls) -> Dict[str, int]:
+        """Jobs sans signe de vie (processus arrêté): ceux en file sont repris dans ce
+        processus, ceux interrompus en cours d'analyse sont marqués en échec"""
+        now = timezone.now()
+        lost = Q(heartbeat_at__lt=cls._stale_before()) | Q(heartbeat_at__isnull=True)
+        failed = AnalysisJob.objects.filter(lost, status=AnalysisJob.Status.RUNNING).update(
+            status=AnalysisJob.Status.FAILED,
+            error="Analyse interrompue (arrêt du worker)",
+            finished_at=now
+        )
+
+        resumed = 0
+        service = None
+        if get_analysis_scheduler().closed:
+            return {'resumed': resumed, 'failed': failed}
+        for job in AnalysisJob.objects.filter(lost, status=AnalysisJob.Status.PENDING).order_by('created_at'):
+            # Adoption atomique: un seul processus reprend un job perdu
+            adopted = AnalysisJob.objects.filter(
+                id=job.id, status=AnalysisJob.Status.PENDING, heartbeat_at=job.heartbeat_at
+            ).update(heartbeat_at=now)
+            if not adopted:
+                continue
+            service = service or cls()
+            get_analysis_scheduler().submit(
+                job.id, job.urgency_score, job.expected_priority, service.run, source=job.source
+            )
+            resumed += 1
+
+        if failed or resumed:
+            logger.warning(f"Jobs d'analyse perdus: {resumed} repris, {failed} marqués en échec")
+        return {'resumed': resumed, 'failed': failed}
+
+    def run(self, job_id: int):
+        """Exécute un job dans un worker du pool"""
+        try:
+            # Prise atomique: un job soumis deux fois (reprise concurrente) ne s'exécute qu'une fois
+            now = timezone.now()
+            claimed = AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.Status.PENDING).update(
+                status=AnalysisJob.Status.RUNNING, started_at=now, heartbeat_at=now
+            )
+            if not claimed:
+                logger.info(f"Job d'analyse {job_id} déjà pris ou terminé")
+                return
+            job = AnalysisJob.objects.get(id=job_id)
+
+            try:
+                # Ticket déjà synchronisé: pas d'aller-retour Zammad supplémentaire
+                ticket = (
+                    Ticket.objects.filter(zammad_id=job.ticket_zammad_id).first()
+                    or ZammadSyncService(self.analyzer.zammad_api).get_or_create_ticket(job.ticket_zammad_id)
+                )
+                job.ticket = ticket
+                result = self.analyzer.analyze_ticket(ticket, force=job.force)
+            except Exception as e:
+                logger.error(f"Job d'analyse {job.id} (ticket {job.ticket_zammad_id}): {e}")
+                result = {'success': False, 'error': str(e)}
+
+            job.result = result
+            job.error = '' if result.get('success') else result.get('error', '')
+            job.status = AnalysisJob.Status.COMPLETED if result.get('success') else AnalysisJob.Status.FAILED
+            job.finished_at = timezone.now()
+            job.save(update_fields=['ticket', 'result', 'error', 'status', 'finished_at'])
+            logger.info(
+                f"Job d'analyse {job.id} {job.status}: attente {self._duration_ms(job.created_at, job.started_at)} ms, "
+                f"exécution {self._duration_ms(job.started_at, job.finished_at)} ms"
+            )
+        except Exception as e:
+            logger.error(f"Job d'analyse {job_id} interrompu: {e}")
+        finally:
+            connections.close_all()
+
+    def events(self, job_id: int, poll_url: str, timeout: float = None) -> Iterator[Dict[str, Any]]:
+        """Événements SSE d'un job: 'status' à chaque changement d'état, puis 'done'
+        (résultat) ou 'error'. Un événement sans nom maintient la connexion.
+        Après `timeout` secondes (ANALYSIS_JOB_STREAM_MAX_SECONDS par défaut), ou si trop
+        de flux sont ouverts, 'poll' indique au client de suivre le job par `poll_url`."""
+        if not _stream_slots.acquire(blocking=False):
+            yield {'event': 'poll', 'data': {'job_id': job_id, 'poll_url': poll_url, 'reason': 'Trop de flux ouverts'}}
+            return
+        deadline = time.monotonic() + (timeout or settings.ANALYSIS_JOB_STREAM_MAX_SECONDS)
+        last_status, last_sent = None, time.monotonic()
+        get_analysis_scheduler()
+        try:
+            while time.monotonic() < deadline:
+                job = AnalysisJob.objects.filter(id=job_id).first()
+                if job is None:
+                    yield {'event': 'error', 'data': {'success': False, 'error': 'Job non trouvé'}}
+                    return
+                if job.status != last_status:
+                    last_status, last_sent = job.status, time.monotonic()
+                    yield {'event': 'status', 'data': self.serialize(job, include_result=False)}
+                if job.status == AnalysisJob.Status.COMPLETED:
+                    yield {'event': 'done', 'data': job.result}
+                    return
+                if job.status == AnalysisJob.Status.FAILED:
+                    yield {'event': 'error', 'data': {'success': False, 'error': job.error}}
+                    return
+                if job.heartbeat_at is None or job.heartbeat_at < self._stale_before():
+                    yield {'event': 'error', 'data': {'success': False, 'error': 'Job perdu (worker arrêté)', 'job_id': job_id}}
+                    return
+                if time.monotonic() - last_sent >= JOB_KEEPALIVE_INTERVAL:
+                    last_sent = time.monotonic()
+                    yield {'event': None, 'data': None}
+                time.sleep(JOB_POLL_INTERVAL)
+            yield {'event': 'poll', 'data': {
+                'job_id': job_id, 'status': last_status, 'poll_url': poll_url,
+                'reason': 'Durée maximale du flux atteinte'
+            }}
+        finally:
+            _stream_slots.release()
+            # Le flux s'exécute hors du cycle requête/réponse habituel
+            connections.close_all()
+
+    @classmethod
+    def serialize(cls, job: AnalysisJob, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            'job_id': job.id,
+            'ticket_id': job.ticket_zammad_id,
+            'status': job.status,
+            'source': job.source,
+            'urgency_score': job.urgency_score,
+            'expected_priority': job.expected_priority,
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+            'wait_ms': cls._duration_ms(job.created_at, job.started_at),
+            'run_ms': cls._duration_ms(job.started_at, job.finished_at),
+        }
+        if job.error:
+            data['error'] = job.error
+        if include_result and job.status == AnalysisJob.Status.COMPLETED:
+            data['result'] = job.result
+        return data
+
+    @classmethod
+    def queue_stats(cls, hours: int = 24) -> Dict[str, Any]:
+        """File courante et temps d'attente (création -> démarrage) par priorité attendue"""
+        since = timezone.now() - timedelta(hours=hours)
+        jobs = AnalysisJob.objects.filter(created_at__gte=since, started_at__isnull=False).values_list(
+            'expected_priority', 'created_at', 'started_at'
+        )
+        waits: Dict[str, List[int]] = {}
+        for priority, created_at, started_at in jobs:
+            waits.setdefault(priority or 'low', []).append(cls._duration_ms(created_at, started_at))
+
+        by_priority = {}
+        for priority in PRIORITY_ORDER:
+            values = sorted(waits.get(priority, []))
+            by_priority[priority] = {
+                'jobs': len(values),
+                'avg_wait_ms': round(sum(values) / len(values)) if values else 0,
+                'p95_wait_ms': values[max(0, math.ceil(len(values) * 0.95) - 1)] if values else 0,
+                'max_wait_ms': values[-1] if values else 0,
+            }
+        return {
+            'period_hours': hours,
+            'queue': get_analysis_scheduler().snapshot(),
+            'wait_by_priority': by_priority,
+        }
+
+    @staticmethod
+    def _duration_ms(start, end) -> Optional[int]:
+        if start is None or end is None:
+            return None
+        return int((end - start).total_seconds() * 1000)
+
+    @staticmethod
+    def _stale_before():
+        """Un job actif sans signe de vie depuis cette date est perdu"""
+        return timezone.now() - timedelta(seconds=JOB_STALE_AFTER)
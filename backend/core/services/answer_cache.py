@@ -0,0 +1,243 @@
+# backend/core/services/answer_cache.py
+"""
+Cache sémantique des réponses: index TF-IDF des tickets dont la réponse IA a été
+validée (published=True), matrice mappée en mémoire partagée entre processus
+"""
+import ast
+import glob
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+import numpy as np
+from django.conf import settings
+from ..models import LLMCallLog, TicketAnalysis
+from .text_vectors import TfidfVectorizer, ticket_text
+
+logger = logging.getLogger(__name__)
+
+
+def parse_stored_reply(ai_response: str) -> Optional[Dict[str, Any]]:
+    """Réponse enregistrée (repr du dict de l'analyseur, ou texte modifié par un agent)"""
+    if not ai_response or not ai_response.strip():
+        return None
+    try:
+        data = ast.literal_eval(ai_response)
+    except (ValueError, SyntaxError):
+        return {'response_text': ai_response.strip(), 'solution_steps': []}
+    if isinstance(data, dict) and isinstance(data.get('response_text'), str):
+        steps = data.get('solution_steps')
+        return {'response_text': data['response_text'], 'solution_steps': steps if isinstance(steps, list) else []}
+    return None
+
+
+class AnswerIndex:
+    """Vecteurs des tickets aux réponses validées et métadonnées associées"""
+
+    def __init__(self, vectorizer: TfidfVectorizer, matrix: np.ndarray, analysis_ids: np.ndarray,
+                 ticket_ids: np.ndarray, categories: np.ndarray):
+        self.vectorizer = vectorizer
+        self.matrix = matrix
+        self.analysis_ids = analysis_ids
+        self.ticket_ids = ticket_ids
+        self.categories = categories
+
+    @classmethod
+    def build(cls, directory: str, max_features: int = 20000) -> Dict[str, Any]:
+        """Construit l'index depuis la base; la matrice est écrite dans un nouveau fichier
+        et les métadonnées remplacées atomiquement (les lecteurs en cours gardent l'ancienne)"""
+        analyses = list(
+            TicketAnalysis.objects.filter(published=True).select_related('ticket').order_by('id')
+        )
+        analyses = [analysis for analysis in analyses if parse_stored_reply(analysis.ai_response)]
+        texts = [ticket_text(analysis.ticket.title, analysis.ticket.body) for analysis in analyses]
+        vectorizer = TfidfVectorizer().fit(texts, max_features=max_features)
+
+        os.makedirs(directory, exist_ok=True)
+        matrix_name = f"answer_index_{int(time.time() * 1000)}.npy"
+        matrix = np.lib.format.open_memmap(
+            os.path.join(directory, matrix_name), mode='w+', dtype=np.float32,
+            shape=(len(texts), vectorizer.size)
+        )
+        # Par blocs pour limiter la mémoire pendant la construction
+        for start in range(0, len(texts), 500):
+            matrix[start:start + 500] = vectorizer.transform(texts[start:start + 500])
+        matrix.flush()
+        del matrix
+
+        meta_path = os.path.join(directory, 'answer_index.npz')
+        temporary = f"{meta_path}.tmp.npz"
+        np.savez(
+            temporary,
+            matrix_file=np.array(matrix_name),
+            analysis_ids=np.array([analysis.id for analysis in analyses], dtype=np.int64),
+            ticket_ids=np.array([analysis.ticket_id for analysis in analyses], dtype=np.int64),
+            categories=np.array([analysis.category for analysis in analyses], dtype=str),
+            **vectorizer.to_arrays()
+        )
+        os.replace(temporary, meta_path)
+
+        for old in glob.glob(os.path.join(directory, 'answer_index_*.npy')):
+            if os.path.basename(old) != matrix_name:
+                os.remove(old)
+        return {'entries': len(analyses), 'terms': vectorizer.size, 'path': meta_path}
+
+    @classmethod
+    def load(cls, directory: str) -> 'AnswerIndex':
+        with np.load(os.path.join(directory, 'answer_index.npz')) as meta:
+            matrix = np.load(os.path.join(directory, str(meta['matrix_file'])), mmap_mode='r')
+            return cls(
+                TfidfVectorizer.from_arrays(meta), matrix,
+                meta['analysis_ids'], meta['ticket_ids'], meta['categories']
+            )
+
+    def search(self, text: str, category: str = None, exclude_ticket_id: int = None) -> Optional[Dict[str, Any]]:
+        """Entrée la plus proche (similarité cosinus), filtrée par catégorie"""
+        if not len(self.analysis_ids) or not self.vectorizer.size:
+            return None
+        scores = self.matrix @ self.vectorizer.transform([text])[0]
+        if category:
+            scores = np.where(self.categories == category, scores, -1)
+        if exclude_ticket_id is not None:
+            scores = np.where(self.ticket_ids == exclude_ticket_id, -1, scores)
+        best = int(scores.argmax())
+        return {'analysis_id': int(self.analysis_ids[best]), 'similarity': float(scores[best])}
+
+
+class AnswerCacheStats:
+    """Taux de réussite et latence économisée (processus courant)"""
+
+    _stats = {'lookups': 0, 'hits': 0, 'saved_ms': 0.0, 'misses_ms': 0.0, 'measured_misses': 0}
+    _lock = threading.Lock()
+    _reply_latency_ms: Optional[float] = None
+
+    @classmethod
+    def record_hit(cls, saved_ms: float):
+        with cls._lock:
+            cls._stats['lookups'] += 1
+            cls._stats['hits'] += 1
+            cls._stats['saved_ms'] += max(0.0, saved_ms)
+
+    @classmethod
+    def record_miss(cls):
+        with cls._lock:
+            cls._stats['lookups'] += 1
+
+    @classmethod
+    def record_generation(cls, generation_ms: float):
+        """Durée d'une réponse générée par le LLM après un échec du cache"""
+        with cls._lock:
+            cls._stats['misses_ms'] += generation_ms
+            cls._stats['measured_misses'] += 1
+
+    @classmethod
+    def expected_reply_ms(cls) -> float:
+        """Durée moyenne d'une génération de réponse: mesurée ici, sinon historique LLMCallLog"""
+        with cls._lock:
+            if cls._stats['measured_misses']:
+                return cls._stats['misses_ms'] / cls._stats['measured_misses']
+        if cls._reply_latency_ms is None:
+            recent = list(
+                LLMCallLog.objects.filter(task='ticket_reply', success=True, cached=False)
+                .order_by('-id').values_list('latency_ms', flat=True)[:200]
+            )
+            cls._reply_latency_ms = sum(recent) / len(recent) if recent else 0.0
+        return cls._reply_latency_ms
+
+    @classmethod
+    def hit_rate(cls) -> float:
+        with cls._lock:
+            return cls._stats['hits'] / cls._stats['lookups'] if cls._stats['lookups'] else 0.0
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        with cls._lock:
+            stats = dict(cls._stats)
+        return {
+            'enabled': settings.ANSWER_CACHE_ENABLED,
+            'similarity_threshold': settings.ANSWER_CACHE_THRESHOLD,
+            'entries': len(_loaded[1].analysis_ids) if _loaded[1] is not None else 0,
+            'lookups': stats['lookups'],
+            'hits': stats['hits'],
+            'hit_rate': round(cls.hit_rate(), 4),
+            'saved_ms': round(stats['saved_ms']),
+        }
+
+
+class AnswerCache:
+    """Réponse validée d'un ticket quasi identique, adaptée au nouveau ticket"""
+
+    def lookup(self, ticket, category: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Sans catégorie, pas de recherche: une réponse ne passe pas d'une catégorie à l'autre"""
+        if not settings.ANSWER_CACHE_ENABLED or not category:
+            return None
+        index = get_answer_index()
+        if index is None:
+            return None
+
+        started = time.perf_counter()
+        match = index.search(ticket_text(ticket.title, ticket.body), category, exclude_ticket_id=ticket.id)
+        source = reply = None
+        if match is not None and match['similarity'] >= settings.ANSWER_CACHE_THRESHOLD:
+            # Réponse dépubliée ou modifiée depuis la construction de l'index: on revérifie
+            source = TicketAnalysis.objects.filter(id=match['analysis_id'], published=True).select_related('ticket').first()
+            reply = parse_stored_reply(source.ai_response) if source else None
+        if reply is None:
+            AnswerCacheStats.record_miss()
+            return None
+
+        lookup_ms = (time.perf_counter() - started) * 1000
+        saved_ms = AnswerCacheStats.expected_reply_ms() - lookup_ms
+        AnswerCacheStats.record_hit(saved_ms)
+        logger.info(
+            f"Réponse du ticket {source.ticket.zammad_id} réutilisée pour le ticket {ticket.zammad_id} "
+            f"(similarité {match['similarity']:.2f}, {lookup_ms:.1f} ms, ~{max(0.0, saved_ms):.0f} ms économisées, "
+            f"taux de réutilisation {AnswerCacheStats.hit_rate():.0%})"
+        )
+        return dict(
+            self._adapt(reply, source.ticket, ticket),
+            answer_cache={'analysis_id': source.id, 'similarity': round(match['similarity'], 4)}
+        )
+
+    @staticmethod
+    def _adapt(reply: Dict[str, Any], source_ticket, ticket) -> Dict[str, Any]:
+        """Remplace les références au ticket d'origine (numéro, titre) par celles du nouveau"""
+        def adapt(text: str) -> str:
+            text = re.sub(rf'#\s?{source_ticket.zammad_id}\b', f'#{ticket.zammad_id}', text)
+            if source_ticket.title and source_ticket.title != ticket.title:
+                text = text.replace(source_ticket.title, ticket.title)
+            return text
+
+        return {
+            'response_text': adapt(reply['response_text']),
+            'solution_steps': [adapt(step) for step in reply['solution_steps']] or ['En cours de traitement'],
+        }
+
+
+# (date de modification des métadonnées, index) chargé dans ce processus
+_loaded = (None, None)
+_load_lock = threading.Lock()
+
+
+def get_answer_index() -> Optional[AnswerIndex]:
+    """Index courant, rechargé après chaque build_answer_index; None s'il n'existe pas"""
+    global _loaded
+    directory = settings.ANSWER_CACHE_DIR
+    try:
+        mtime = os.path.getmtime(os.path.join(directory, 'answer_index.npz'))
+    except OSError:
+        return None
+    if _loaded[0] == mtime:
+        return _loaded[1]
+
+    with _load_lock:
+        if _loaded[0] != mtime:
+            try:
+                _loaded = (mtime, AnswerIndex.load(directory))
+                logger.info(f"Index des réponses chargé ({len(_loaded[1].analysis_ids)} réponses validées)")
+            except Exception as e:
+                logger.error(f"Index des réponses illisible ({directory}): {e}")
+                _loaded = (mtime, None)
+        return _loaded[1]
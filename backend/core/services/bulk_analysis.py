@@ -0,0 +1,233 @@
+# backend/core/services/bulk_analysis.py
+"""
+Analyse en masse des tickets: pool de workers borné, checkpoint par lot et reprise
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Q, QuerySet
+from django.utils import timezone
+from ..models import BulkAnalysisJob, Ticket
+from .circuit_breaker import get_llm_circuit_breaker
+from .ticket_analyzer import TicketAnalyzerService
+
+logger = logging.getLogger(__name__)
+
+# Signe de vie (updated_at) d'un job en cours, en secondes; sans signe de vie il est abandonné
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_STALE_AFTER = JOB_HEARTBEAT_INTERVAL * 4
+
+
+class BulkAnalysisConflict(Exception):
+    """Levée quand une analyse en masse est déjà en cours dans un processus vivant"""
+
+    def __init__(self, job: Optional[BulkAnalysisJob]):
+        super().__init__("Une analyse en masse est déjà en cours")
+        self.job = job
+
+
+class BulkAnalysisService:
+    """Analyse les tickets sans analyse (ou dont l'analyse est antérieure à la dernière
+    mise à jour) par lots de `batch_size`, chaque lot traité par `workers` threads.
+    Le checkpoint et les compteurs sont enregistrés après chaque lot: un job
+    interrompu reprend au premier ticket non traité."""
+
+    def __init__(self, analyzer: Optional[TicketAnalyzerService] = None):
+        self.analyzer = analyzer or TicketAnalyzerService()
+
+    def create_job(self, workers: int = None, batch_size: int = None, limit: int = None,
+                   include_stale: bool = True, reanalyze_all: bool = False, user=None) -> BulkAnalysisJob:
+        """Job créé déjà réservé (en cours) pour l'appelant; BulkAnalysisConflict si un autre
+        job est en cours (contrainte unique sur le statut running)"""
+        job = BulkAnalysisJob(
+            status=BulkAnalysisJob.Status.RUNNING,
+            workers=max(1, workers or settings.BULK_ANALYSIS_WORKERS),
+            batch_size=max(1, batch_size or settings.BULK_ANALYSIS_BATCH_SIZE),
+            limit=limit,
+            include_stale=include_stale,
+            reanalyze_all=reanalyze_all,
+            created_by=user,
+        )
+        total = self.pending_tickets(job).count()
+        job.total = min(total, limit) if limit else total
+        try:
+            with transaction.atomic():
+                self._fail_lost_jobs()
+                job.save()
+        except IntegrityError:
+            raise BulkAnalysisConflict(self.running_job())
+        return job
+
+    @staticmethod
+    def stale_before():
+        return timezone.now() - timedelta(seconds=JOB_STALE_AFTER)
+
+    @classmethod
+    def running_job(cls) -> Optional[BulkAnalysisJob]:
+        """Job en cours dans un processus vivant (signe de vie récent)"""
+        return BulkAnalysisJob.objects.filter(
+            status=BulkAnalysisJob.Status.RUNNING, updated_at__gte=cls.stale_before()
+        ).first()
+
+    @classmethod
+    def resumable_job(cls, job_id: int = None) -> Optional[BulkAnalysisJob]:
+        """Job à reprendre (celui demandé, sinon le dernier interrompu), réservé pour l'appelant:
+        un job en cours n'est repris que s'il a perdu son worker (plus de signe de vie).
+        BulkAnalysisConflict si un autre job est en cours."""
+        try:
+            with transaction.atomic():
+                cls._fail_lost_jobs()
+                jobs = BulkAnalysisJob.objects.select_for_update().filter(
+                    status__in=[BulkAnalysisJob.Status.PENDING, BulkAnalysisJob.Status.FAILED]
+                )
+                job = jobs.filter(id=job_id).first() if job_id else jobs.first()
+                if job is None:
+                    return None
+                job.status = BulkAnalysisJob.Status.RUNNING
+                job.save(update_fields=['status', 'updated_at'])
+        except IntegrityError:
+            raise BulkAnalysisConflict(cls.running_job())
+        return job
+
+    @classmethod
+    def _fail_lost_jobs(cls):
+        """Jobs en cours sans signe de vie (worker perdu): en échec, donc reprenables,
+        et ils ne bloquent plus le lancement d'un nouveau job"""
+        BulkAnalysisJob.objects.filter(
+            status=BulkAnalysisJob.Status.RUNNING, updated_at__lt=cls.stale_before()
+        ).update(status=BulkAnalysisJob.Status.FAILED, last_error="Worker perdu (plus de signe de vie)")
+
+    @staticmethod
+    def pending_tickets(job: BulkAnalysisJob) -> QuerySet:
+        """Tickets restant à traiter après le checkpoint, dans l'ordre des ids"""
+        tickets = Ticket.objects.filter(id__gt=job.checkpoint_ticket_id)
+        if not job.reanalyze_all:
+            todo = Q(analysis__isnull=True) | Q(analysis__analyzed_at__isnull=True)
+            if job.include_stale:
+                todo |= Q(analysis__analyzed_at__lt=F('updated_at'))
+            tickets = tickets.filter(todo)
+        return tickets.order_by('id')
+
+    def run(self, job: BulkAnalysisJob,
+            on_batch: Callable[[BulkAnalysisJob, Dict[str, Any]], None] = None) -> BulkAnalysisJob:
+        """Traite le job jusqu'au bout (ou jusqu'à la limite); `on_batch` reçoit le job
+        et le bilan de chaque lot après enregistrement du checkpoint"""
+        job.status = BulkAnalysisJob.Status.RUNNING
+        job.last_error = ''
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        logger.info(f"Analyse en masse #{job.id}: reprise après le ticket {job.checkpoint_ticket_id}")
+
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job.id, stop), daemon=True).start()
+        try:
+            with ThreadPoolExecutor(max_workers=job.workers, thread_name_prefix='bulk-analysis') as executor:
+                while True:
+                    size = job.batch_size
+                    if job.limit:
+                        size = min(size, job.limit - job.processed)
+                    batch = list(self.pending_tickets(job)[:size]) if size > 0 else []
+                    if not batch:
+                        break
+
+                    started = time.monotonic()
+                    outcomes = list(executor.map(self._analyze, batch, [job.reanalyze_all] * len(batch)))
+                    report = self._checkpoint(job, batch, outcomes, time.monotonic() - started)
+                    if on_batch:
+                        on_batch(job, report)
+
+                    # Inutile d'enchaîner des analyses par défaut tant que le fournisseur est coupé
+                    if get_llm_circuit_breaker().snapshot()['state'] == 'open':
+                        raise RuntimeError("Circuit LLM ouvert, job suspendu (reprise possible)")
+        except Exception as e:
+            logger.error(f"Analyse en masse #{job.id} interrompue: {e}")
+            job.status = BulkAnalysisJob.Status.FAILED
+            job.last_error = str(e)
+            job.save(update_fields=['status', 'last_error', 'updated_at'])
+            return job
+        finally:
+            stop.set()
+
+        job.status = BulkAnalysisJob.Status.COMPLETED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at', 'updated_at'])
+        logger.info(
+            f"Analyse en masse #{job.id} terminée: {job.succeeded}/{job.processed} réussies, "
+            f"{job.tickets_per_minute} tickets/min"
+        )
+        return job
+
+    @staticmethod
+    def _heartbeat(job_id: int, stop: threading.Event):
+        """Signe de vie pendant les lots longs (le checkpoint ne survient qu'en fin de lot)"""
+        try:
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                BulkAnalysisJob.objects.filter(id=job_id, status=BulkAnalysisJob.Status.RUNNING).update(
+                    updated_at=timezone.now()
+                )
+        except Exception as e:
+            logger.warning(f"Signe de vie de l'analyse en masse #{job_id}: {e}")
+        finally:
+            connections.close_all()
+
+    def _analyze(self, ticket: Ticket, force: bool = False) -> Dict[str, Any]:
+        """Analyse d'un ticket dans un worker; une analyse dégradée compte comme un échec.
+        Un ticket inchangé réutilise son analyse enregistrée, sauf avec `force` (--all)."""
+        try:
+            result = self.analyzer.analyze_ticket(ticket, force=force)
+            if result.get('success') and not result.get('degraded'):
+                return {'success': True}
+            return {'success': False, 'error': result.get('error') or 'Analyse dégradée (LLM indisponible)'}
+        except Exception as e:
+            logger.error(f"Analyse en masse du ticket {ticket.zammad_id}: {e}")
+            return {'success': False, 'error': str(e)}
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def _checkpoint(job: BulkAnalysisJob, batch: List[Ticket], outcomes: List[Dict[str, Any]],
+                    elapsed: float) -> Dict[str, Any]:
+        failures = [outcome['error'] for outcome in outcomes if not outcome['success']]
+        job.checkpoint_ticket_id = batch[-1].id
+        job.processed += len(batch)
+        job.succeeded += len(batch) - len(failures)
+        job.failed += len(failures)
+        job.elapsed_seconds += elapsed
+        if failures:
+            job.last_error = failures[-1][:1000]
+        job.save(update_fields=[
+            'checkpoint_ticket_id', 'processed', 'succeeded', 'failed',
+            'elapsed_seconds', 'last_error', 'updated_at'
+        ])
+        return {
+            'size': len(batch),
+            'failed': len(failures),
+            'seconds': round(elapsed, 2),
+            'tickets_per_minute': round(len(batch) / elapsed * 60, 1) if elapsed else 0.0,
+        }
+
+    @staticmethod
+    def serialize(job: BulkAnalysisJob) -> Dict[str, Any]:
+        return {
+            'id': job.id,
+            'status': job.status,
+            'total': job.total,
+            'processed': job.processed,
+            'succeeded': job.succeeded,
+            'failed': job.failed,
+            'workers': job.workers,
+            'batch_size': job.batch_size,
+            'limit': job.limit,
+            'include_stale': job.include_stale,
+            'reanalyze_all': job.reanalyze_all,
+            'checkpoint_ticket_id': job.checkpoint_ticket_id,
+            'elapsed_seconds': round(job.elapsed_seconds, 1),
+            'tickets_per_minute': job.tickets_per_minute,
+            'last_error': job.last_error,
+            'created_at': job.created_at,
+            'finished_at': job.finished_at,
+        }
@@ -0,0 +1,160 @@
+# backend/core/services/circuit_breaker.py
+"""
+Disjoncteur (circuit breaker) autour du fournisseur LLM
+"""
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Disjoncteur à trois états: closed, open, half_open.
+
+    - closed: les appels passent, les échecs consécutifs sont comptés
+    - open: les appels sont refusés immédiatement pendant `recovery_timeout`
+    - half_open: une sonde de santé (si fournie) puis un nombre limité
+      d'appels d'essai décident de la refermeture ou de la réouverture
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 60,
+        half_open_max_calls: int = 1,
+        health_probe: Optional[Callable[[], bool]] = None
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.health_probe = health_probe
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_calls = 0
+        self.total_rejected = 0
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """True si un appel peut partir maintenant"""
+        run_probe = False
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    self.total_rejected += 1
+                    return False
+                self._transition(self.HALF_OPEN)
+                run_probe = self.health_probe is not None
+
+            if not run_probe:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.total_rejected += 1
+                    return False
+                self.half_open_calls += 1
+                return True
+
+        # La sonde est exécutée hors verrou: elle fait un appel réseau
+        healthy = self._probe()
+        with self._lock:
+            if not healthy:
+                self._open("sonde de santé en échec")
+                self.total_rejected += 1
+                return False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN or self.half_open_calls >= self.half_open_max_calls:
+                self.total_rejected += 1
+                return False
+            self.half_open_calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self, error: str = ""):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._open(error)
+
+    def release(self):
+        """Rend un créneau d'essai abandonné avant d'atteindre le fournisseur"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+    def reset(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._transition(self.CLOSED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État courant pour le monitoring"""
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'name': self.name,
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in_seconds': round(retry_in, 1) if retry_in is not None else None,
+                'total_rejected': self.total_rejected,
+                'last_error': self.last_error,
+            }
+
+    def _probe(self) -> bool:
+        try:
+            return bool(self.health_probe())
+        except Exception as e:
+            logger.warning(f"Sonde de santé {self.name} en échec: {e}")
+            return False
+
+    def _open(self, reason: str):
+        self.opened_at = time.monotonic()
+        self._transition(self.OPEN)
+        logger.error(f"Circuit {self.name} ouvert ({reason}), reprise dans {self.recovery_timeout}s")
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.info(f"Circuit {self.name}: {self.state} -> {state}")
+        self.state = state
+        self.half_open_calls = 0
+
+
+_breaker: Optional[CircuitBreaker] = None
+_breaker_lock = threading.Lock()
+
+
+def get_llm_circuit_breaker() -> CircuitBreaker:
+    """Disjoncteur unique du processus pour le fournisseur LLM"""
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(
+                name='llm',
+                failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=settings.LLM_CIRCUIT_RECOVERY_TIMEOUT,
+                half_open_max_calls=settings.LLM_CIRCUIT_HALF_OPEN_MAX_CALLS,
+            )
+        return _breaker
@@ -0,0 +1,59 @@
+# backend/core/services/clients.py
+"""
+Registre des clients partagés par processus (LLM, Zammad)
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict
+from .llm_client import AsyncLLMClient, LLMClient
+from .zammad_api import ZammadAPIService
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """Instancie chaque client à la première demande puis le réutilise:
+    les pools de connexions keep-alive survivent d'une requête à l'autre."""
+
+    def __init__(self):
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                client = factory()
+                self._clients[name] = client
+                logger.info(f"Client partagé initialisé: {name}")
+            return client
+
+    def reset(self):
+        """Oublie les clients créés (changement de configuration, benchmark)"""
+        with self._lock:
+            self._clients.clear()
+
+    def names(self):
+        with self._lock:
+            return sorted(self._clients)
+
+
+registry = ClientRegistry()
+
+
+def get_llm_client() -> LLMClient:
+    """LLMClient partagé (backend, cache, limiteur et disjoncteur uniques du processus)"""
+    return registry.get('llm', LLMClient)
+
+
+def get_async_llm_client() -> AsyncLLMClient:
+    """AsyncLLMClient partagé: une seule boucle d'événements et une concurrence bornée par processus"""
+    return registry.get('llm_async', AsyncLLMClient)
+
+
+def get_zammad_api() -> ZammadAPIService:
+    """ZammadAPIService partagé avec sa session HTTP"""
+    return registry.get('zammad', ZammadAPIService)
@@ -1,34 +1,23 @@
 import logging
-import json
-import re
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from .zammad_api import ZammadAPIService
 from .llm_client import LLMClient
+from .clients import get_llm_client, get_zammad_api
+from .llm_json import StructuredOutputService
 
 logger = logging.getLogger(__name__)
 
 
-def extract_json_from_llm(text: str) -> Dict[str, Any]:
-    """
-    Extrait le premier objet JSON valide depuis une réponse LLM.
-    """
-    if not text:
-        raise ValueError("Réponse IA vide")
-
-    text = text.replace("```json", "").replace("```", "").strip()
-
-    match = re.search(r"\{[\s\S]*\}", text)
-    if not match:
-        raise ValueError("Aucun JSON trouvé dans la réponse IA")
-
-    return json.loads(match.group(0))
-
-
 class KnowledgeBaseService:
-    def __init__(self):
-        self.zammad_api = ZammadAPIService()
-        self.llm_client = LLMClient()
+    def __init__(
+        self,
+        llm_client: Optional[LLMClient] = None,
+        zammad_api: Optional[ZammadAPIService] = None
+    ):
+        self.zammad_api = zammad_api or get_zammad_api()
+        self.llm_client = llm_client or get_llm_client()
+        self.structured = StructuredOutputService(self.llm_client)
 
     # ==========================================================
     # SUGGESTION IA
@@ -36,37 +25,26 @@ class KnowledgeBaseService:
     def suggest_knowledge_article(
         self,
         ticket_analysis: Dict[str, Any],
-        ticket_data: Dict[str, Any]
+        ticket_data: Dict[str, Any],
+        use_cache: bool = True
     ) -> Dict[str, Any]:
 
         try:
-            article_content = self._generate_article_content(
-                ticket_analysis, ticket_data
-            )
-
-            if not article_content["success"]:
-                return article_content
-
-            return {
-                "success": True,
-                "suggestion": {
-                    "title": article_content["title"],
-                    "content": article_content["content"],
-                    "category": article_content["category"],
-                    "should_create": article_content["should_create"],
-                    "reason": article_content["reason"],
-                },
-            }
+            call = self.article_call(ticket_analysis, ticket_data, use_cache=use_cache)
+            result = self.structured.call('kb_article', **call)
+            return self.suggestion_from_result(result)
 
         except Exception as e:
             logger.exception("Erreur suggestion article KB")
             return {"success": False, "error": str(e)}
 
-    def _generate_article_content(
+    def article_call(
         self,
         ticket_analysis: Dict[str, Any],
         ticket_data: Dict[str, Any],
+        use_cache: bool = True,
     ) -> Dict[str, Any]:
+        """Arguments de l'appel LLM (call_api) qui rédige la suggestion d'article"""
 
         prompt = f"""
 Analyse ce ticket et crée un article de base de connaissance.
@@ -97,32 +75,34 @@ Format :
 }
 """
 
-        result = self.llm_client.call_api(prompt, system_prompt)
-
+        return {
+            'prompt': prompt,
+            'system_prompt': system_prompt,
+            'service': 'knowledge_base',
+            'task': 'kb_article',
+            'use_cache': use_cache,
+        }
+
+    @staticmethod
+    def suggestion_from_result(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Suggestion à partir du résultat validé (schéma kb_article) de StructuredOutputService"""
         if not result.get("success"):
             return {
                 "success": False,
                 "error": result.get("error", "Erreur IA"),
             }
 
-        raw_content = result.get("content", "")
-        logger.info("Réponse IA brute:\n%s", raw_content)
-
-        try:
-            data = extract_json_from_llm(raw_content)
-
-            return {
-                "success": True,
-                "should_create": data.get("should_create", False),
-                "reason": data.get("reason", ""),
-                "title": data.get("title", ""),
-                "content": data.get("content", ""),
-                "category": data.get("category", "Procédures Internes"),
-            }
-
-        except Exception as e:
-            logger.error("Erreur parsing JSON IA: %s", e)
-            return {"success": False, "error": "Réponse IA invalide"}
+        data = result["data"]
+        return {
+            "success": True,
+            "suggestion": {
+                "title": data["title"],
+                "content": data["content"],
+                "category": data["category"],
+                "should_create": data["should_create"],
+                "reason": data["reason"],
+            },
+        }
 
     # ==========================================================
     # CRÉATION ARTICLE (CORRIGÉ)
@@ -156,7 +156,10 @@ Génère une justification professionnelle en 2-3 phrases expliquant pourquoi ce
 """
                 result = self.llm_client.call_api(
                     prompt,
-                    system_prompt="Tu es un expert en analyse de leads commerciaux GTB/GTEB. Génère des justifications claires et professionnelles."
+                    system_prompt="Tu es un expert en analyse de leads commerciaux GTB/GTEB. Génère des justifications claires et professionnelles.",
+                    service='lead_scorer',
+                    task='lead_justification',
+                    critical=False  # la justification manuelle ci-dessous suffit hors budget
                 )
                 
                 if result.get('success'):
@@ -8,16 +8,17 @@ from .lead_normalizer import LeadNormalizer
 from .lead_enricher import LeadEnricher
 from .lead_scorer import LeadScorer
 from .llm_client import LLMClient
+from .clients import get_llm_client
 
 logger = logging.getLogger(__name__)
 
 class LeadService:
     """Service principal pour la gestion des leads GTB/GTEB"""
     
-    def __init__(self):
+    def __init__(self, llm_client: LLMClient = None):
         self.normalizer = LeadNormalizer()
         self.enricher = LeadEnricher()
-        self.llm_client = LLMClient()
+        self.llm_client = llm_client or get_llm_client()
         self.scorer = LeadScorer(llm_client=self.llm_client)
     
     def search_and_create_leads(self, countries: List[str] = None, 
@@ -0,0 +1,356 @@
+# backend/core/services/llm_backends.py
+"""
+Backends LLM interchangeables: Cohere, modèle local (gpt4all) et faux backend déterministe
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from typing import Dict, Any, Iterator, List, Optional
+from decouple import config
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackendError(Exception):
+    """Erreur fournisseur avec code HTTP éventuel (lu par le disjoncteur et les retries)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Estimation grossière (~4 caractères par token)"""
+    return sum(len(text or "") for text in texts) // 4 + 1
+
+
+class BaseLLMBackend:
+    """Interface commune: chat() retourne {'text', 'input_tokens', 'output_tokens'}"""
+
+    name = 'base'
+
+    def chat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+             max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """`json_mode` demande une sortie JSON au fournisseur quand il le supporte,
+        `max_tokens` et `timeout` viennent de la route de la tâche (LLM_TASK_ROUTES)"""
+        raise NotImplementedError
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+                    max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Version asynchrone par défaut: le chat bloquant (SDK, gpt4all) dans un thread,
+        la boucle d'événements reste libre"""
+        return await asyncio.to_thread(self.chat, model, messages, json_mode, max_tokens, timeout)
+
+    def stream(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+               max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Événements {'type': 'delta', 'text'} puis {'type': 'usage', ...}.
+        Par défaut la réponse complète en un seul fragment."""
+        result = self.chat(model, messages, json_mode, max_tokens, timeout)
+        yield {'type': 'delta', 'text': result['text']}
+        yield {'type': 'usage', 'input_tokens': result['input_tokens'], 'output_tokens': result['output_tokens']}
+
+    def health_check(self) -> bool:
+        return True
+
+
+class CohereBackend(BaseLLMBackend):
+    name = 'cohere'
+
+    def __init__(self, timeout: float = 30):
+        import cohere
+        self._cohere = cohere
+        self.api_key = config('COHERE_API_KEY')
+        self.timeout = timeout
+        self.client = cohere.ClientV2(api_key=self.api_key, timeout=timeout)
+        # Client asynchrone natif (httpx), lié à la boucle d'événements qui l'a créé
+        self._async_client = None
+        self._async_loop = None
+        self._async_lock = threading.Lock()
+
+    def chat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+             max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = self.client.chat(model=model, messages=messages, **self._options(json_mode, max_tokens, timeout))
+        return self._to_result(response)
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+                    max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        response = await self._client_for_loop().chat(
+            model=model, messages=messages, **self._options(json_mode, max_tokens, timeout)
+        )
+        return self._to_result(response)
+
+    def stream(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+               max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        input_tokens = output_tokens = 0
+        for event in self.client.chat_stream(model=model, messages=messages, **self._options(json_mode, max_tokens, timeout)):
+            if event.type == 'content-delta':
+                text = event.delta.message.content.text
+                if text:
+                    yield {'type': 'delta', 'text': text}
+            elif event.type == 'message-end':
+                usage = event.delta.usage if event.delta else None
+                tokens = getattr(usage, 'tokens', None) or getattr(usage, 'billed_units', None)
+                if tokens:
+                    input_tokens = int(tokens.input_tokens or 0)
+                    output_tokens = int(tokens.output_tokens or 0)
+        yield {'type': 'usage', 'input_tokens': input_tokens, 'output_tokens': output_tokens}
+
+    def health_check(self) -> bool:
+        """Sonde légère: liste des modèles, sans génération"""
+        self.client.models.list(page_size=1)
+        return True
+
+    def _client_for_loop(self):
+        loop = asyncio.get_running_loop()
+        with self._async_lock:
+            if self._async_client is None or self._async_loop is not loop:
+                self._async_client = self._cohere.AsyncClientV2(api_key=self.api_key, timeout=self.timeout)
+                self._async_loop = loop
+            return self._async_client
+
+    @staticmethod
+    def _options(json_mode: bool, max_tokens: Optional[int], timeout: Optional[float]) -> Dict[str, Any]:
+        options = {}
+        if json_mode:
+            # Mode JSON natif de Cohere: la réponse est garantie syntaxiquement valide
+            options['response_format'] = {'type': 'json_object'}
+        if max_tokens:
+            options['max_tokens'] = max_tokens
+        if timeout:
+            options['request_options'] = {'timeout_in_seconds': int(timeout)}
+        return options
+
+    @staticmethod
+    def _to_result(response) -> Dict[str, Any]:
+        text = ""
+        if response.message and response.message.content:
+            text = response.message.content[0].text
+
+        input_tokens = output_tokens = 0
+        usage = getattr(response, 'usage', None)
+        tokens = getattr(usage, 'tokens', None) or getattr(usage, 'billed_units', None)
+        if tokens:
+            input_tokens = int(tokens.input_tokens or 0)
+            output_tokens = int(tokens.output_tokens or 0)
+
+        return {'text': text, 'input_tokens': input_tokens, 'output_tokens': output_tokens}
+
+
+class GPT4AllBackend(BaseLLMBackend):
+    """Modèle local via gpt4all (le paramètre `model` Cohere est ignoré)"""
+
+    name = 'local'
+
+    def __init__(self, model_name: str = None, model_path: str = None, max_tokens: int = None):
+        try:
+            from gpt4all import GPT4All
+        except ImportError as e:
+            raise LLMBackendError(f"gpt4all n'est pas installé: {e}")
+
+        self.model_name = model_name or settings.LLM_LOCAL_MODEL
+        self.max_tokens = max_tokens or settings.LLM_LOCAL_MAX_TOKENS
+        self.model = GPT4All(
+            self.model_name,
+            model_path=model_path or settings.LLM_LOCAL_MODEL_PATH or None,
+            allow_download=False
+        )
+        # Une instance GPT4All ne supporte pas les générations concurrentes
+        self._lock = threading.Lock()
+
+    def chat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+             max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        system_prompt = "\n".join(m['content'] for m in messages if m['role'] == 'system')
+        prompt = "\n".join(m['content'] for m in messages if m['role'] == 'user')
+
+        with self._lock:
+            with self.model.chat_session(system_prompt=system_prompt):
+                text = self.model.generate(prompt, max_tokens=max_tokens or self.max_tokens)
+
+        return {
+            'text': text,
+            'input_tokens': estimate_tokens(system_prompt, prompt),
+            'output_tokens': estimate_tokens(text),
+        }
+
+
+class FakeLLMBackend(BaseLLMBackend):
+    """Backend déterministe hors ligne pour benchmarks et tests de charge.
+
+    Le même prompt donne toujours la même réponse. Le JSON renvoyé respecte
+    les formats attendus par l'analyseur de tickets, la base de connaissance
+    et les services de leads. Latence et taux d'erreur sont configurables.
+    """
+
+    name = 'fake'
+
+    CATEGORIES = ['technique', 'commercial', 'facturation', 'autre']
+    PRIORITIES = [('low', 'Bas'), ('medium', 'Normal'), ('high', 'Haute'), ('urgent', 'Urgente')]
+    STATUSES = ['nouveau', 'ouvert', 'rappel_en_attente', 'en_attente_de_cloture']
+
+    def __init__(self, latency: float = None, latency_jitter: float = None,
+                 error_rate: float = None, seed: int = None):
+        self.latency = settings.LLM_FAKE_LATENCY if latency is None else latency
+        self.latency_jitter = settings.LLM_FAKE_LATENCY_JITTER if latency_jitter is None else latency_jitter
+        self.error_rate = settings.LLM_FAKE_ERROR_RATE if error_rate is None else error_rate
+        self._random = random.Random(settings.LLM_FAKE_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+
+    def chat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+             max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        delay, fail = self._draw()
+        time.sleep(delay)
+        return self._respond(messages, fail)
+
+    async def achat(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+                    max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        delay, fail = self._draw()
+        await asyncio.sleep(delay)
+        return self._respond(messages, fail)
+
+    def stream(self, model: str, messages: List[Dict[str, str]], json_mode: bool = False,
+               max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """Latence répartie: un quart avant le premier fragment, le reste entre les fragments"""
+        delay, fail = self._draw()
+        time.sleep(delay / 4)
+        result = self._respond(messages, fail)
+
+        chunks = re.findall(r"\S+\s*", result['text']) or ['']
+        for chunk in chunks:
+            time.sleep(delay * 3 / 4 / len(chunks))
+            yield {'type': 'delta', 'text': chunk}
+        yield {'type': 'usage', 'input_tokens': result['input_tokens'], 'output_tokens': result['output_tokens']}
+
+    def _draw(self):
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.latency_jitter, self.latency_jitter))
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+    def _respond(self, messages: List[Dict[str, str]], fail: bool) -> Dict[str, Any]:
+        if fail:
+            raise LLMBackendError("Erreur injectée par le backend fake", status_code=503)
+
+        system_prompt = "\n".join(m['content'] for m in messages if m['role'] == 'system')
+        prompt = "\n".join(m['content'] for m in messages if m['role'] == 'user')
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+
+        text = self._build_text(system_prompt, prompt, random.Random(seed))
+        return {
+            'text': text,
+            'input_tokens': estimate_tokens(system_prompt, prompt),
+            'output_tokens': estimate_tokens(text),
+        }
+
+    def _build_text(self, system_prompt: str, prompt: str, rng: random.Random) -> str:
+        if '"intention"' in prompt:
+            payload = self._ticket_analysis(rng)
+            if '"response_text"' in prompt:
+                payload.update(self._ticket_reply(rng))
+            return json.dumps(payload, ensure_ascii=False)
+        if '"response_text"' in prompt:
+            return json.dumps(self._ticket_reply(rng), ensure_ascii=False)
+        if '"should_create"' in system_prompt or '"should_create"' in prompt:
+            return json.dumps(self._kb_article(prompt, rng), ensure_ascii=False)
+        if '"leads"' in prompt:
+            return json.dumps({'leads': self._leads(prompt, rng)}, ensure_ascii=False)
+        if "RÉSUMÉ D'ARTICLE" in prompt:
+            return self._article_summary(prompt)
+
+        # Justification de score de lead ou texte libre
+        return (
+            "Ce lead présente un potentiel cohérent avec son score: "
+            "le type de projet et le secteur correspondent à notre offre GTB/GTEB. "
+            "Un premier contact commercial est recommandé."
+        )
+
+    def _article_summary(self, prompt: str) -> str:
+        # Les premiers mots du message, comme un résumé extractif
+        message = prompt.split('MESSAGE:', 1)[-1].split()
+        return "Résumé: " + " ".join(message[:25])
+
+    def _ticket_analysis(self, rng: random.Random) -> Dict[str, Any]:
+        priority, priority_label = rng.choice(self.PRIORITIES)
+        return {
+            'intention': "Le client signale un dysfonctionnement et demande une intervention",
+            'category': rng.choice(self.CATEGORIES),
+            'priority': priority,
+            'priority_label': priority_label,
+            'recommended_status': rng.choice(self.STATUSES),
+            'status_reason': "Analyse automatique (backend fake)",
+            'estimated_time': rng.choice(['30 minutes', '2 heures', '1 jour']),
+            'urgency_indicators': ['panne'] if priority in ('high', 'urgent') else [],
+            'next_actions': ['Vérifier la configuration', 'Contacter le client'],
+        }
+
+    def _ticket_reply(self, rng: random.Random) -> Dict[str, Any]:
+        return {
+            'response_text': "Bonjour, nous avons bien reçu votre demande et nos équipes l'analysent.",
+            'solution_steps': ['Redémarrer l\'équipement concerné', 'Vérifier la connexion réseau', 'Nous recontacter si le problème persiste'][:rng.randint(2, 3)],
+        }
+
+    def _kb_article(self, prompt: str, rng: random.Random) -> Dict[str, Any]:
+        title_match = re.search(r"Titre:\s*(.+)", prompt)
+        title = title_match.group(1).strip() if title_match else "Procédure de résolution"
+        return {
+            'should_create': rng.random() < 0.7,
+            'reason': "Problème récurrent documentable",
+            'title': f"Résoudre: {title}"[:200],
+            'content': "1. Identifier l'équipement\n2. Appliquer la procédure standard\n3. Valider avec le client",
+            'category': 'Procédures Internes',
+        }
+
+    def _leads(self, prompt: str, rng: random.Random) -> List[Dict[str, Any]]:
+        countries_match = re.search(r"pays suivants\s*:\s*([^.\n]+)", prompt)
+        countries = [c.strip() for c in countries_match.group(1).split(',')] if countries_match else ['Maroc']
+        sectors = ['Santé', 'Industrie', 'Hôtellerie', 'Foncière Tertiaire', 'Transport']
+        leads = []
+        for index in range(5):
+            country = countries[index % len(countries)]
+            potential = rng.randint(20, 95)
+            leads.append({
+                'nom_entreprise': f"Entreprise Démo {index + 1} {country}",
+                'secteur': rng.choice(sectors),
+                'pays': country,
+                'ville': 'Casablanca' if country == 'Maroc' else 'Paris' if country == 'France' else 'Montréal',
+                'profil_decideur': 'Directeur Technique',
+                'besoin_specifique': 'Optimisation énergétique du parc de bâtiments',
+                'type_projet': rng.choice(['GTB', 'GTEB', 'CVC']),
+                'budget_estime': rng.randint(50, 2000) * 1000,
+                'potentiel': potential,
+                'justification': f"Potentiel estimé à {potential}/100 (backend fake)",
+            })
+        return leads
+
+
+_backend: Optional[BaseLLMBackend] = None
+_backend_lock = threading.Lock()
+
+BACKENDS = {
+    'cohere': CohereBackend,
+    'local': GPT4AllBackend,
+    'fake': FakeLLMBackend,
+}
+
+
+def create_llm_backend(name: str = None) -> BaseLLMBackend:
+    """Instancie le backend demandé (settings.LLM_BACKEND par défaut)"""
+    name = name or settings.LLM_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Backend LLM inconnu: {name} (choix: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+def get_llm_backend() -> BaseLLMBackend:
+    """Backend unique du processus"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_llm_backend()
+            logger.info(f"Backend LLM: {_backend.name}")
+        return _backend
@@ -0,0 +1,132 @@
+# backend/core/services/llm_cache.py
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Sum
+from django.utils import timezone
+from ..models import LLMCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Cache persistant des réponses LLM (table LLMCacheEntry) avec TTL et éviction LRU"""
+
+    # Compteurs partagés par tous les clients du processus
+    _stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else settings.LLM_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else settings.LLM_CACHE_MAX_ENTRIES
+
+    @staticmethod
+    def normalize_prompt(text: str) -> str:
+        """Normalise les espaces pour que l'indentation des f-strings ne change pas la clé"""
+        return " ".join((text or "").split())
+
+    @classmethod
+    def make_key(cls, model: str, system_prompt: str, prompt: str) -> str:
+        """Clé de cache: sha256 du modèle, du prompt système et du prompt normalisés"""
+        raw = "\x1f".join([
+            model or "",
+            cls.normalize_prompt(system_prompt),
+            cls.normalize_prompt(prompt),
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourne le contenu en cache ou None (absent, expiré ou base inaccessible)"""
+        try:
+            entry = LLMCacheEntry.objects.filter(key=key).first()
+            if entry is None:
+                self._incr('misses')
+                return None
+
+            if self.ttl and entry.created_at < timezone.now() - timedelta(seconds=self.ttl):
+                entry.delete()
+                self._incr('misses')
+                return None
+
+            LLMCacheEntry.objects.filter(pk=entry.pk).update(
+                hit_count=F('hit_count') + 1,
+                last_accessed_at=timezone.now()
+            )
+            self._incr('hits')
+            return entry.content
+
+        except DatabaseError as e:
+            logger.warning(f"Cache LLM indisponible (lecture): {e}")
+            return None
+
+    def set(self, key: str, model: str, content: str):
+        """Enregistre une réponse puis applique l'éviction"""
+        try:
+            LLMCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    'model': model or '',
+                    'content': content,
+                    'last_accessed_at': timezone.now()
+                }
+            )
+            self._evict()
+        except DatabaseError as e:
+            logger.warning(f"Cache LLM indisponible (écriture): {e}")
+
+    def delete(self, key: str):
+        """Retire une réponse (ex. sortie JSON irréparable qui ne doit pas être resservie)"""
+        try:
+            LLMCacheEntry.objects.filter(key=key).delete()
+        except DatabaseError as e:
+            logger.warning(f"Cache LLM indisponible (suppression): {e}")
+
+    def clear(self) -> int:
+        """Vide complètement le cache"""
+        deleted, _ = LLMCacheEntry.objects.all().delete()
+        return deleted
+
+    def _evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées au-delà de la taille max"""
+        evicted = 0
+        if self.ttl:
+            expired_before = timezone.now() - timedelta(seconds=self.ttl)
+            evicted += LLMCacheEntry.objects.filter(created_at__lt=expired_before).delete()[0]
+
+        if self.max_entries and LLMCacheEntry.objects.count() > self.max_entries:
+            stale_ids = list(
+                LLMCacheEntry.objects.order_by('-last_accessed_at')
+                .values_list('id', flat=True)[self.max_entries:]
+            )
+            evicted += LLMCacheEntry.objects.filter(id__in=stale_ids).delete()[0]
+
+        if evicted:
+            self._incr('evictions', evicted)
+
+    @classmethod
+    def _incr(cls, counter: str, value: int = 1):
+        with cls._stats_lock:
+            cls._stats[counter] += value
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Compteurs du processus + état de la table"""
+        with cls._stats_lock:
+            stats = dict(cls._stats)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups * 100, 2) if lookups else 0
+
+        try:
+            aggregate = LLMCacheEntry.objects.aggregate(total_hits=Sum('hit_count'))
+            stats['entries'] = LLMCacheEntry.objects.count()
+            stats['total_hits'] = aggregate['total_hits'] or 0
+        except DatabaseError:
+            stats['entries'] = None
+            stats['total_hits'] = None
+
+        return stats
@@ -1,49 +1,555 @@
 # backend/core/services/llm_client.py
+import asyncio
 import logging
+import threading
 import time
-from typing import Dict, Any
-from decouple import config
-import cohere
+from concurrent.futures import Future
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .circuit_breaker import get_llm_circuit_breaker
+from .llm_backends import BaseLLMBackend, estimate_tokens, get_llm_backend
+from .llm_cache import LLMResponseCache
+from .llm_usage import LLMUsageTracker
+from .rate_limiter import (
+    RateLimitTimeout, backoff_delay, get_llm_rate_limiter, parse_retry_after
+)
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Appels synchrones identiques en vol, partagés par tous les LLMClient du processus
+_llm_single_flight = SingleFlight('LLM')
+
+
+def get_llm_single_flight() -> SingleFlight:
+    return _llm_single_flight
+
+
+def get_task_route(task: str = "") -> Dict[str, Any]:
+    """Modèle, timeout et max_tokens d'une tâche d'après settings.LLM_TASK_ROUTES"""
+    route = settings.LLM_TASK_ROUTES.get(task, {}) if task else {}
+    if task and not route:
+        logger.warning(f"Tâche LLM sans route: {task}, modèle par défaut")
+    return {
+        'model': route.get('model') or settings.LLM_DEFAULT_MODEL,
+        'timeout': route.get('timeout'),
+        'max_tokens': route.get('max_tokens'),
+    }
+
+
+def route_call(task: str, model: Optional[str], json_mode: bool) -> Tuple[str, Dict[str, Any]]:
+    """Modèle effectif et options du backend (json_mode, max_tokens, timeout) d'un appel"""
+    route = get_task_route(task)
+    options = {'json_mode': json_mode, 'max_tokens': route['max_tokens'], 'timeout': route['timeout']}
+    return model or route['model'], options
+
+
+def response_cache_key(backend_name: str, model: str, system_prompt: str, prompt: str,
+                       options: Optional[Dict[str, Any]] = None) -> str:
+    """Clé de cache d'un appel: json_mode et max_tokens changent la complétion, ils en font partie"""
+    options = options or {}
+    variant = f"{backend_name}:{model}:json={int(bool(options.get('json_mode')))}:max_tokens={options.get('max_tokens') or ''}"
+    return LLMResponseCache.make_key(variant, system_prompt, prompt)
+
+
+def build_messages(prompt: str, system_prompt: str = "") -> List[Dict[str, str]]:
+    """Messages au format chat (system + user)"""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def retry_after_of(error: Exception) -> Optional[float]:
+    """Délai Retry-After porté par une erreur API, si présent"""
+    headers = getattr(error, 'headers', None) or {}
+    return parse_retry_after(headers.get('retry-after') or headers.get('Retry-After'))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Les erreurs 4xx (hors 408/429) ne servent à rien d'être rejouées"""
+    status_code = getattr(error, 'status_code', None)
+    return status_code is None or status_code in (408, 429) or status_code >= 500
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """Panne côté fournisseur (réseau, timeout, 5xx): compte pour le disjoncteur"""
+    status_code = getattr(error, 'status_code', None)
+    return status_code is None or status_code >= 500
+
+
+def record_call_error(circuit_breaker, rate_limiter, error: Exception, attempt: int) -> bool:
+    """Issue d'un appel en erreur pour le disjoncteur. Un 429 est neutre (le fournisseur
+    répond) et suspend le limiteur de débit: c'est la seule attente avant la tentative suivante.
+    Retourne True pour un 429."""
+    if getattr(error, 'status_code', None) == 429:
+        circuit_breaker.release()
+        rate_limiter.block_for(backoff_delay(attempt, retry_after_of(error)))
+        return True
+    if is_provider_failure(error):
+        circuit_breaker.record_failure(str(error))
+    else:
+        circuit_breaker.record_success()
+    return False
+
+
+def circuit_open_result() -> Dict[str, Any]:
+    """Résultat immédiat quand le disjoncteur refuse l'appel"""
+    return {
+        "success": False,
+        "error": "Fournisseur LLM indisponible (circuit ouvert)",
+        "circuit_open": True
+    }
+
+
+def late_result(deadline: float, saturated: bool = False) -> Dict[str, Any]:
+    """Résultat d'un appel asynchrone hors échéance; `saturated`: aucun créneau libre à temps"""
+    if saturated:
+        error = f"Capacité LLM saturée: aucun créneau libre en {deadline}s"
+    else:
+        error = f"Échéance de {deadline}s dépassée"
+    return {"success": False, "error": error, "late": True, "saturated": saturated}
+
+
+def budget_exceeded_result() -> Dict[str, Any]:
+    """Résultat immédiat pour un appel non critique quand le budget du jour est épuisé"""
+    return {
+        "success": False,
+        "error": "Budget journalier de tokens LLM épuisé",
+        "budget_exceeded": True
+    }
+
+
 class LLMClient:
-    def __init__(self):
-        self.api_key = config('COHERE_API_KEY')
-        self.client = cohere.ClientV2(api_key=self.api_key)
-        self.timeout = 30
+    def __init__(self, backend: Optional[BaseLLMBackend] = None):
+        # Backend choisi par settings.LLM_BACKEND: cohere, local ou fake
+        self.backend = backend or get_llm_backend()
         self.max_retries = 3
+        self.cache = LLMResponseCache() if settings.LLM_CACHE_ENABLED else None
+        self.rate_limiter = get_llm_rate_limiter()
+        self.circuit_breaker = get_llm_circuit_breaker()
+        if self.circuit_breaker.health_probe is None:
+            self.circuit_breaker.health_probe = self.backend.health_check
+        self.usage = LLMUsageTracker()
 
     def call_api(
         self,
         prompt: str,
         system_prompt: str = "",
-        model: str = "command-a-03-2025"  # modèle actif recommandé
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        service: str = "",
+        critical: bool = True,
+        json_mode: bool = False,
+        task: str = ""
+    ) -> Dict[str, Any]:
+        """`service` identifie l'appelant dans LLMCallLog; un appel non `critical`
+        est refusé (et bascule sur le fallback de l'appelant) une fois le budget épuisé.
+        `json_mode` demande une sortie JSON native au fournisseur.
+        `task` choisit modèle, timeout et max_tokens dans LLM_TASK_ROUTES (`model` explicite prioritaire)."""
+        model, options = route_call(task, model, json_mode)
+        started = time.monotonic()
+        result = self._call(prompt, system_prompt, model, use_cache, critical, options)
+        if not result.get('budget_exceeded'):
+            self.usage.record(service, model, self.backend.name, result, time.monotonic() - started, task=task)
+        return result
+
+    def _call(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool,
+        critical: bool,
+        options: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+        if not use_cache:
+            if not critical and self.usage.budget_exceeded():
+                return budget_exceeded_result()
+            return self._call_provider(prompt, system_prompt, model, options=options)
+
+        # Réponse déjà connue pour ce prompt exact: pas d'appel réseau
+        cache_key = response_cache_key(self.backend.name, model, system_prompt, prompt, options)
+        if self.cache:
+            cached_content = self.cache.get(cache_key)
+            if cached_content is not None:
+                logger.info(f"Cache LLM hit ({cache_key[:12]})")
+                return {"success": True, "content": cached_content, "cached": True, "cache_key": cache_key}
 
-        logger.info(f"Using Cohere API key: {self.api_key[:20]}...")
+        if not critical and self.usage.budget_exceeded():
+            return budget_exceeded_result()
+
+        # Même prompt déjà en vol dans ce processus: on attend son résultat
+        result, shared = _llm_single_flight.do(
+            cache_key,
+            lambda: self._call_provider(prompt, system_prompt, model, cache_key, options)
+        )
+        if shared:
+            return dict(result, coalesced=True)
+        return result
+
+    def _call_provider(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        cache_key: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Appel réel au fournisseur: disjoncteur, limiteur de débit, retries"""
+        messages = build_messages(prompt, system_prompt)
+        estimated_tokens = estimate_tokens(system_prompt, prompt) + settings.LLM_ESTIMATED_OUTPUT_TOKENS
 
         for attempt in range(self.max_retries):
+            # Fournisseur en panne: on rend la main tout de suite aux fallbacks des services
+            if not self.circuit_breaker.allow_request():
+                return circuit_open_result()
+
             try:
-                response = self.client.chat(
-                    model=model,
-                    messages=messages
-                )
+                self.rate_limiter.acquire(estimated_tokens, timeout=settings.LLM_RATE_LIMIT_MAX_WAIT)
+                response = self.backend.chat(model, messages, **(options or {}))
 
-                gen_text = ""
-                if response.message and response.message.content:
-                    gen_text = response.message.content[0].text
+                used_tokens = response['input_tokens'] + response['output_tokens']
+                if used_tokens:
+                    self.rate_limiter.consume_tokens(used_tokens - estimated_tokens)
 
-                return {"success": True, "content": gen_text}
+                self.circuit_breaker.record_success()
+                gen_text = response['text']
+
+                result = {
+                    "success": True,
+                    "content": gen_text,
+                    "input_tokens": response['input_tokens'],
+                    "output_tokens": response['output_tokens']
+                }
+                if self.cache and cache_key and gen_text:
+                    self.cache.set(cache_key, model, gen_text)
+                    result["cache_key"] = cache_key
+                return result
+
+            except RateLimitTimeout as e:
+                self.circuit_breaker.release()
+                logger.error(f"API error: {str(e)}")
+                return {"success": False, "error": str(e)}
 
             except Exception as e:
                 logger.error(f"API error: {str(e)}")
-                if attempt == self.max_retries - 1:
+                rate_limited = record_call_error(self.circuit_breaker, self.rate_limiter, e, attempt)
+                if attempt == self.max_retries - 1 or not is_retryable(e):
                     return {"success": False, "error": str(e)}
-                time.sleep(2)
+                if not rate_limited:
+                    time.sleep(backoff_delay(attempt, retry_after_of(e)))
+
+        return {"success": False, "error": "Max retries exceeded"}
+
+    def invalidate(self, result: Dict[str, Any]):
+        """Retire du cache la réponse d'un résultat de call_api/stream_api (contenu inexploitable)"""
+        if self.cache and result.get('cache_key'):
+            self.cache.delete(result['cache_key'])
+            logger.info(f"Réponse LLM retirée du cache ({result['cache_key'][:12]})")
+
+    def stream_api(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        service: str = "",
+        critical: bool = True,
+        json_mode: bool = False,
+        task: str = ""
+    ) -> Iterator[Dict[str, Any]]:
+        """Version streaming de call_api.
+
+        Génère des événements {'type': 'delta', 'text'} au fil de la génération
+        puis un dernier {'type': 'done', 'result'} où `result` suit le contrat de call_api.
+        """
+        model, options = route_call(task, model, json_mode)
+        started = time.monotonic()
+        result = None
+        try:
+            for event in self._stream(prompt, system_prompt, model, use_cache, critical, options):
+                if event['type'] == 'done':
+                    result = event['result']
+                yield event
+        finally:
+            if result and not result.get('budget_exceeded'):
+                self.usage.record(service, model, self.backend.name, result, time.monotonic() - started, task=task)
+
+    def _stream(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool,
+        critical: bool,
+        options: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        cache_key = None
+        if self.cache and use_cache:
+            cache_key = response_cache_key(self.backend.name, model, system_prompt, prompt, options)
+            cached_content = self.cache.get(cache_key)
+            if cached_content is not None:
+                yield {'type': 'delta', 'text': cached_content}
+                yield {'type': 'done', 'result': {
+                    "success": True, "content": cached_content, "cached": True, "cache_key": cache_key
+                }}
+                return
+
+        if not critical and self.usage.budget_exceeded():
+            yield {'type': 'done', 'result': budget_exceeded_result()}
+            return
+
+        messages = build_messages(prompt, system_prompt)
+        estimated_tokens = estimate_tokens(system_prompt, prompt) + settings.LLM_ESTIMATED_OUTPUT_TOKENS
+
+        for attempt in range(self.max_retries):
+            if not self.circuit_breaker.allow_request():
+                yield {'type': 'done', 'result': circuit_open_result()}
+                return
+
+            parts = []
+            # Créneau du disjoncteur acquis: une issue est enregistrée, sinon il est rendu
+            # (client SSE déconnecté: GeneratorExit, hors Exception)
+            outcome_recorded = False
+            try:
+                self.rate_limiter.acquire(estimated_tokens, timeout=settings.LLM_RATE_LIMIT_MAX_WAIT)
+                usage = {'input_tokens': 0, 'output_tokens': 0}
+                for event in self.backend.stream(model, messages, **(options or {})):
+                    if event['type'] == 'delta':
+                        parts.append(event['text'])
+                        yield event
+                    elif event['type'] == 'usage':
+                        usage = event
+
+                used_tokens = usage['input_tokens'] + usage['output_tokens']
+                if used_tokens:
+                    self.rate_limiter.consume_tokens(used_tokens - estimated_tokens)
+                self.circuit_breaker.record_success()
+                outcome_recorded = True
+
+                gen_text = "".join(parts)
+                result = {
+                    "success": True,
+                    "content": gen_text,
+                    "input_tokens": usage['input_tokens'],
+                    "output_tokens": usage['output_tokens']
+                }
+                if cache_key and gen_text:
+                    self.cache.set(cache_key, model, gen_text)
+                    result["cache_key"] = cache_key
+
+                yield {'type': 'done', 'result': result}
+                return
+
+            except RateLimitTimeout as e:
+                self.circuit_breaker.release()
+                outcome_recorded = True
+                logger.error(f"API error (stream): {str(e)}")
+                yield {'type': 'done', 'result': {"success": False, "error": str(e)}}
+                return
+
+            except Exception as e:
+                logger.error(f"API error (stream): {str(e)}")
+                rate_limited = record_call_error(self.circuit_breaker, self.rate_limiter, e, attempt)
+                outcome_recorded = True
+                # Des fragments sont déjà partis chez le client: pas de nouvelle tentative
+                if parts or attempt == self.max_retries - 1 or not is_retryable(e):
+                    yield {'type': 'done', 'result': {"success": False, "error": str(e)}}
+                    return
+                if not rate_limited:
+                    time.sleep(backoff_delay(attempt, retry_after_of(e)))
+            finally:
+                if not outcome_recorded:
+                    self.circuit_breaker.release()
+
+
+
+class AsyncLLMClient:
+    """Client LLM asynchrone à concurrence bornée.
+
+    Même contrat de résultat que LLMClient.call_api (cache, limiteur de débit, disjoncteur
+    et journal d'usage communs), pour lancer plusieurs prompts indépendants en parallèle.
+    Les coroutines tournent sur une boucle d'événements dédiée (thread 'llm-async'):
+    le code synchrone y soumet ses appels avec submit() ou run_many().
+    """
+
+    def __init__(self, max_concurrency: int = None, timeout: float = None,
+                 backend: Optional[BaseLLMBackend] = None):
+        self.backend = backend or get_llm_backend()
+        self.timeout = timeout or settings.LLM_ASYNC_TIMEOUT
+        self.max_concurrency = max_concurrency or settings.LLM_ASYNC_MAX_CONCURRENCY
+        self.max_retries = 3
+        self.cache = LLMResponseCache() if settings.LLM_CACHE_ENABLED else None
+        self.rate_limiter = get_llm_rate_limiter()
+        self.circuit_breaker = get_llm_circuit_breaker()
+        self.usage = LLMUsageTracker()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """Boucle du client, démarrée au premier appel"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-async', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, **call_kwargs) -> Future:
+        """Planifie un appel (arguments de call_api, dont `deadline`) et rend la main aussitôt"""
+        return asyncio.run_coroutine_threadsafe(self.call_api(**call_kwargs), self._event_loop())
+
+    def run_many(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Point d'entrée synchrone: appels en parallèle, résultats dans l'ordre"""
+        return [future.result() for future in [self.submit(**kwargs) for kwargs in calls]]
+
+    async def call_many(self, calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Exécute plusieurs appels (kwargs de call_api) en parallèle, résultats dans l'ordre"""
+        return await asyncio.gather(*(self.call_api(**kwargs) for kwargs in calls))
+
+    async def call_api(
+        self,
+        prompt: str,
+        system_prompt: str = "",
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        service: str = "",
+        critical: bool = True,
+        json_mode: bool = False,
+        task: str = "",
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Comme LLMClient.call_api. Avec `deadline` (secondes), l'appel est abandonné s'il n'a pas
+        abouti `deadline` secondes après avoir obtenu un créneau (ou s'il n'en obtient aucun dans
+        ce délai): résultat en échec avec `late` (et `saturated` faute de créneau)."""
+        model, options = route_call(task, model, json_mode)
+        started = time.monotonic()
+        result = await self._call(prompt, system_prompt, model, use_cache, critical, options, deadline)
+        if not result.get('budget_exceeded') and not result.get('saturated'):
+            await sync_to_async(self.usage.record)(
+                service, model, self.backend.name, result, time.monotonic() - started, task=task
+            )
+        return result
+
+    async def _call(
+        self,
+        prompt: str,
+        system_prompt: str,
+        model: str,
+        use_cache: bool,
+        critical: bool,
+        options: Optional[Dict[str, Any]] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        options = options or {}
+        cache_key = None
+        if self.cache and use_cache:
+            cache_key = response_cache_key(self.backend.name, model, system_prompt, prompt, options)
+            cached_content = await sync_to_async(self.cache.get)(cache_key)
+            if cached_content is not None:
+                return {"success": True, "content": cached_content, "cached": True, "cache_key": cache_key}
+
+        if not critical and await sync_to_async(self.usage.budget_exceeded)():
+            return budget_exceeded_result()
+
+        messages = build_messages(prompt, system_prompt)
+        estimated_tokens = estimate_tokens(system_prompt, prompt) + settings.LLM_ESTIMATED_OUTPUT_TOKENS
+
+        queued = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=deadline)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Aucun créneau LLM libre en {deadline}s (LLM_ASYNC_MAX_CONCURRENCY={self.max_concurrency})"
+            )
+            return late_result(deadline, saturated=True)
+        waited = time.monotonic() - queued
+        if waited > 1:
+            logger.info(f"Appel LLM asynchrone: {waited:.1f}s d'attente d'un créneau")
+        try:
+            attempts = self._attempts(model, messages, estimated_tokens, cache_key, options)
+            if deadline is None:
+                return await attempts
+            # L'échéance court à partir de l'obtention du créneau, pas de l'attente en file
+            return await asyncio.wait_for(attempts, timeout=deadline)
+        except asyncio.TimeoutError:
+            return late_result(deadline)
+        finally:
+            self._semaphore.release()
+
+    async def _attempts(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        estimated_tokens: int,
+        cache_key: Optional[str],
+        options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Appel au fournisseur: disjoncteur, limiteur de débit, retries"""
+        # Timeout de la route de la tâche, sinon celui du client
+        timeout = options.get('timeout') or self.timeout
+        # Appels bloquants (verrou de fichier, sonde de santé) hors de la boucle d'événements
+        allow_request = sync_to_async(self.circuit_breaker.allow_request, thread_sensitive=False)
+        acquire = sync_to_async(self.rate_limiter.acquire, thread_sensitive=False)
+
+        for attempt in range(self.max_retries):
+            if not await allow_request():
+                return circuit_open_result()
+
+            rate_limited = False
+            retry_after = None
+            outcome_recorded = False
+            try:
+                await acquire(estimated_tokens, timeout=settings.LLM_RATE_LIMIT_MAX_WAIT)
+                response = await asyncio.wait_for(self.backend.achat(model, messages, **options), timeout=timeout)
+
+                used_tokens = response['input_tokens'] + response['output_tokens']
+                if used_tokens:
+                    self.rate_limiter.consume_tokens(used_tokens - estimated_tokens)
+                self.circuit_breaker.record_success()
+                outcome_recorded = True
+                gen_text = response['text']
+
+                result = {
+                    "success": True,
+                    "content": gen_text,
+                    "input_tokens": response['input_tokens'],
+                    "output_tokens": response['output_tokens']
+                }
+                if cache_key and gen_text:
+                    await sync_to_async(self.cache.set)(cache_key, model, gen_text)
+                    result["cache_key"] = cache_key
+                return result
+
+            except RateLimitTimeout as e:
+                self.circuit_breaker.release()
+                outcome_recorded = True
+                logger.error(f"API error (async): {str(e)}")
+                return {"success": False, "error": str(e)}
+            except asyncio.TimeoutError:
+                error = f"Timeout après {timeout}s"
+                self.circuit_breaker.record_failure(error)
+                outcome_recorded = True
+                retryable = True
+            except Exception as e:
+                error = str(e)
+                retry_after = retry_after_of(e)
+                rate_limited = record_call_error(self.circuit_breaker, self.rate_limiter, e, attempt)
+                outcome_recorded = True
+                retryable = is_retryable(e)
+            finally:
+                # Appel annulé (CancelledError): le créneau du disjoncteur est rendu
+                if not outcome_recorded:
+                    self.circuit_breaker.release()
+
+            logger.error(f"API error (async): {error}")
+            if attempt == self.max_retries - 1 or not retryable:
+                return {"success": False, "error": error}
+            if not rate_limited:
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
 
         return {"success": False, "error": "Max retries exceeded"}
@@ -0,0 +1,306 @@
+# backend/core/services/llm_json.py
+"""
+Sorties structurées des LLM: parseur JSON tolérant, schémas par tâche,
+réparation ciblée et suivi des échecs de parsing
+"""
+import json
+import logging
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .llm_client import LLMClient
+
+logger = logging.getLogger(__name__)
+
+# Taille maximale du fragment renvoyé au modèle pour réparation
+REPAIR_MAX_CHARS = 4000
+
+TICKET_CATEGORIES = ['technique', 'commercial', 'facturation', 'autre']
+TICKET_PRIORITIES = ['low', 'medium', 'high', 'urgent']
+TICKET_PRIORITY_LABELS = ['Bas', 'Normal', 'Haute', 'Urgente']
+TICKET_STATUSES = ['nouveau', 'ouvert', 'rappel_en_attente', 'en_attente_de_cloture', 'cloture']
+
+# Schéma par tâche: champ -> type attendu, obligatoire, valeur par défaut, valeurs permises
+SCHEMAS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'ticket_analysis': {
+        'intention': {'type': str, 'required': True},
+        'category': {'type': str, 'required': True, 'choices': TICKET_CATEGORIES, 'default': 'technique'},
+        'priority': {'type': str, 'required': True, 'choices': TICKET_PRIORITIES, 'default': 'medium'},
+        'priority_label': {'type': str, 'choices': TICKET_PRIORITY_LABELS, 'default': 'Normal'},
+        'recommended_status': {'type': str, 'choices': TICKET_STATUSES, 'default': 'ouvert'},
+        'status_reason': {'type': str, 'default': 'Ticket en cours de traitement'},
+        'estimated_time': {'type': str, 'default': '30 minutes'},
+        'urgency_indicators': {'type': list, 'default': []},
+        'next_actions': {'type': list, 'default': ['Analyser le problème', 'Proposer une solution']},
+    },
+    'ticket_reply': {
+        'response_text': {'type': str, 'required': True},
+        'solution_steps': {'type': list, 'default': ['En cours de traitement']},
+    },
+    'kb_article': {
+        'should_create': {'type': bool, 'required': True},
+        'reason': {'type': str, 'default': ''},
+        'title': {'type': str, 'default': ''},
+        'content': {'type': str, 'default': ''},
+        'category': {'type': str, 'default': 'Procédures Internes'},
+    },
+    'lead_generation': {
+        'leads': {'type': list, 'required': True},
+    },
+}
+# Analyse et réponse client en un seul appel (TICKET_ANALYSIS_MODE = 'single')
+SCHEMAS['ticket_analysis_with_reply'] = {**SCHEMAS['ticket_analysis'], **SCHEMAS['ticket_reply']}
+
+
+class LLMJSONError(ValueError):
+    """Réponse LLM inexploitable; `fragment` est la partie à faire réparer"""
+
+    def __init__(self, message: str, fragment: str = ""):
+        super().__init__(message)
+        self.fragment = fragment
+
+
+def _string_state(char: str, in_string: bool, escaped: bool) -> Tuple[bool, bool]:
+    """État (dans une chaîne, échappement en cours) après le caractère `char`"""
+    if in_string:
+        if escaped:
+            return True, False
+        if char == '\\':
+            return True, True
+        return char != '"', False
+    return char == '"', False
+
+
+def _scan(text: str, start: int) -> Tuple[int, List[str], bool]:
+    """Parcourt un objet JSON depuis `start`: (fin, fermetures manquantes, chaîne ouverte)"""
+    closers = {'{': '}', '[': ']'}
+    stack = []
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        was_in_string = in_string
+        in_string, escaped = _string_state(char, in_string, escaped)
+        if was_in_string or in_string:
+            continue
+        if char in closers:
+            stack.append(closers[char])
+        elif char in '}]':
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                return index + 1, [], False
+    return len(text), list(reversed(stack)), in_string
+
+
+def _segments(text: str) -> List[Tuple[str, bool]]:
+    """Découpe `text` en (segment, est_une_chaîne), guillemets compris dans les chaînes"""
+    segments: List[Tuple[str, bool]] = []
+    in_string = escaped = False
+    for char in text:
+        was_in_string = in_string
+        in_string, escaped = _string_state(char, in_string, escaped)
+        inside = was_in_string or in_string
+        if segments and segments[-1][1] == inside:
+            segments[-1] = (segments[-1][0] + char, inside)
+        else:
+            segments.append((char, inside))
+    return segments
+
+
+def _relax(fragment: str) -> str:
+    """Corrections sûres des écarts fréquents (virgules finales, littéraux Python),
+    appliquées hors des chaînes pour ne jamais modifier le texte des valeurs"""
+    relaxed = []
+    for segment, inside in _segments(fragment):
+        if not inside:
+            segment = re.sub(r',(\s*[}\]])', r'\1', segment)
+            segment = re.sub(r':(\s*)True\b', r':\1true', segment)
+            segment = re.sub(r':(\s*)False\b', r':\1false', segment)
+            segment = re.sub(r':(\s*)None\b', r':\1null', segment)
+        relaxed.append(segment)
+    return "".join(relaxed)
+
+
+def _straighten_quotes(fragment: str) -> str:
+    """Guillemets typographiques utilisés comme délimiteurs (dernier recours: touche aussi les valeurs)"""
+    return fragment.replace('“', '"').replace('”', '"')
+
+
+def extract_json(text: str) -> Any:
+    """Premier objet JSON d'une réponse LLM, tolérant aux balises markdown,
+    au texte autour, aux virgules finales et aux réponses tronquées"""
+    if not text or not text.strip():
+        raise LLMJSONError("Réponse IA vide")
+
+    cleaned = text.strip()
+    if cleaned.startswith('```'):
+        cleaned = re.sub(r'^```[a-zA-Z]*\s*', '', cleaned)
+        cleaned = re.sub(r'\s*```\s*$', '', cleaned)
+
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        pass
+
+    match = re.search(r'[{\[]', cleaned)
+    if not match:
+        raise LLMJSONError("Aucun JSON trouvé dans la réponse IA", cleaned)
+
+    end, missing, open_string = _scan(cleaned, match.start())
+    fragment = cleaned[match.start():end]
+    candidates = [fragment, _relax(fragment)]
+    if missing or open_string:
+        # Réponse tronquée: on referme chaîne et structures ouvertes
+        closing = ('"' if open_string else '') + ''.join(missing)
+        candidates.append(_relax(fragment.rstrip().rstrip(',') + closing))
+    if '“' in fragment or '”' in fragment:
+        candidates.append(_relax(_straighten_quotes(fragment)))
+
+    error = None
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = e
+    raise LLMJSONError(f"JSON invalide: {error}", fragment)
+
+
+def validate(data: Any, task: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Applique le schéma de la tâche: (données normalisées, erreurs bloquantes)"""
+    schema = SCHEMAS[task]
+    if not isinstance(data, dict):
+        return {}, [f"objet JSON attendu, reçu {type(data).__name__}"]
+
+    clean = dict(data)
+    errors = []
+    for field, spec in schema.items():
+        value = data.get(field)
+        expected = spec['type']
+        if value is None or not isinstance(value, expected):
+            if expected is bool and isinstance(value, str) and value.lower() in ('true', 'false'):
+                clean[field] = value.lower() == 'true'
+                continue
+            if spec.get('required'):
+                errors.append(f"{field} manquant ou invalide")
+            elif 'default' in spec:
+                clean[field] = spec['default']
+            continue
+
+        choices = spec.get('choices')
+        if choices and value not in choices:
+            normalized = {choice.lower(): choice for choice in choices}.get(str(value).strip().lower())
+            if normalized:
+                clean[field] = normalized
+            else:
+                logger.warning(f"Valeur hors schéma pour {task}.{field}: {value!r}")
+                clean[field] = spec.get('default', choices[0])
+    return clean, errors
+
+
+class StructuredOutputStats:
+    """Compteurs de parsing par tâche (processus courant) pour le monitoring"""
+
+    _stats: Dict[str, Dict[str, int]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def incr(cls, task: str, key: str, amount: int = 1):
+        with cls._lock:
+            stats = cls._stats.setdefault(task, {
+                'responses': 0, 'parsed': 0, 'repaired': 0, 'failed': 0, 'wasted_tokens': 0
+            })
+            stats[key] += amount
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        with cls._lock:
+            tasks = {}
+            for task, stats in cls._stats.items():
+                responses = stats['responses'] or 1
+                tasks[task] = dict(
+                    stats,
+                    first_pass_failure_rate=round((stats['repaired'] + stats['failed']) / responses, 4),
+                    failure_rate=round(stats['failed'] / responses, 4),
+                )
+            return tasks
+
+
+class StructuredOutputService:
+    """Appel LLM en mode JSON, validation par schéma et une seule réparation ciblée"""
+
+    def __init__(self, llm_client: LLMClient):
+        self.llm_client = llm_client
+
+    def call(self, schema: str, prompt: str, system_prompt: str = "", **call_kwargs) -> Dict[str, Any]:
+        """Comme call_api (mêmes arguments, dont `task` pour le routage), avec `data`
+        validé par le schéma `schema` en cas de succès. Un échec de parsing après
+        réparation donne success=False et parse_failed=True."""
+        result = self.llm_client.call_api(prompt, system_prompt, json_mode=True, **call_kwargs)
+        return self.parse(schema, result, service=call_kwargs.get('service', ''))
+
+    def parse(self, schema: str, result: Dict[str, Any], service: str = "") -> Dict[str, Any]:
+        """Valide un résultat de call_api/stream_api déjà obtenu, avec réparation si besoin"""
+        if not result.get('success'):
+            return result
+
+        StructuredOutputStats.incr(schema, 'responses')
+        content = result.get('content', '')
+        try:
+            data, errors = validate(extract_json(content), schema)
+            if not errors:
+                StructuredOutputStats.incr(schema, 'parsed')
+                return dict(result, data=data)
+            error = LLMJSONError("; ".join(errors), content)
+        except LLMJSONError as e:
+            error = e
+
+        # L'appel initial est perdu si la réparation échoue aussi
+        StructuredOutputStats.incr(schema, 'wasted_tokens', self._tokens(result))
+        logger.warning(f"Sortie {schema} invalide ({error}), tentative de réparation")
+
+        repaired = self._repair(schema, error, service)
+        if repaired is not None:
+            StructuredOutputStats.incr(schema, 'repaired')
+            return dict(result, data=repaired, repaired=True)
+
+        StructuredOutputStats.incr(schema, 'failed')
+        logger.error(f"Sortie {schema} irréparable: {content[:500]}")
+        # Sinon chaque nouvel essai de ce prompt resservirait la même sortie invalide jusqu'au TTL
+        self.llm_client.invalidate(result)
+        return dict(result, success=False, error=f"Réponse IA invalide: {error}", parse_failed=True)
+
+    def _repair(self, schema: str, error: LLMJSONError, service: str) -> Optional[Dict[str, Any]]:
+        """Renvoie uniquement le fragment fautif au modèle, pas le prompt d'origine"""
+        fields = ", ".join(
+            f"{field}{' (obligatoire)' if spec.get('required') else ''}"
+            for field, spec in SCHEMAS[schema].items()
+        )
+        prompt = f"""
+        RÉPARATION JSON: le fragment ci-dessous est invalide ({error}).
+        Corrige-le sans inventer de contenu et renvoie uniquement l'objet JSON avec les champs: {fields}.
+
+        FRAGMENT:
+        {error.fragment[:REPAIR_MAX_CHARS]}
+        """
+        system_prompt = "Tu corriges du JSON. Réponds uniquement avec l'objet JSON corrigé."
+
+        result = self.llm_client.call_api(
+            prompt, system_prompt, service=f"{service or schema}_repair"[:50], json_mode=True, task='json_repair'
+        )
+        if not result.get('success'):
+            return None
+        try:
+            data, errors = validate(extract_json(result.get('content', '')), schema)
+        except LLMJSONError:
+            errors = ['JSON invalide']
+        if errors:
+            StructuredOutputStats.incr(schema, 'wasted_tokens', self._tokens(result))
+            self.llm_client.invalidate(result)
+            return None
+        return data
+
+    @staticmethod
+    def _tokens(result: Dict[str, Any]) -> int:
+        if result.get('cached') or result.get('coalesced'):
+            return 0
+        return int(result.get('input_tokens', 0)) + int(result.get('output_tokens', 0))
@@ -0,0 +1,162 @@
+# backend/core/services/llm_usage.py
+"""
+Comptabilité des appels LLM (tokens, latence, coût) et budget journalier
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+from ..models import LLMCallLog
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUsageTracker:
+    """Enregistre chaque appel dans LLMCallLog et applique LLM_DAILY_TOKEN_BUDGET"""
+
+    # Consommation du jour mise en cache quelques secondes pour éviter une requête par appel
+    _today_cache = {'value': 0, 'expires': 0.0, 'day': None}
+    _today_lock = threading.Lock()
+
+    def record(
+        self,
+        service: str,
+        model: str,
+        backend: str,
+        result: Dict[str, Any],
+        latency: float,
+        task: str = ""
+    ):
+        """Enregistre un appel terminé (succès, échec ou réponse servie sans appel réseau)"""
+        served_locally = bool(result.get('cached') or result.get('coalesced'))
+        input_tokens = 0 if served_locally else int(result.get('input_tokens', 0))
+        output_tokens = 0 if served_locally else int(result.get('output_tokens', 0))
+
+        try:
+            LLMCallLog.objects.create(
+                service=(service or '')[:50],
+                task=(task or '')[:50],
+                model=(model or '')[:100],
+                backend=(backend or '')[:20],
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                latency_ms=int(latency * 1000),
+                success=bool(result.get('success')),
+                cached=served_locally
+            )
+        except DatabaseError as e:
+            logger.warning(f"Journal des appels LLM indisponible: {e}")
+            return
+
+        with self._today_lock:
+            self._today_cache['value'] += input_tokens + output_tokens
+
+    def tokens_used_today(self) -> int:
+        """Tokens consommés depuis minuit (heure locale)"""
+        today = timezone.localdate()
+        with self._today_lock:
+            cache = self._today_cache
+            if cache['day'] == today and cache['expires'] > time.monotonic():
+                return cache['value']
+
+        start_of_day = timezone.make_aware(datetime.combine(today, datetime.min.time()))
+        try:
+            totals = LLMCallLog.objects.filter(created_at__gte=start_of_day).aggregate(
+                input_tokens=Sum('input_tokens'),
+                output_tokens=Sum('output_tokens')
+            )
+        except DatabaseError as e:
+            logger.warning(f"Journal des appels LLM indisponible: {e}")
+            return 0
+        used = (totals['input_tokens'] or 0) + (totals['output_tokens'] or 0)
+
+        with self._today_lock:
+            self._today_cache.update(value=used, day=today, expires=time.monotonic() + 30)
+        return used
+
+    def budget_exceeded(self) -> bool:
+        """True si le budget journalier (0 = illimité) est épuisé"""
+        budget = settings.LLM_DAILY_TOKEN_BUDGET
+        return bool(budget) and self.tokens_used_today() >= budget
+
+    def summary(self, hours: int = 24, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Agrégats glissants sur les `hours` dernières heures: total, par service, par modèle"""
+        since = since or timezone.now() - timedelta(hours=hours)
+        calls = LLMCallLog.objects.filter(created_at__gte=since)
+        aggregates = {
+            'calls': Count('id'),
+            'input_tokens': Sum('input_tokens'),
+            'output_tokens': Sum('output_tokens'),
+            'avg_latency_ms': Avg('latency_ms'),
+            'max_latency_ms': Max('latency_ms'),
+        }
+
+        totals = self._format(calls.aggregate(**aggregates))
+        totals['cached_calls'] = calls.filter(cached=True).count()
+        totals['failed_calls'] = calls.filter(success=False).count()
+
+        by_service = {
+            row['service'] or 'inconnu': self._format(row)
+            for row in calls.values('service').annotate(**aggregates).order_by()
+        }
+
+        by_model = {}
+        cost = 0.0
+        for row in calls.values('model').annotate(**aggregates).order_by():
+            stats = self._format(row)
+            stats['estimated_cost'] = self.estimate_cost(row['model'], stats['input_tokens'], stats['output_tokens'])
+            cost += stats['estimated_cost']
+            by_model[row['model']] = stats
+
+        by_task = {}
+        for row in calls.values('task').annotate(**aggregates).order_by():
+            stats = self._format(row)
+            stats['p95_latency_ms'] = self._percentile_latency(calls.filter(task=row['task']), stats['calls'], 0.95)
+            by_task[row['task'] or 'inconnu'] = stats
+
+        totals['estimated_cost'] = round(cost, 4)
+        budget = settings.LLM_DAILY_TOKEN_BUDGET
+        used_today = self.tokens_used_today()
+
+        return {
+            'window_hours': hours,
+            'totals': totals,
+            'by_service': by_service,
+            'by_model': by_model,
+            'by_task': by_task,
+            'budget': {
+                'daily_tokens': budget or None,
+                'used_today': used_today,
+                'remaining': max(0, budget - used_today) if budget else None,
+                'exceeded': self.budget_exceeded(),
+            },
+        }
+
+    @staticmethod
+    def _percentile_latency(calls, count: int, percentile: float) -> int:
+        """Latence au percentile donné (une requête indexée par tâche)"""
+        if not count:
+            return 0
+        index = min(count - 1, int(count * percentile))
+        return calls.order_by('latency_ms').values_list('latency_ms', flat=True)[index]
+
+    @staticmethod
+    def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+        """Coût estimé à partir de LLM_TOKEN_COSTS (prix par 1000 tokens entrée/sortie)"""
+        input_price, output_price = settings.LLM_TOKEN_COSTS.get(model, (0, 0))
+        return round(input_tokens / 1000 * input_price + output_tokens / 1000 * output_price, 4)
+
+    @staticmethod
+    def _format(stats: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'calls': stats['calls'] or 0,
+            'input_tokens': stats['input_tokens'] or 0,
+            'output_tokens': stats['output_tokens'] or 0,
+            'avg_latency_ms': round(stats['avg_latency_ms'] or 0),
+            'max_latency_ms': stats['max_latency_ms'] or 0,
+        }
@@ -0,0 +1,206 @@
+# backend/core/services/prompt_builder.py
+"""
+Construction des prompts de tickets: nettoyage du fil, comptage des tokens et
+résumés d'articles mis en cache pour rester sous LLM_PROMPT_TOKEN_BUDGET
+"""
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List, Optional
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.db import DatabaseError
+from ..models import ArticleSummary
+from .llm_backends import estimate_tokens
+from .llm_client import LLMClient
+
+try:
+    import tiktoken
+except ImportError:  # tokenizer local optionnel, estimation sinon
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_unavailable = False
+
+# Début de l'historique cité ("Le lun. 3 mars 2025, X a écrit :", "On ... wrote:", transferts Outlook)
+QUOTE_HEADER_PATTERNS = [
+    re.compile(r'^\s*Le .{0,200}a écrit\s*:\s*$', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'^\s*On .{0,200}wrote\s*:\s*$', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'^\s*-{2,}\s*(Original Message|Message d\'origine|Message original)\s*-{2,}', re.IGNORECASE | re.MULTILINE),
+    re.compile(r'^\s*(De|From)\s*:.*\n\s*(Envoyé|Sent|Date)\s*:', re.IGNORECASE | re.MULTILINE),
+]
+
+# Début de signature ("-- ", envoi depuis mobile)
+SIGNATURE_PATTERNS = [
+    re.compile(r'^--\s*$', re.MULTILINE),
+    re.compile(r'^\s*(Envoyé de mon|Sent from my) .*$', re.IGNORECASE | re.MULTILINE),
+]
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens avec tiktoken si disponible, estimation (~4 caractères/token) sinon"""
+    global _encoding, _encoding_unavailable
+    if not text:
+        return 0
+    if tiktoken is None or _encoding_unavailable:
+        return estimate_tokens(text)
+    if _encoding is None:
+        try:
+            # Télécharge le fichier BPE au premier appel s'il n'est pas en cache local
+            _encoding = tiktoken.get_encoding(settings.LLM_TOKENIZER_ENCODING)
+        except Exception as e:
+            _encoding_unavailable = True
+            logger.warning(f"Encodage {settings.LLM_TOKENIZER_ENCODING} indisponible, estimation des tokens: {e}")
+            return estimate_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Coupe le texte pour tenir dans `max_tokens`"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    # Approximation proportionnelle, puis ajustement
+    ratio = max_tokens / max(count_tokens(text), 1)
+    cut = text[:int(len(text) * ratio)]
+    while cut and count_tokens(cut + " [...]") > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut.rstrip() + " [...]" if cut else ""
+
+
+def clean_article_body(body: str, content_type: str = '') -> str:
+    """Texte utile d'un article: sans HTML, sans historique cité ni signature"""
+    if not body:
+        return ""
+
+    if 'html' in (content_type or '') or re.search(r'<[a-zA-Z][^>]*>', body):
+        soup = BeautifulSoup(body, 'html.parser')
+        # Historique cité par les clients mail et signatures balisées
+        for tag in soup.find_all(['blockquote', 'script', 'style']):
+            tag.decompose()
+        for tag in soup.select('.gmail_quote, .gmail_signature, .moz-cite-prefix, .moz-signature, #divRplyFwdMsg, #Signature'):
+            tag.decompose()
+        for br in soup.find_all('br'):
+            br.replace_with('\n')
+        text = soup.get_text('\n')
+    else:
+        text = body
+
+    # Lignes citées ("> ...")
+    text = "\n".join(line for line in text.splitlines() if not line.lstrip().startswith('>'))
+
+    cut = len(text)
+    for pattern in QUOTE_HEADER_PATTERNS + SIGNATURE_PATTERNS:
+        match = pattern.search(text)
+        if match and match.start() > 0:
+            cut = min(cut, match.start())
+    text = text[:cut]
+
+    text = re.sub(r'[ \t\xa0]+', ' ', text)
+    text = re.sub(r'\n\s*\n+', '\n\n', text)
+    return text.strip()
+
+
+class TicketPromptBuilder:
+    """Fil de ticket prêt pour le prompt: articles nettoyés, les plus récents en entier,
+    les plus anciens remplacés par leur résumé quand le budget est dépassé"""
+
+    def __init__(self, llm_client: Optional[LLMClient] = None, token_budget: int = None):
+        self.llm_client = llm_client
+        self.token_budget = token_budget or settings.LLM_PROMPT_TOKEN_BUDGET
+        self.recent_articles = settings.LLM_PROMPT_RECENT_ARTICLES
+
+    def build_thread(self, ticket, articles: List[Dict[str, Any]]) -> str:
+        """Contenu du fil de discussion limité à `token_budget` tokens"""
+        initial = clean_article_body(ticket.body)
+        parts = [{'label': 'Message initial', 'text': initial, 'article': None}]
+
+        for article in articles:
+            text = clean_article_body(article.get('body', ''), article.get('content_type', ''))
+            if not text or text == initial:
+                continue
+            parts.append({'label': article.get('from', 'Inconnu'), 'text': text, 'article': article})
+
+        total = sum(self._tokens(part) for part in parts)
+        if total > self.token_budget:
+            # Les articles anciens (hors message initial et derniers échanges) sont résumés
+            older = parts[1:max(1, len(parts) - self.recent_articles)]
+            for part in older:
+                if total <= self.token_budget:
+                    break
+                before = self._tokens(part)
+                part['text'] = self._summary(ticket, part['article'], part['text'])
+                part['label'] += ' (résumé)'
+                total -= before - self._tokens(part)
+
+            if total > self.token_budget:
+                logger.info(f"Fil du ticket {ticket.zammad_id} tronqué ({total} tokens > {self.token_budget})")
+                self._truncate(parts)
+
+        return "\n\n".join(self._format(part) for part in parts if part['text'])
+
+    @staticmethod
+    def _format(part: Dict[str, Any]) -> str:
+        return f"[{part['label']}]: {part['text']}"
+
+    def _tokens(self, part: Dict[str, Any]) -> int:
+        return count_tokens(self._format(part)) if part['text'] else 0
+
+    def _truncate(self, parts: List[Dict[str, Any]]):
+        """Dernier recours: part égale du budget pour chaque article, le surplus des courts revenant aux longs"""
+        remaining = self.token_budget
+        by_size = sorted(parts, key=self._tokens)
+        for index, part in enumerate(by_size):
+            overhead = self._tokens(part) - count_tokens(part['text'])
+            share = remaining // (len(by_size) - index)
+            part['text'] = truncate_to_tokens(part['text'], max(0, share - overhead - 2))
+            remaining -= self._tokens(part)
+
+    def _summary(self, ticket, article: Dict[str, Any], text: str) -> str:
+        """Résumé de l'article, calculé une seule fois par ID d'article"""
+        article_id = article.get('id')
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        max_words = settings.LLM_SUMMARY_MAX_WORDS
+
+        if article_id is not None:
+            try:
+                cached = ArticleSummary.objects.filter(article_id=article_id, content_hash=content_hash).first()
+                if cached:
+                    return cached.summary
+            except DatabaseError as e:
+                logger.warning(f"Résumés d'articles indisponibles: {e}")
+
+        fallback = truncate_to_tokens(text, max_words * 2)
+        if self.llm_client is None:
+            return fallback
+
+        prompt = f"""
+        RÉSUMÉ D'ARTICLE: résume ce message d'un fil de support en {max_words} mots maximum.
+        Garde les faits utiles (problème, versions, erreurs, actions déjà faites, demandes).
+
+        MESSAGE:
+        {truncate_to_tokens(text, self.token_budget)}
+        """
+        system_prompt = "Tu résumes des messages de support de façon factuelle. Réponds uniquement par le résumé."
+        result = self.llm_client.call_api(prompt, system_prompt, service='prompt_builder',
+                                         task='article_summary', critical=False)
+        if not result.get('success') or not result.get('content', '').strip():
+            return fallback
+
+        summary = result['content'].strip()
+        if article_id is not None:
+            try:
+                ArticleSummary.objects.update_or_create(
+                    article_id=article_id,
+                    defaults={
+                        'ticket_zammad_id': ticket.zammad_id,
+                        'content_hash': content_hash,
+                        'summary': summary,
+                        'source_tokens': count_tokens(text),
+                        'summary_tokens': count_tokens(summary),
+                    }
+                )
+            except DatabaseError as e:
+                logger.warning(f"Résumé de l'article {article_id} non enregistré: {e}")
+        return summary
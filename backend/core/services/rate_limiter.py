@@ -0,0 +1,201 @@
+# backend/core/services/rate_limiter.py
+"""
+Limiteur de débit partagé (token bucket) pour les appels LLM
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou fichier, limiteur par processus uniquement
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(Exception):
+    """Levée quand le quota n'a pas pu être obtenu dans le délai imparti"""
+
+
+class TokenBucketRateLimiter:
+    """Deux seaux (requêtes/min et tokens/min) partagés entre threads et workers.
+
+    Backend 'memory': état partagé par les threads du processus.
+    Backend 'file': état dans un fichier JSON protégé par flock, partagé par
+    tous les workers gunicorn de la machine.
+    """
+
+    _memory_states: Dict[str, Dict[str, float]] = {}
+    _memory_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name: str = 'llm',
+        requests_per_minute: int = 60,
+        tokens_per_minute: int = 100000,
+        backend: str = 'file',
+        state_dir: Optional[str] = None
+    ):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.backend = backend if (backend != 'file' or fcntl) else 'memory'
+        self.state_path = os.path.join(state_dir or '/tmp', f'agent_ai_ratelimit_{name}.json')
+        self._thread_lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> float:
+        """Bloque jusqu'à disposer d'une requête et de `tokens` tokens. Retourne l'attente (s)."""
+        tokens = min(max(tokens, 1), self.tokens_per_minute)
+        started = time.monotonic()
+
+        while True:
+            with self._state() as state:
+                now = time.time()
+                self._refill(state, now)
+
+                wait = max(0.0, state['blocked_until'] - now)
+                if not wait:
+                    if state['requests'] >= 1 and state['tokens'] >= tokens:
+                        state['requests'] -= 1
+                        state['tokens'] -= tokens
+                        waited = time.monotonic() - started
+                        if waited > 0.5:
+                            logger.info(f"Rate limiter {self.name}: attente {waited:.1f}s")
+                        return waited
+
+                    wait = max(
+                        (1 - state['requests']) / self._rate(self.requests_per_minute),
+                        (tokens - state['tokens']) / self._rate(self.tokens_per_minute),
+                    )
+
+            if timeout is not None and time.monotonic() - started + wait > timeout:
+                raise RateLimitTimeout(f"Quota {self.name} indisponible avant {timeout}s")
+            time.sleep(min(max(wait, 0.05), 5))
+
+    def consume_tokens(self, tokens: int):
+        """Débite l'écart entre tokens réels et estimés (le seau peut passer en négatif)"""
+        if not tokens:
+            return
+        with self._state() as state:
+            self._refill(state, time.time())
+            state['tokens'] -= tokens
+
+    def block_for(self, seconds: float):
+        """Suspend tous les appels (tous workers) pendant `seconds`, ex. après un 429"""
+        with self._state() as state:
+            state['blocked_until'] = max(state['blocked_until'], time.time() + seconds)
+        logger.warning(f"Rate limiter {self.name}: appels suspendus {seconds:.1f}s")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """État courant pour le monitoring"""
+        with self._state() as state:
+            self._refill(state, time.time())
+            return {
+                'backend': self.backend,
+                'requests_available': round(state['requests'], 2),
+                'tokens_available': round(state['tokens'], 2),
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'blocked_for_seconds': round(max(0.0, state['blocked_until'] - time.time()), 2),
+            }
+
+    @staticmethod
+    def _rate(per_minute: int) -> float:
+        return per_minute / 60.0
+
+    def _refill(self, state: Dict[str, float], now: float):
+        elapsed = max(0.0, now - state['updated_at'])
+        state['requests'] = min(
+            self.requests_per_minute,
+            state['requests'] + elapsed * self._rate(self.requests_per_minute)
+        )
+        state['tokens'] = min(
+            self.tokens_per_minute,
+            state['tokens'] + elapsed * self._rate(self.tokens_per_minute)
+        )
+        state['updated_at'] = now
+
+    def _initial_state(self) -> Dict[str, float]:
+        return {
+            'requests': float(self.requests_per_minute),
+            'tokens': float(self.tokens_per_minute),
+            'updated_at': time.time(),
+            'blocked_until': 0.0,
+        }
+
+    @contextmanager
+    def _state(self):
+        """Section critique: fournit l'état modifiable et le persiste à la sortie"""
+        if self.backend == 'memory':
+            with self._memory_lock:
+                state = self._memory_states.setdefault(self.name, self._initial_state())
+                yield state
+            return
+
+        with self._thread_lock:
+            fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o600)
+            with os.fdopen(fd, 'r+') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    try:
+                        state = json.loads(handle.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    if not state:
+                        state = self._initial_state()
+                    yield state
+                    handle.seek(0)
+                    handle.truncate()
+                    handle.write(json.dumps(state))
+                    handle.flush()
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Délai avant la tentative suivante: Retry-After si fourni, sinon exponentiel avec jitter"""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, 1)
+    delay = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Valeur d'en-tête Retry-After (secondes ou date HTTP) en secondes"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiter: Optional[TokenBucketRateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_llm_rate_limiter() -> TokenBucketRateLimiter:
+    """Limiteur unique du processus pour le fournisseur LLM"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucketRateLimiter(
+                name='llm',
+                requests_per_minute=settings.LLM_RATE_LIMIT_RPM,
+                tokens_per_minute=settings.LLM_RATE_LIMIT_TPM,
+                backend=settings.LLM_RATE_LIMIT_BACKEND,
+                state_dir=settings.LLM_RATE_LIMIT_STATE_DIR,
+            )
+        return _limiter
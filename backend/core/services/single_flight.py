@@ -0,0 +1,53 @@
+# backend/core/services/single_flight.py
+"""
+Coalescence des appels identiques simultanés (single-flight)
+"""
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Le premier appelant d'une clé exécute la fonction, les appelants
+    concurrents de la même clé attendent son résultat au lieu de la relancer."""
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'leaders': 0, 'coalesced': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Retourne (résultat, partagé) où `partagé` indique un résultat obtenu par un autre appelant"""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.stats['leaders'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            logger.info(f"Appel {self.name} identique en cours ({key[:12]}), attente du résultat")
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, inflight=len(self._inflight))
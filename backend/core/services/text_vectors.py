@@ -0,0 +1,82 @@
+# backend/core/services/text_vectors.py
+"""
+Vectorisation TF-IDF locale des tickets (NumPy), partagée par le classifieur de tri
+et l'index de similarité des réponses
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+import numpy as np
+from unidecode import unidecode
+from .prompt_builder import clean_article_body
+
+# Mots vides français et anglais (sans accents, après normalisation)
+STOP_WORDS = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'cette', 'dans', 'de', 'des', 'du', 'elle', 'en', 'est',
+    'et', 'il', 'ils', 'je', 'la', 'le', 'les', 'leur', 'lui', 'ma', 'mais', 'me', 'mes', 'mon',
+    'ne', 'nos', 'notre', 'nous', 'on', 'ou', 'par', 'pas', 'pour', 'qu', 'que', 'qui', 'sa', 'se',
+    'ses', 'son', 'sur', 'ta', 'te', 'tes', 'ton', 'tu', 'un', 'une', 'vos', 'votre', 'vous',
+    'bonjour', 'merci', 'cordialement', 'madame', 'monsieur',
+    'the', 'and', 'is', 'to', 'of', 'in', 'for', 'on', 'it', 'my', 'we', 'you', 'hello', 'thanks',
+}
+
+WORD_PATTERN = re.compile(r'[a-z0-9]{2,}')
+
+
+def ticket_text(title: str, body: str) -> str:
+    """Texte représentatif d'un ticket: titre puis message nettoyé"""
+    return f"{title or ''}\n{clean_article_body(body or '')}"
+
+
+def tokenize(text: str) -> List[str]:
+    """Mots normalisés (minuscules, sans accents, sans mots vides) et bigrammes"""
+    words = [word for word in WORD_PATTERN.findall(unidecode(text or '').lower()) if word not in STOP_WORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class TfidfVectorizer:
+    """TF-IDF (tf sous-linéaire, idf lissé) avec vecteurs normalisés L2:
+    le produit scalaire de deux vecteurs est leur similarité cosinus"""
+
+    def __init__(self, vocabulary: Dict[str, int] = None, idf: np.ndarray = None):
+        self.vocabulary = vocabulary or {}
+        self.idf = idf if idf is not None else np.zeros(0, dtype=np.float32)
+
+    @property
+    def size(self) -> int:
+        return len(self.vocabulary)
+
+    def fit(self, texts: Iterable[str], max_features: int = 20000, min_df: int = 1) -> 'TfidfVectorizer':
+        documents = [set(tokenize(text)) for text in texts]
+        document_frequency = Counter(term for terms in documents for term in terms)
+        terms = [term for term, count in document_frequency.items() if count >= min_df]
+        terms = sorted(terms, key=lambda term: (-document_frequency[term], term))[:max_features]
+
+        self.vocabulary = {term: index for index, term in enumerate(sorted(terms))}
+        self.idf = np.array([
+            math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1
+            for term in sorted(terms)
+        ], dtype=np.float32)
+        return self
+
+    def transform(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(term for term in tokenize(text) if term in self.vocabulary)
+            for term, count in counts.items():
+                matrix[row, self.vocabulary[term]] = 1 + math.log(count)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tableaux à enregistrer avec np.savez"""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        return {'vocabulary': np.array(terms, dtype=str), 'idf': self.idf}
+
+    @classmethod
+    def from_arrays(cls, arrays) -> 'TfidfVectorizer':
+        vocabulary = {str(term): index for index, term in enumerate(arrays['vocabulary'])}
+        return cls(vocabulary, np.asarray(arrays['idf'], dtype=np.float32))
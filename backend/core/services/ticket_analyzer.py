@@ -1,92 +1,470 @@
+import hashlib
 import json
 import logging
-from typing import Dict, Any, Optional
+import re
+import time
+from concurrent.futures import Future, wait
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from django.conf import settings
 from django.utils import timezone
 from ..models import Ticket, TicketAnalysis
-from .llm_client import LLMClient
+from .llm_client import AsyncLLMClient, LLMClient
 from .zammad_api import ZammadAPIService
 from .knowledge_base_service import KnowledgeBaseService
+from .answer_cache import AnswerCache, AnswerCacheStats, parse_stored_reply
+from .clients import get_async_llm_client, get_llm_client, get_zammad_api
+from .llm_json import TICKET_PRIORITIES, TICKET_PRIORITY_LABELS, StructuredOutputService
+from .prompt_builder import TicketPromptBuilder, clean_article_body, truncate_to_tokens
+from .text_vectors import ticket_text
+from .triage_classifier import TriageStats, get_triage_classifier
 
 
 logger = logging.getLogger(__name__)
 
+# Catégories pour lesquelles un article de base de connaissance est proposé
+KB_SUGGESTION_CATEGORIES = ['technique', 'facturation']
+
+# À incrémenter à chaque modification des prompts: invalide les analyses enregistrées
+PROMPT_VERSION = '1'
+
+# Délai de résolution annoncé quand la classification vient du classifieur local
+LOCAL_TRIAGE_ESTIMATED_TIME = {
+    'urgent': '2 heures',
+    'high': '4 heures',
+    'medium': '1 jour',
+    'low': '2 jours',
+}
+
+def analysis_fingerprint(ticket: Ticket, articles: List[Dict[str, Any]]) -> str:
+    """Empreinte du contenu analysé: un nouvel article ou une nouvelle version des prompts la change"""
+    content = json.dumps({
+        'prompt_version': PROMPT_VERSION,
+        'title': ticket.title,
+        'body': ticket.body,
+        'articles': sorted(str(article.get('id')) for article in articles),
+    }, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def current_analysis_result(analysis_obj: TicketAnalysis) -> Optional[Dict[str, Any]]:
+    """Résultat enregistré avec la réponse et la validation actuelles de la ligne:
+    un agent a pu modifier ou valider la réponse depuis l'analyse"""
+    if not analysis_obj.result:
+        return None
+    result = dict(analysis_obj.result)
+    reply = parse_stored_reply(analysis_obj.ai_response)
+    if reply is not None and isinstance(result.get('analysis'), dict):
+        result['analysis'] = dict(
+            result['analysis'],
+            ai_response={'response': reply['response_text'], 'solution': reply['solution_steps']}
+        )
+        result['ai_response'] = analysis_obj.ai_response
+    result['published'] = analysis_obj.published
+    return result
+
+
+class _JSONStringFieldStream:
+    """Extrait progressivement la valeur d'un champ chaîne d'un JSON reçu par fragments"""
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, field: str):
+        self._start = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = None
+        self._done = False
+
+    def feed(self, chunk: str) -> str:
+        """Ajoute un fragment et retourne le nouveau texte décodé du champ"""
+        self._buffer += chunk
+        if self._done:
+            return ""
+        if self._pos is None:
+            match = self._start.search(self._buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self._done = True
+                pos += 1
+                break
+            if char != '\\':
+                out.append(char)
+                pos += 1
+                continue
+            # Séquence d'échappement incomplète: attendre le fragment suivant
+            if pos + 1 >= len(buffer):
+                break
+            escaped = buffer[pos + 1]
+            if escaped == 'u':
+                if pos + 6 > len(buffer):
+                    break
+                try:
+                    out.append(chr(int(buffer[pos + 2:pos + 6], 16)))
+                except ValueError:
+                    pass
+                pos += 6
+            else:
+                out.append(self._ESCAPES.get(escaped, escaped))
+                pos += 2
+        self._pos = pos
+        return "".join(out)
+
+
 class TicketAnalyzerService:
-    def __init__(self):
-        self.llm_client = LLMClient()
-        self.zammad_api = ZammadAPIService()
-        self.kb_service = KnowledgeBaseService()  # Nouveau service
+    def __init__(
+        self,
+        llm_client: Optional[LLMClient] = None,
+        zammad_api: Optional[ZammadAPIService] = None,
+        kb_service: Optional[KnowledgeBaseService] = None,
+        mode: Optional[str] = None,
+        async_llm_client: Optional[AsyncLLMClient] = None
+    ):
+        # single: classification et réponse en un seul appel, multi: un appel chacune
+        self.mode = mode or settings.TICKET_ANALYSIS_MODE
+        # Clients partagés du processus sauf injection explicite
+        self.llm_client = llm_client or get_llm_client()
+        # Appels LLM parallèles des branches (réponse, suggestion KB)
+        self.async_llm = async_llm_client or get_async_llm_client()
+        self.zammad_api = zammad_api or get_zammad_api()
+        self.kb_service = kb_service or KnowledgeBaseService(self.llm_client, self.zammad_api)  # Nouveau service
+        self.answer_cache = AnswerCache()
+        self.structured = StructuredOutputService(self.llm_client)
     
-    def analyze_ticket(self, ticket: Ticket) -> Dict[str, Any]:
-        """Analyse complète du ticket avec suggestion d'article KB"""
+    def analyze_ticket(self, ticket: Ticket, force: bool = False) -> Dict[str, Any]:
+        """Analyse complète du ticket avec suggestion d'article KB.
+        Après la classification, réponse et suggestion KB tournent en parallèle, chacune sous
+        l'échéance TICKET_ANALYSIS_DEADLINE; une branche en retard est listée dans `partial`
+        (et dans `saturated` si elle n'a pas obtenu de créneau LLM à temps).
+        Si le ticket n'a pas changé depuis la dernière analyse (même empreinte), le résultat
+        enregistré est renvoyé sans appel LLM (`cached`), sauf avec `force`."""
         try:
-            # Analyse existante...
-            analysis_result = self._send_to_llm(ticket)
-            if not analysis_result['success']:
+            articles, fingerprint = self._fetch_articles(ticket)
+            stored = None if force else self._stored_result(ticket, fingerprint)
+            if stored:
+                return stored
+            
+            # Classifieur local confiant: pas d'appel LLM de tri, seule la réponse est générée
+            local_triage = self._local_triage(ticket)
+            # Réponse validée d'un ticket quasi identique: le LLM ne fait plus que le tri.
+            # La recherche est limitée à la catégorie pressentie par le classifieur local
+            cached_reply = expected_category = None
+            if self.mode == 'single' and local_triage is None:
+                expected_category = self._classifier_category(ticket)
+                if expected_category:
+                    cached_reply = self.answer_cache.lookup(ticket, expected_category)
+            single_call = self.mode == 'single' and local_triage is None and cached_reply is None
+            analysis_result = local_triage or self._send_to_llm(
+                ticket, articles, include_reply=single_call, use_cache=not force
+            )
+            if not analysis_result['success'] and not self._is_degraded(analysis_result):
                 return {'success': False, 'error': analysis_result['error']}
             
-            parsed_analysis = self._parse_analysis(analysis_result['content'])
-            ai_response_structured = self._generate_response(ticket, parsed_analysis)
-            analysis_obj = self._save_analysis(ticket, parsed_analysis, str(ai_response_structured))
+            # Circuit LLM ouvert ou sortie irréparable: analyse par défaut plutôt qu'une erreur
+            parsed_analysis = self._parse_analysis(analysis_result)
             
-            # NOUVEAU: Suggérer un article de base de connaissance
-            kb_suggestion = None
-            if parsed_analysis.get('category') in ['technique', 'facturation']:
-                try:
-                    ticket_data = {
-                        'title': ticket.title,
-                        'body': ticket.body,
-                        'status': ticket.status
-                    }
-                    kb_suggestion = self.kb_service.suggest_knowledge_article(
-                        parsed_analysis, ticket_data
-                    )
-                except Exception as e:
-                    logger.warning(f"Erreur suggestion KB: {e}")
+            if cached_reply is not None and parsed_analysis.get('category') != expected_category:
+                # Le tri LLM contredit le classifieur: pas de réponse reprise d'une autre catégorie
+                cached_reply = None
+            if not single_call and cached_reply is None:
+                # Réponse validée d'un ticket quasi identique de la même catégorie (cache sémantique)
+                cached_reply = self.answer_cache.lookup(ticket, parsed_analysis.get('category'))
             
-            result = {
-                'success': True,
-                'analysis': {
-                    'id': analysis_obj.id,
-                    'priority': parsed_analysis.get('priority_label', 'Normal'),
-                    'priority_level': parsed_analysis.get('priority', 'medium'),
-                    'recommended_status': parsed_analysis.get('recommended_status', 'ouvert'),
-                    'status_reason': parsed_analysis.get('status_reason', ''),
-                    'category': parsed_analysis.get('category', 'technique'),
-                    'intention': parsed_analysis.get('intention', ''),
-                    'estimated_time': parsed_analysis.get('estimated_time', '30 minutes'),
-                    'urgency_indicators': parsed_analysis.get('urgency_indicators', []),
-                    'next_actions': parsed_analysis.get('next_actions', []),
-                    'ai_response': {
-                        'response': ai_response_structured.get('response_text', ''),
-                        'solution': ai_response_structured.get('solution_steps', [])
-                    }
-                },
-                'ai_response': str(ai_response_structured),
-                'ready_for_publish': True
-            }
+            # Réponse et suggestion KB ne dépendent que du ticket et de la classification:
+            # leurs appels LLM partent ensemble sur le client asynchrone
+            calls = {}
+            if not single_call and cached_reply is None:
+                calls['response'] = self._response_call(ticket, parsed_analysis, use_cache=not force)
+            kb_call = self._kb_call(ticket, parsed_analysis, use_cache=not force)
+            if kb_call:
+                calls['kb_suggestion'] = kb_call
+            submitted = time.perf_counter()
+            raw_results, late, saturated = self._collect(self._submit_branches(calls))
+            results = self._branch_results(raw_results, (time.perf_counter() - submitted) * 1000)
             
-            # Ajouter la suggestion KB si disponible
-            if kb_suggestion and kb_suggestion.get('success'):
-                result['kb_suggestion'] = kb_suggestion['suggestion']
+            if cached_reply:
+                ai_response_structured = cached_reply
+            elif single_call:
+                ai_response_structured = self._parse_response(analysis_result)
+            else:
+                # Réponse hors délai: message d'attente, comme en cas d'échec de l'API
+                ai_response_structured = results.get('response') or self._parse_response({'success': False})
+            answer_cache = ai_response_structured.pop('answer_cache', None)
+            analysis_obj = self._save_analysis(
+                ticket, parsed_analysis, str(ai_response_structured),
+                degraded=self._is_degraded(analysis_result),
+                triage_source='local' if local_triage else 'llm'
+            )
             
+            result = self._build_result(
+                analysis_obj, parsed_analysis, ai_response_structured, results.get('kb_suggestion'),
+                degraded=self._is_degraded(analysis_result)
+            )
+            if late:
+                result['partial'] = late
+            if saturated:
+                result['saturated'] = saturated
+            if local_triage:
+                result['local_triage'] = local_triage['confidence']
+            if answer_cache:
+                result['answer_cache'] = answer_cache
+            self._store_result(analysis_obj, fingerprint, result)
             return result
             
         except Exception as e:
             logger.error(f"Erreur analyse ticket {ticket.zammad_id}: {str(e)}")
             return {'success': False, 'error': str(e)}
 
-    def _send_to_llm(self, ticket: Ticket) -> Dict[str, Any]:
-        """Envoi du contenu au LLM avec gestion d'erreur réseau"""
-        
-        # Essayer de récupérer les articles, mais continuer même en cas d'erreur
-        full_content = ticket.body
+    def analyze_ticket_stream(self, ticket: Ticket, force: bool = False) -> Iterator[Dict[str, Any]]:
+        """Analyse du ticket en flux d'événements, dans l'ordre de disponibilité:
+        'analysis' (classification), 'response_delta' (texte de la réponse au fil
+        de la génération), 'response', 'kb_suggestion' puis 'done' (résultat complet,
+        identique à analyze_ticket). Un événement 'error' termine le flux en cas d'échec.
+        Toujours en deux appels (quel que soit le mode) pour envoyer la classification
+        avant la rédaction. Un ticket inchangé rejoue immédiatement le résultat enregistré."""
+        try:
+            articles, fingerprint = self._fetch_articles(ticket)
+            stored = None if force else self._stored_result(ticket, fingerprint)
+            if stored:
+                yield from self._replay(stored)
+                return
+            
+            local_triage = self._local_triage(ticket)
+            analysis_result = local_triage or self._send_to_llm(ticket, articles, use_cache=not force)
+            if not analysis_result['success'] and not self._is_degraded(analysis_result):
+                yield {'event': 'error', 'data': {'success': False, 'error': analysis_result['error']}}
+                return
+            
+            degraded = self._is_degraded(analysis_result)
+            parsed_analysis = self._parse_analysis(analysis_result)
+            yield {'event': 'analysis', 'data': self._format_analysis(parsed_analysis)}
+            
+            # Suggestion KB préparée en parallèle pendant le streaming de la réponse
+            calls = {}
+            kb_call = self._kb_call(ticket, parsed_analysis, use_cache=not force)
+            if kb_call:
+                calls['kb_suggestion'] = kb_call
+            branches = self._submit_branches(calls)
+            
+            result = {"success": True}
+            ai_response_structured = self.answer_cache.lookup(ticket, parsed_analysis.get('category'))
+            if ai_response_structured is None:
+                # Réponse générée en streaming: seul le champ response_text est relayé au fil de l'eau
+                prompt, system_prompt = self._build_response_prompt(ticket, parsed_analysis)
+                response_text = _JSONStringFieldStream('response_text')
+                result = {"success": False, "error": "Flux interrompu"}
+                for event in self.llm_client.stream_api(
+                    prompt, system_prompt, service='ticket_analyzer', json_mode=True, task='ticket_reply',
+                    use_cache=not force
+                ):
+                    if event['type'] == 'delta':
+                        text = response_text.feed(event['text'])
+                        if text:
+                            yield {'event': 'response_delta', 'data': {'text': text}}
+                    elif event['type'] == 'done':
+                        result = event['result']
+                
+                result = self.structured.parse('ticket_reply', result, service='ticket_analyzer')
+                ai_response_structured = self._parse_response(result)
+            answer_cache = ai_response_structured.pop('answer_cache', None)
+            yield {'event': 'response', 'data': {
+                'response': ai_response_structured.get('response_text', ''),
+                'solution': ai_response_structured.get('solution_steps', [])
+            }}
+            analysis_obj = self._save_analysis(
+                ticket, parsed_analysis, str(ai_response_structured), degraded=degraded,
+                triage_source='local' if local_triage else 'llm'
+            )
+            
+            raw_results, late, saturated = self._collect(branches)
+            kb_suggestion = self._branch_results(raw_results, 0).get('kb_suggestion')
+            if kb_suggestion and kb_suggestion.get('success'):
+                yield {'event': 'kb_suggestion', 'data': kb_suggestion['suggestion']}
+            
+            final = self._build_result(
+                analysis_obj, parsed_analysis, ai_response_structured, kb_suggestion,
+                degraded=degraded or bool(result.get('circuit_open'))
+            )
+            if late:
+                final['partial'] = late
+            if saturated:
+                final['saturated'] = saturated
+            if local_triage:
+                final['local_triage'] = local_triage['confidence']
+            if answer_cache:
+                final['answer_cache'] = answer_cache
+            self._store_result(analysis_obj, fingerprint, final)
+            yield {'event': 'done', 'data': final}
+            
+        except Exception as e:
+            logger.error(f"Erreur analyse (stream) ticket {ticket.zammad_id}: {str(e)}")
+            yield {'event': 'error', 'data': {'success': False, 'error': str(e)}}
+
+    def _fetch_articles(self, ticket: Ticket) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Articles Zammad du ticket et empreinte du contenu.
+        Sans accès à Zammad, pas d'empreinte: impossible de savoir si le fil a changé."""
         try:
             articles = self.zammad_api.get_ticket_articles(ticket.zammad_id)
-            full_content = self._build_full_content(ticket, articles)
             logger.info(f"Articles récupérés pour ticket {ticket.zammad_id}")
         except Exception as e:
             logger.warning(f"API Zammad inaccessible pour ticket {ticket.zammad_id}: {e}")
             logger.info("Analyse avec contenu principal uniquement")
+            return [], None
+        return articles, analysis_fingerprint(ticket, articles)
+
+    def _stored_result(self, ticket: Ticket, fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Résultat enregistré si l'empreinte n'a pas changé depuis la dernière analyse"""
+        if not fingerprint:
+            return None
+        analysis_obj = TicketAnalysis.objects.filter(ticket=ticket, fingerprint=fingerprint).first()
+        if analysis_obj is None or not analysis_obj.result:
+            return None
+        
+        # L'analyse reste à jour: le ticket ne doit plus apparaître comme périmé
+        analysis_obj.analyzed_at = timezone.now()
+        analysis_obj.save(update_fields=['analyzed_at'])
+        logger.info(f"Ticket {ticket.zammad_id} inchangé: analyse enregistrée réutilisée")
+        return dict(current_analysis_result(analysis_obj), cached=True)
+
+    @staticmethod
+    def _store_result(analysis_obj: TicketAnalysis, fingerprint: Optional[str], result: Dict[str, Any]):
+        """Enregistre le résultat; seule une analyse complète (ni dégradée ni partielle) reçoit l'empreinte"""
+        complete = not result.get('degraded') and not result.get('partial')
+        analysis_obj.fingerprint = fingerprint if fingerprint and complete else ''
+        analysis_obj.result = result
+        analysis_obj.save(update_fields=['fingerprint', 'result'])
+
+    @staticmethod
+    def _replay(result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Événements du flux reconstitués à partir d'un résultat enregistré"""
+        analysis = result['analysis']
+        yield {'event': 'analysis', 'data': {
+            key: value for key, value in analysis.items() if key not in ('id', 'ai_response')
+        }}
+        yield {'event': 'response', 'data': analysis['ai_response']}
+        if result.get('kb_suggestion'):
+            yield {'event': 'kb_suggestion', 'data': result['kb_suggestion']}
+        yield {'event': 'done', 'data': result}
+
+    def _submit_branches(self, calls: Dict[str, Dict[str, Any]]) -> Dict[str, Future]:
+        """Appels LLM des branches planifiés sur le client asynchrone, chacun avec l'échéance
+        TICKET_ANALYSIS_DEADLINE comptée à partir de son départ"""
+        return {
+            name: self.async_llm.submit(json_mode=True, deadline=settings.TICKET_ANALYSIS_DEADLINE, **call)
+            for name, call in calls.items()
+        }
+
+    def _collect(self, branches: Dict[str, Future]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """Résultats LLM des branches terminées à temps, noms des branches en retard et, parmi
+        elles, de celles restées sans créneau LLM (capacité saturée)"""
+        if not branches:
+            return {}, [], []
+        # Garde-fou: attente d'un créneau puis exécution, chacune bornée par l'échéance
+        wait(branches.values(), timeout=2 * settings.TICKET_ANALYSIS_DEADLINE + 5)
+        
+        results, late, saturated = {}, [], []
+        for name, future in branches.items():
+            result = future.result() if future.done() else {'late': True, 'saturated': False}
+            if result.get('late'):
+                if result.get('saturated'):
+                    saturated.append(name)
+                    logger.warning(
+                        f"Branche {name} non lancée: capacité LLM saturée "
+                        f"(LLM_ASYNC_MAX_CONCURRENCY={self.async_llm.max_concurrency})"
+                    )
+                else:
+                    logger.warning(f"Branche {name} hors délai ({settings.TICKET_ANALYSIS_DEADLINE}s)")
+                late.append(name)
+                continue
+            results[name] = result
+        return results, late, saturated
+
+    def _kb_call(self, ticket: Ticket, parsed_analysis: Dict[str, Any],
+                 use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Appel LLM de la suggestion d'article KB (catégories technique et facturation)"""
+        if parsed_analysis.get('category') not in KB_SUGGESTION_CATEGORIES:
+            return None
+        ticket_data = {
+            'title': ticket.title,
+            'body': ticket.body,
+            'status': ticket.status
+        }
+        return self.kb_service.article_call(parsed_analysis, ticket_data, use_cache=use_cache)
+
+    def _branch_results(self, raw_results: Dict[str, Dict[str, Any]], elapsed_ms: float) -> Dict[str, Any]:
+        """Résultats LLM des branches validés par leur schéma (réparation comprise)"""
+        results = {}
+        if 'response' in raw_results:
+            result = self.structured.parse('ticket_reply', raw_results['response'], service='ticket_analyzer')
+            if result.get('success') and not result.get('cached'):
+                AnswerCacheStats.record_generation(elapsed_ms)
+            results['response'] = self._parse_response(result)
+        if 'kb_suggestion' in raw_results:
+            result = self.structured.parse('kb_article', raw_results['kb_suggestion'], service='knowledge_base')
+            results['kb_suggestion'] = self.kb_service.suggestion_from_result(result)
+        return results
+
+    def _format_analysis(self, parsed_analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Champs de classification exposés au frontend"""
+        return {
+            'priority': parsed_analysis.get('priority_label', 'Normal'),
+            'priority_level': parsed_analysis.get('priority', 'medium'),
+            'recommended_status': parsed_analysis.get('recommended_status', 'ouvert'),
+            'status_reason': parsed_analysis.get('status_reason', ''),
+            'category': parsed_analysis.get('category', 'technique'),
+            'intention': parsed_analysis.get('intention', ''),
+            'estimated_time': parsed_analysis.get('estimated_time', '30 minutes'),
+            'urgency_indicators': parsed_analysis.get('urgency_indicators', []),
+            'next_actions': parsed_analysis.get('next_actions', []),
+        }
+
+    def _build_result(
+        self,
+        analysis_obj: TicketAnalysis,
+        parsed_analysis: Dict[str, Any],
+        ai_response_structured: Dict[str, Any],
+        kb_suggestion: Optional[Dict[str, Any]],
+        degraded: bool = False
+    ) -> Dict[str, Any]:
+        """Résultat final commun à analyze_ticket et analyze_ticket_stream"""
+        result = {
+            'success': True,
+            'analysis': {
+                'id': analysis_obj.id,
+                **self._format_analysis(parsed_analysis),
+                'ai_response': {
+                    'response': ai_response_structured.get('response_text', ''),
+                    'solution': ai_response_structured.get('solution_steps', [])
+                }
+            },
+            'ai_response': str(ai_response_structured),
+            'ready_for_publish': True,
+            'degraded': degraded
+        }
+        
+        # Ajouter la suggestion KB si disponible
+        if kb_suggestion and kb_suggestion.get('success'):
+            result['kb_suggestion'] = kb_suggestion['suggestion']
+        
+        return result
+
+    def _send_to_llm(self, ticket: Ticket, articles: List[Dict[str, Any]], include_reply: bool = False,
+                     use_cache: bool = True) -> Dict[str, Any]:
+        """Envoi du contenu au LLM (fil construit à partir de `articles`).
+        Avec `include_reply`, la même réponse contient aussi response_text et solution_steps.
+        Sans `use_cache` (analyse forcée), le cache LLM est ignoré."""
+        full_content = self._build_full_content(ticket, articles)
+        
+        reply_fields = ""
+        if include_reply:
+            reply_fields = """,
+            "response_text": "Réponse au client: accusé de réception clair et empathique (max 80 mots)",
+            "solution_steps": ["Étape 1 concrète", "Étape 2 concrète", "Étape 3 si nécessaire"]"""
         
         prompt = f"""
         Analyse ce ticket de support et fournis une analyse complète en JSON:
@@ -107,7 +485,7 @@ class TicketAnalyzerService:
             "status_reason": "Pourquoi recommander ce statut",
             "estimated_time": "Temps estimé de résolution",
             "urgency_indicators": ["liste", "des", "indicateurs", "d'urgence"],
-            "next_actions": ["actions", "recommandées", "pour", "traiter", "ce", "ticket"]
+            "next_actions": ["actions", "recommandées", "pour", "traiter", "ce", "ticket"]{reply_fields}
         }}
         
         CRITÈRES PRIORITÉ:
@@ -128,72 +506,107 @@ class TicketAnalyzerService:
         Analyse précisément le contenu et fournis une évaluation détaillée.
         Réponds UNIQUEMENT en JSON valide."""
         
-        return self.llm_client.call_api(prompt, system_prompt)
+        if include_reply:
+            return self.structured.call(
+                'ticket_analysis_with_reply', prompt, system_prompt, service='ticket_analyzer', task='ticket_analysis',
+                use_cache=use_cache
+            )
+        return self.structured.call(
+            'ticket_analysis', prompt, system_prompt, service='ticket_analyzer', task='ticket_triage', use_cache=use_cache
+        )
 
-    def _build_full_content(self, ticket: Ticket, articles: list) -> str:
-        """Construire le contenu complet avec historique"""
-        content_parts = [f"Message initial: {ticket.body}"]
+    def _local_triage(self, ticket: Ticket) -> Optional[Dict[str, Any]]:
+        """Classification par le modèle local si sa confiance (catégorie et priorité)
+        atteint TRIAGE_CONFIDENCE_THRESHOLD; None pour passer par le LLM"""
+        if not settings.TRIAGE_CLASSIFIER_ENABLED:
+            return None
+        classifier = get_triage_classifier()
+        if classifier is None:
+            return None
         
-        for article in articles:
-            sender = article.get('from', 'Inconnu')
-            body = article.get('body', '').strip()
-            if body and body != ticket.body:
-                content_parts.append(f"[{sender}]: {body}")
+        started = time.perf_counter()
+        prediction = classifier.predict(ticket_text(ticket.title, ticket.body))
+        confidence = min(prediction[target]['confidence'] for target in prediction)
+        local = confidence >= settings.TRIAGE_CONFIDENCE_THRESHOLD
+        TriageStats.record(local, (time.perf_counter() - started) * 1000)
+        if not local:
+            logger.debug(f"Tri local trop incertain pour ticket {ticket.zammad_id} ({confidence:.2f})")
+            return None
         
-        return "\n\n".join(content_parts)
-    
-    def _parse_analysis(self, llm_response: str) -> Dict[str, Any]:
-        """Parser la réponse LLM avec valeurs par défaut"""
-        try:
-            # Nettoyer la réponse des backticks markdown
-            cleaned_response = llm_response.strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response[7:]  # Enlever ```json
-            if cleaned_response.startswith('```'):
-                cleaned_response = cleaned_response[3:]   # Enlever ```
-            if cleaned_response.endswith('```'):
-                cleaned_response = cleaned_response[:-3]  # Enlever ```
-            
-            cleaned_response = cleaned_response.strip()
-            
-            analysis = json.loads(cleaned_response)
-            
-            # Validation et normalisation
-            analysis.setdefault('intention', 'Demande de support')
-            analysis.setdefault('category', 'technique')
-            analysis.setdefault('priority', 'medium')
-            analysis.setdefault('priority_label', 'Normal')
-            analysis.setdefault('recommended_status', 'ouvert')
-            analysis.setdefault('status_reason', 'Ticket en cours de traitement')
-            analysis.setdefault('estimated_time', '30 minutes')
-            analysis.setdefault('urgency_indicators', [])
-            analysis.setdefault('next_actions', ['Analyser le problème', 'Proposer une solution'])
-            
-            return analysis
-            
-        except json.JSONDecodeError:
-            logger.error(f"Réponse LLM invalide: {llm_response}")
-            return {
-                'intention': 'Demande de support',
-                'category': 'technique',
-                'priority': 'medium',
-                'priority_label': 'Normal',
+        priority = prediction['priority']['label']
+        labels = dict(zip(TICKET_PRIORITIES, TICKET_PRIORITY_LABELS))
+        return {
+            'success': True,
+            'confidence': round(confidence, 4),
+            'data': {
+                'intention': ticket.title,
+                'category': prediction['category']['label'],
+                'priority': priority,
+                'priority_label': labels.get(priority, 'Normal'),
                 'recommended_status': 'ouvert',
-                'status_reason': 'Analyse automatique par défaut',
-                'estimated_time': '30 minutes',
+                'status_reason': f"Classement automatique local (confiance {confidence:.0%})",
+                'estimated_time': LOCAL_TRIAGE_ESTIMATED_TIME.get(priority, '1 jour'),
                 'urgency_indicators': [],
-                'next_actions': ['Analyser le problème']
+                'next_actions': ['Analyser le problème', 'Proposer une solution'],
             }
+        }
+
+    def _classifier_category(self, ticket: Ticket) -> Optional[str]:
+        """Catégorie la plus probable selon le classifieur local, quelle que soit sa confiance"""
+        if not settings.TRIAGE_CLASSIFIER_ENABLED:
+            return None
+        classifier = get_triage_classifier()
+        if classifier is None:
+            return None
+        return classifier.predict(ticket_text(ticket.title, ticket.body))['category']['label']
 
-    def _generate_response(self, ticket: Ticket, analysis: Dict[str, Any]) -> Dict[str, Any]:
-        """Générer une réponse IA structurée (JSON)"""
+    @staticmethod
+    def _is_degraded(llm_result: Dict[str, Any]) -> bool:
+        """Échec couvert par l'analyse par défaut (fournisseur indisponible ou JSON irréparable)"""
+        return bool(llm_result.get('circuit_open') or llm_result.get('parse_failed'))
+
+    def _build_full_content(self, ticket: Ticket, articles: list) -> str:
+        """Construire le contenu complet avec historique (nettoyé et limité en tokens)"""
+        return TicketPromptBuilder(self.llm_client).build_thread(ticket, articles)
+    
+    def _parse_analysis(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Analyse validée par le schéma, ou valeurs par défaut si le LLM n'a rien donné d'exploitable"""
+        if analysis_result.get('data'):
+            return analysis_result['data']
         
+        if analysis_result.get('content'):
+            logger.error(f"Réponse LLM invalide: {analysis_result['content'][:500]}")
+        return {
+            'intention': 'Demande de support',
+            'category': 'technique',
+            'priority': 'medium',
+            'priority_label': 'Normal',
+            'recommended_status': 'ouvert',
+            'status_reason': 'Analyse automatique par défaut',
+            'estimated_time': '30 minutes',
+            'urgency_indicators': [],
+            'next_actions': ['Analyser le problème']
+        }
+
+    def _response_call(self, ticket: Ticket, analysis: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """Appel LLM de la réponse client structurée (JSON)"""
+        prompt, system_prompt = self._build_response_prompt(ticket, analysis)
+        return {
+            'prompt': prompt,
+            'system_prompt': system_prompt,
+            'service': 'ticket_analyzer',
+            'task': 'ticket_reply',
+            'use_cache': use_cache,
+        }
+
+    def _build_response_prompt(self, ticket: Ticket, analysis: Dict[str, Any]) -> Tuple[str, str]:
+        """Prompt et prompt système de la réponse client"""
         prompt = f"""
         Tu es un agent support professionnel.
 
         CONTEXTE:
         - Titre: {ticket.title}
-        - Message client: {ticket.body}
+        - Message client: {truncate_to_tokens(clean_article_body(ticket.body), settings.LLM_PROMPT_TOKEN_BUDGET)}
         - Catégorie: {analysis.get('category')}
         - Priorité: {analysis.get('priority_label')}
 
@@ -210,38 +623,26 @@ class TicketAnalyzerService:
         """
 
         system_prompt = "Tu es un expert support. Tu DOIS répondre uniquement en JSON valide, sans balises, sans texte."
+        return prompt, system_prompt
 
-        result = self.llm_client.call_api(prompt, system_prompt)
-
-        # Sécurité si l'API échoue
+    def _parse_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Réponse structurée à partir du résultat LLM, avec valeurs de secours"""
+        # Sécurité si l'API échoue ou si la sortie reste invalide après réparation
         if not result.get("success"):
             return {
                 "response_text": "Nous avons bien reçu votre demande et notre équipe est en cours d'analyse.",
                 "solution_steps": ["Analyse en cours", "Réponse sous 24h"]
             }
 
-        try:
-            # Parser la réponse JSON
-            cleaned_response = result['content'].strip()
-            if cleaned_response.startswith('```json'):
-                cleaned_response = cleaned_response[7:]
-            if cleaned_response.startswith('```'):
-                cleaned_response = cleaned_response[3:]
-            if cleaned_response.endswith('```'):
-                cleaned_response = cleaned_response[:-3]
-            
-            response_data = json.loads(cleaned_response.strip())
-            return {
-                "response_text": response_data.get('response_text', 'Demande reçue'),
-                "solution_steps": response_data.get('solution_steps', ['En cours de traitement'])
-            }
-        except:
-            return {
-                "response_text": "Nous avons bien reçu votre demande.",
-                "solution_steps": ["Analyse en cours"]
-            }
+        response_data = result['data']
+        return {
+            "response_text": response_data['response_text'],
+            "solution_steps": response_data['solution_steps']
+        }
 
-    def _save_analysis(self,ticket: Ticket,parsed_analysis: Dict[str, Any],ai_response: Dict[str, Any]) -> TicketAnalysis:
+    def _save_analysis(self,ticket: Ticket,parsed_analysis: Dict[str, Any],ai_response: Dict[str, Any],degraded: bool = False,triage_source: str = 'llm') -> TicketAnalysis:
+        # Analyse par défaut (LLM indisponible): sans date, le ticket reste à analyser
+        analyzed_at = None if degraded else timezone.now()
 
         analysis_obj, created = TicketAnalysis.objects.get_or_create(
             ticket=ticket,
@@ -252,7 +653,9 @@ class TicketAnalyzerService:
                 'ai_response': ai_response,
                 'publish_mode': self._determine_publish_mode(
                     parsed_analysis.get('priority', 'medium')
-                )
+                ),
+                'analyzed_at': analyzed_at,
+                'triage_source': triage_source
             }
         )
 
@@ -260,7 +663,12 @@ class TicketAnalyzerService:
             analysis_obj.intention = parsed_analysis.get('intention')
             analysis_obj.category = parsed_analysis.get('category')
             analysis_obj.priority = parsed_analysis.get('priority')
+            if analysis_obj.ai_response != ai_response:
+                # Nouvelle réponse non relue: elle n'est plus validée (ni servie par le cache des réponses)
+                analysis_obj.published = False
             analysis_obj.ai_response = ai_response
+            analysis_obj.analyzed_at = analyzed_at
+            analysis_obj.triage_source = triage_source
             analysis_obj.save()
 
         return analysis_obj
@@ -0,0 +1,163 @@
+# backend/core/services/triage_classifier.py
+"""
+Classifieur local de tri (catégorie et priorité): TF-IDF et régression logistique
+multinomiale en NumPy, entraîné sur les analyses LLM passées (commande train_triage_classifier)
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from django.conf import settings
+from .text_vectors import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+# Champs prédits; les autres champs de l'analyse sont déduits de la priorité
+TARGETS = ['category', 'priority']
+
+
+class SoftmaxClassifier:
+    """Régression logistique multinomiale (descente de gradient, régularisation L2)"""
+
+    def __init__(self, labels: Sequence[str] = (), weights: np.ndarray = None, bias: np.ndarray = None):
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+
+    def fit(self, features: np.ndarray, labels: List[str], epochs: int = 300,
+            learning_rate: float = 2.0, l2: float = 1e-4) -> 'SoftmaxClassifier':
+        self.labels = sorted(set(labels))
+        index = {label: position for position, label in enumerate(self.labels)}
+        targets = np.zeros((len(labels), len(self.labels)), dtype=np.float32)
+        targets[np.arange(len(labels)), [index[label] for label in labels]] = 1
+
+        self.weights = np.zeros((features.shape[1], len(self.labels)), dtype=np.float32)
+        self.bias = np.zeros(len(self.labels), dtype=np.float32)
+        for _ in range(epochs):
+            error = (self.probabilities(features) - targets) / len(labels)
+            self.weights -= learning_rate * (features.T @ error + l2 * self.weights)
+            self.bias -= learning_rate * error.sum(axis=0)
+        return self
+
+    def probabilities(self, features: np.ndarray) -> np.ndarray:
+        scores = features @ self.weights + self.bias
+        scores -= scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TriageClassifier:
+    """Prédit catégorie et priorité d'un ticket avec leur probabilité"""
+
+    def __init__(self, vectorizer: TfidfVectorizer, models: Dict[str, SoftmaxClassifier]):
+        self.vectorizer = vectorizer
+        self.models = models
+
+    @classmethod
+    def train(cls, texts: List[str], labels: Dict[str, List[str]], max_features: int = 5000,
+              min_df: int = 2, epochs: int = 300) -> 'TriageClassifier':
+        vectorizer = TfidfVectorizer().fit(texts, max_features=max_features, min_df=min_df)
+        features = vectorizer.transform(texts)
+        models = {target: SoftmaxClassifier().fit(features, labels[target], epochs=epochs) for target in TARGETS}
+        return cls(vectorizer, models)
+
+    def predict_many(self, texts: List[str]) -> List[Dict[str, Dict[str, Any]]]:
+        features = self.vectorizer.transform(texts)
+        predictions = [{} for _ in texts]
+        for target, model in self.models.items():
+            probabilities = model.probabilities(features)
+            best = probabilities.argmax(axis=1)
+            for row, column in enumerate(best):
+                predictions[row][target] = {
+                    'label': model.labels[column],
+                    'confidence': float(probabilities[row, column]),
+                }
+        return predictions
+
+    def predict(self, text: str) -> Dict[str, Dict[str, Any]]:
+        """{'category': {'label', 'confidence'}, 'priority': {...}}"""
+        return self.predict_many([text])[0]
+
+    def save(self, path: str):
+        arrays = dict(self.vectorizer.to_arrays())
+        for target, model in self.models.items():
+            arrays[f'{target}_labels'] = np.array(model.labels, dtype=str)
+            arrays[f'{target}_weights'] = model.weights
+            arrays[f'{target}_bias'] = model.bias
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Écriture atomique: les processus en cours rechargent un fichier complet
+        temporary = f"{path}.tmp.npz"
+        np.savez_compressed(temporary, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TriageClassifier':
+        with np.load(path) as arrays:
+            vectorizer = TfidfVectorizer.from_arrays(arrays)
+            models = {
+                target: SoftmaxClassifier(
+                    [str(label) for label in arrays[f'{target}_labels']],
+                    arrays[f'{target}_weights'],
+                    arrays[f'{target}_bias'],
+                )
+                for target in TARGETS
+            }
+        return cls(vectorizer, models)
+
+
+class TriageStats:
+    """Compteurs du tri local (processus courant) pour le monitoring"""
+
+    _stats = {'local': 0, 'fallback': 0, 'total_ms': 0.0}
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, local: bool, elapsed_ms: float):
+        with cls._lock:
+            cls._stats['local' if local else 'fallback'] += 1
+            cls._stats['total_ms'] += elapsed_ms
+
+    @classmethod
+    def snapshot(cls) -> Dict[str, Any]:
+        with cls._lock:
+            stats = dict(cls._stats)
+        predictions = stats['local'] + stats['fallback']
+        return {
+            'enabled': settings.TRIAGE_CLASSIFIER_ENABLED,
+            'model_loaded': _loaded[1] is not None,
+            'confidence_threshold': settings.TRIAGE_CONFIDENCE_THRESHOLD,
+            'local': stats['local'],
+            'fallback': stats['fallback'],
+            'local_rate': round(stats['local'] / predictions, 4) if predictions else 0.0,
+            'avg_prediction_ms': round(stats.pop('total_ms') / predictions, 3) if predictions else 0.0,
+        }
+
+
+# (date de modification du fichier, classifieur) chargé dans ce processus
+_loaded = (None, None)
+_load_lock = threading.Lock()
+
+
+def get_triage_classifier() -> Optional[TriageClassifier]:
+    """Classifieur entraîné, rechargé quand le fichier du modèle change; None sans modèle"""
+    global _loaded
+    path = settings.TRIAGE_MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _loaded[0] == mtime:
+        return _loaded[1]
+
+    with _load_lock:
+        if _loaded[0] != mtime:
+            try:
+                started = time.perf_counter()
+                _loaded = (mtime, TriageClassifier.load(path))
+                logger.info(f"Classifieur de tri chargé en {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                logger.error(f"Classifieur de tri illisible ({path}): {e}")
+                _loaded = (mtime, None)
+        return _loaded[1]
@@ -0,0 +1,71 @@
+# backend/core/services/urgency.py
+"""
+Pré-score d'urgence d'un ticket sans LLM (mots-clés, historique client, ancienneté),
+utilisé pour ordonner la file des analyses
+"""
+import re
+from typing import Any, Dict, Optional
+from django.utils import timezone
+from unidecode import unidecode
+from ..models import Ticket, TicketAnalysis
+
+# Indicateurs d'urgence (sans accents, minuscules) et leur poids
+URGENCY_KEYWORDS = {
+    'urgent': 3, 'urgence': 3, 'critique': 3, 'panne': 3, 'hors service': 3,
+    'securite': 3, 'piratage': 4, 'intrusion': 4, 'perte de donnees': 4, 'donnees perdues': 4,
+    'bloque': 2, 'bloquant': 2, 'ne fonctionne plus': 2, 'inaccessible': 2, 'arret': 2,
+    'asap': 2, 'immediatement': 2, 'production': 1, 'erreur': 1, 'impossible': 1,
+}
+
+# Seuils de score -> priorité attendue (mêmes valeurs que TicketAnalysis.Priority)
+PRIORITY_THRESHOLDS = [(6, 'urgent'), (4, 'high'), (2, 'medium')]
+
+_KEYWORD_PATTERNS = {
+    keyword: re.compile(rf'\b{re.escape(keyword)}\b') for keyword in URGENCY_KEYWORDS
+}
+
+
+class UrgencyScorer:
+    """Score additif: mots-clés (plafonnés), tickets urgents passés du client, ancienneté"""
+
+    MAX_KEYWORD_SCORE = 7
+    MAX_HISTORY_SCORE = 2
+    MAX_AGE_SCORE = 2
+    # Points d'ancienneté par heure d'attente depuis la création du ticket
+    AGE_POINTS_PER_HOUR = 1 / 12
+
+    def score(self, ticket: Optional[Ticket]) -> Dict[str, Any]:
+        if ticket is None:
+            return {'score': 0.0, 'priority': 'low', 'reasons': ['ticket inconnu localement']}
+
+        reasons = []
+        text = unidecode(f"{ticket.title} {ticket.body}").lower()
+        keyword_score = 0
+        for keyword, pattern in _KEYWORD_PATTERNS.items():
+            if pattern.search(text):
+                keyword_score += URGENCY_KEYWORDS[keyword]
+                reasons.append(keyword)
+        keyword_score = min(keyword_score, self.MAX_KEYWORD_SCORE)
+
+        history_score = 0.0
+        if ticket.customer_email:
+            urgent_before = TicketAnalysis.objects.filter(
+                ticket__customer_email=ticket.customer_email,
+                priority__in=['high', 'urgent']
+            ).exclude(ticket=ticket).count()
+            history_score = min(urgent_before * 0.5, self.MAX_HISTORY_SCORE)
+            if urgent_before:
+                reasons.append(f'{urgent_before} tickets urgents passés')
+
+        age_hours = max(0.0, (timezone.now() - ticket.created_at).total_seconds() / 3600)
+        age_score = min(age_hours * self.AGE_POINTS_PER_HOUR, self.MAX_AGE_SCORE)
+
+        score = round(keyword_score + history_score + age_score, 2)
+        return {'score': score, 'priority': self.priority_for(score), 'reasons': reasons}
+
+    @staticmethod
+    def priority_for(score: float) -> str:
+        for threshold, priority in PRIORITY_THRESHOLDS:
+            if score >= threshold:
+                return priority
+        return 'low'
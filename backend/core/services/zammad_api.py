@@ -1,10 +1,71 @@
 import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List, Optional
+from urllib3.util.retry import Retry
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class ZammadRetry(Retry):
+    """Retry urllib3: rejoue aussi les POST refusés par la limitation de débit de Zammad
+    (un 429 est renvoyé avant traitement) et plafonne l'attente demandée par Retry-After"""
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429:
+            if self.total:
+                logger.warning(f"Zammad: limite de débit atteinte (429), nouvelle tentative {method}")
+            return bool(self.total)
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, settings.ZAMMAD_MAX_RETRY_AFTER)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """Adapter avec timeouts (connexion, lecture) par défaut pour tous les appels de la session"""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def build_zammad_session(headers: Dict[str, str]) -> requests.Session:
+    """Session keep-alive: pool de connexions dimensionné, timeouts et retry avec backoff.
+    Seuls les appels idempotents (GET...) sont rejoués sur erreur de lecture ou 5xx;
+    les erreurs de connexion et les 429 sont rejoués pour toutes les méthodes."""
+    retry = ZammadRetry(
+        total=settings.ZAMMAD_MAX_RETRIES,
+        backoff_factor=settings.ZAMMAD_RETRY_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(settings.ZAMMAD_CONNECT_TIMEOUT, settings.ZAMMAD_READ_TIMEOUT),
+        pool_connections=1,
+        pool_maxsize=settings.ZAMMAD_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
 class ZammadAPIService:
     def __init__(self):
         self.base_url = settings.ZAMMAD_URL.rstrip('/')
@@ -13,39 +74,72 @@ class ZammadAPIService:
             'Authorization': f'Token token={self.token}',
             'Content-Type': 'application/json'
         }
+        # Session partagée: connexions keep-alive réutilisées entre les appels
+        self.session = build_zammad_session(self.headers)
     
-    def get_tickets(self, limit: int = 1000) -> List[Dict]:
+    def get_tickets(self, limit: int = 1000) -> Iterator[Dict]:
+        """Tickets des états 1, 2, 3, produits au fil des pages (fenêtre de pages concurrentes)"""
+        yielded = 0
+        for tickets in self._paginate(f"{self.base_url}/api/v1/tickets", {}, per_page=100):
+            # Filtrer pour états 1, 2, 3 seulement
+            for ticket in tickets:
+                if ticket.get('state_id') not in [1, 2, 3]:
+                    continue
+                yield ticket
+                yielded += 1
+                if yielded >= limit:
+                    return
+
+    def search_tickets(self, query: str, sort_by: str = 'updated_at,id', order_by: str = 'asc,asc',
+                       per_page: int = 100, max_results: int = None) -> Iterator[List[Dict]]:
+        """Pages de /tickets/search (filtrage côté serveur, tickets développés), dans l'ordre.
+        La requête est interprétée par Elasticsearch: `max_results` arrête la pagination
+        avant sa fenêtre de résultats (index.max_result_window)"""
+        params = {'query': query, 'sort_by': sort_by, 'order_by': order_by, 'expand': 'true'}
+        max_pages = max(1, max_results // per_page) if max_results else None
+        yield from self._paginate(f"{self.base_url}/api/v1/tickets/search", params, per_page, max_pages)
+
+    def list_ticket_pages(self, per_page: int = 100) -> Iterator[List[Dict]]:
+        """Pages de /tickets, tous états, tickets développés (sans filtrage côté serveur)"""
+        yield from self._paginate(f"{self.base_url}/api/v1/tickets", {'expand': 'true'}, per_page)
+
+    def _fetch_page(self, url: str, params: Dict, page: int, per_page: int) -> List[Dict]:
+        response = self.session.get(url, params={**params, 'page': page, 'per_page': per_page})
+        response.raise_for_status()
+        return response.json()
+
+    def _paginate(self, url: str, params: Dict, per_page: int, max_pages: int = None) -> Iterator[List[Dict]]:
+        """Pages produites dans l'ordre; jusqu'à ZAMMAD_PAGE_WINDOW pages sont demandées en
+        parallèle. Une page courte ou vide termine la pagination (pages suivantes ignorées),
+        comme `max_pages` pages."""
+        window = max(1, settings.ZAMMAD_PAGE_WINDOW)
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='zammad-page')
+        pending = deque()
+        next_page = 1
         try:
-            all_tickets = []
-            page = 1
-            per_page = 100
-            
-            while len(all_tickets) < limit:
-                response = requests.get(
-                    f"{self.base_url}/api/v1/tickets",
-                    headers=self.headers,
-                    params={'page': page, 'per_page': per_page}
-                )
-                response.raise_for_status()
-                tickets = response.json()
-                
+            while True:
+                while len(pending) < window and (max_pages is None or next_page <= max_pages):
+                    pending.append(executor.submit(self._fetch_page, url, params, next_page, per_page))
+                    next_page += 1
+                page = next_page - len(pending)
+                try:
+                    tickets = pending.popleft().result()
+                except requests.RequestException as e:
+                    logger.error(f"Erreur pagination {url} (page {page}): {e}")
+                    raise
                 if not tickets:  # Plus de tickets
-                    break
-                    
-                # Filtrer pour états 1, 2, 3 seulement
-                filtered = [t for t in tickets if t.get('state_id') in [1, 2, 3]]
-                all_tickets.extend(filtered)
-                page += 1
-                
-            return all_tickets[:limit]
-        except requests.RequestException as e:
-            logger.error(f"Erreur tickets: {e}")
-            raise
-
+                    return
+                yield tickets
+                if len(tickets) < per_page or page == max_pages:  # Dernière page
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
 
     def get_ticket_details(self, ticket_id: int) -> Dict:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/v1/tickets/{ticket_id}",
                 headers=self.headers
             )
@@ -58,7 +152,7 @@ class ZammadAPIService:
     def post_ticket_response(self, ticket_id: int, body: str) -> Dict:
         try:
             data = {'ticket_id': ticket_id, 'body': body, 'type': 'email'}
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/ticket_articles",
                 headers=self.headers,
                 json=data
@@ -71,7 +165,7 @@ class ZammadAPIService:
 
     def get_ticket_articles(self, ticket_id: int) -> List[Dict]:
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/api/v1/ticket_articles/by_ticket/{ticket_id}",
                 headers=self.headers
             )
@@ -92,7 +186,7 @@ class ZammadAPIService:
                 'internal': True,
                 'sender': 'Agent'
             }
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/ticket_articles",
                 headers=self.headers,
                 json=data
@@ -106,7 +200,7 @@ class ZammadAPIService:
     def get_knowledge_base_init(self) -> Dict:
         """Initialiser et récupérer la structure KB"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/knowledge_bases/init",
                 headers=self.headers
             )
@@ -132,7 +226,7 @@ class ZammadAPIService:
                 ]
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/knowledge_bases/1/answers",  # ID de votre KB = 1
                 headers=self.headers,
                 json=data
@@ -143,7 +237,7 @@ class ZammadAPIService:
             
             # Rendre l'article interne si demandé
             if internal and result.get('id'):
-                requests.post(
+                self.session.post(
                     f"{self.base_url}/api/v1/knowledge_bases/1/answers/{result['id']}/internal",
                     headers=self.headers
                 )
@@ -160,7 +254,7 @@ class ZammadAPIService:
             from datetime import datetime
             data = {"internal_at": datetime.now().isoformat() + "Z"}
             
-            response = requests.patch(
+            response = self.session.patch(
                 f"{self.base_url}/api/v1/knowledge_bases/answers/{answer_id}",
                 headers=self.headers,
                 json=data
@@ -187,7 +281,7 @@ class ZammadAPIService:
                 ]
             }
             
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/v1/knowledge_bases/1/categories",
                 headers=self.headers,
                 json=data
@@ -1,39 +1,179 @@
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-from datetime import datetime
-from core.models import Ticket
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+import requests
+from core.models import SyncCursor, Ticket
 from .zammad_api import ZammadAPIService
+from .clients import get_zammad_api
 import logging
 
 logger = logging.getLogger(__name__)
 
+SYNC_CURSOR_NAME = 'zammad_tickets'
+# Champs rafraîchis sur les tickets déjà connus quand Zammad les a modifiés
+SYNC_UPDATED_FIELDS = ['title', 'status', 'customer_email', 'updated_at']
+
 class ZammadSyncService:
-    def __init__(self):
-        self.api = ZammadAPIService()
+    def __init__(self, api: ZammadAPIService = None):
+        self.api = api or get_zammad_api()
+        # Jobs de pré-analyse créés lors de la dernière synchronisation
+        self.pre_analysis_jobs: List[int] = []
+        # Tickets transférés par Zammad / tickets connus mis à jour lors de la dernière synchronisation
+        self.fetched_count = 0
+        self.updated_count = 0
     
-    def sync_new_tickets(self) -> int:
+    def sync_new_tickets(self, full: bool = False) -> int:
+        """Synchronisation incrémentale: seuls les tickets modifiés depuis le curseur
+        sont demandés à Zammad; `full` repart de zéro"""
         try:
-            tickets_data = self.api.get_tickets()
-            synced_count = 0
+            cursor, _ = SyncCursor.objects.get_or_create(name=SYNC_CURSOR_NAME)
+            if full:
+                cursor.last_updated_at = None
+            since = self._since(cursor)
+            new_tickets = []
+            self.fetched_count = self.updated_count = 0
+            self.pre_analysis_jobs = []
+            
+            logger.info(f"Synchronisation depuis {cursor.last_updated_at or 'le début'}")
             
-            logger.info(f"Received {len(tickets_data)} tickets from API")
+            try:
+                self._sync_search(cursor, new_tickets)
+                # Avec un curseur, la marge couvre au moins le dernier ticket traité: un résultat
+                # vide signale une recherche inutilisable (Zammad sans Elasticsearch)
+                search_failed = self.fetched_count == 0
+            except requests.HTTPError as e:
+                logger.warning(f"Recherche Zammad en erreur: {e}")
+                search_failed = True
+            if search_failed:
+                logger.warning("Recherche Zammad inutilisable, parcours complet de /tickets")
+                self._sync_listing(cursor, since, new_tickets)
             
-            for ticket_data in tickets_data:
-                state = str(ticket_data.get('state', '')).lower()
-                logger.info(f"Ticket {ticket_data.get('id')}: state={state}")
-                
-                if state in ['closed', 'fermé']:
-                    continue
-                    
-                if not Ticket.objects.filter(zammad_id=ticket_data['id']).exists():
-                    ticket = self._map_zammad_to_model(ticket_data)
-                    ticket.save()
-                    synced_count += 1
+            cursor.last_run_at = timezone.now()
+            cursor.last_fetched = self.fetched_count
+            cursor.save()
+            logger.info(
+                f"{self.fetched_count} tickets transférés, {len(new_tickets)} nouveaux, {self.updated_count} mis à jour"
+            )
             
-            return synced_count
+            if settings.SYNC_PRE_ANALYSIS_ENABLED and new_tickets:
+                self.pre_analysis_jobs = self.pre_analyze(new_tickets)
+            return len(new_tickets)
         except Exception as e:
             logger.error(f"Erreur sync: {e}")
             raise
     
+    def _sync_search(self, cursor: SyncCursor, new_tickets: List[Ticket]):
+        """Tickets modifiés via /tickets/search, triés par updated_at. La recherche ne donne
+        accès qu'à ZAMMAD_SEARCH_MAX_RESULTS résultats: au-delà, elle est relancée depuis le curseur"""
+        while True:
+            query = self._delta_query(cursor)
+            start = cursor.last_updated_at
+            fetched = 0
+            logger.info(f"Recherche Zammad: {query}")
+            for page in self.api.search_tickets(query, max_results=settings.ZAMMAD_SEARCH_MAX_RESULTS):
+                fetched += len(page)
+                self.fetched_count += len(page)
+                # Une transaction par page: les tickets et le curseur avancent ensemble (reprise sans perte)
+                with transaction.atomic():
+                    self._apply_page(page, new_tickets)
+                    self._advance_cursor(cursor, page)
+            if fetched < settings.ZAMMAD_SEARCH_MAX_RESULTS:
+                return
+            if cursor.last_updated_at == start:
+                logger.warning(
+                    f"Plus de {fetched} tickets modifiés dans la marge de {settings.ZAMMAD_SYNC_OVERLAP_SECONDS}s, "
+                    f"synchronisation partielle"
+                )
+                return
+            logger.info(f"Fenêtre de recherche atteinte ({fetched} tickets), reprise depuis le curseur")
+    
+    def _sync_listing(self, cursor: SyncCursor, since: Optional[datetime], new_tickets: List[Ticket]):
+        """Repli sans recherche: parcours de /tickets et filtrage local (tickets modifiés depuis
+        `since`, sinon états suivis). Les pages ne sont pas triées: le curseur n'avance qu'à la fin."""
+        latest = cursor.last_updated_at
+        for page in self.api.list_ticket_pages():
+            self.fetched_count += len(page)
+            if since:
+                page = [data for data in page
+                        if data.get('updated_at') and self._parse_datetime(data['updated_at']) >= since]
+            else:
+                page = [data for data in page if data.get('state_id') in settings.ZAMMAD_SYNC_STATE_IDS]
+            if not page:
+                continue
+            with transaction.atomic():
+                self._apply_page(page, new_tickets)
+            latest = max(filter(None, [latest, self._latest_update(page)]), default=None)
+        if latest != cursor.last_updated_at:
+            cursor.last_updated_at = latest
+            cursor.save(update_fields=['last_updated_at'])
+    
+    def _apply_page(self, page: List[Dict], new_tickets: List[Ticket]):
+        created, updated = self._upsert_page(page)
+        new_tickets.extend(created)
+        self.updated_count += updated
+    
+    def _upsert_page(self, page: List[Dict]) -> Tuple[List[Ticket], int]:
+        """Une requête pour les tickets connus de la page, puis bulk_create des nouveaux
+        et bulk_update de ceux modifiés depuis leur dernier enregistrement"""
+        incoming = {data['id']: self._map_zammad_to_model(data) for data in page}
+        known = {
+            zammad_id: (pk, updated_at)
+            for pk, zammad_id, updated_at in Ticket.objects.filter(zammad_id__in=incoming)
+            .values_list('id', 'zammad_id', 'updated_at')
+        }
+        
+        to_create, to_update = [], []
+        for zammad_id, ticket in incoming.items():
+            if zammad_id not in known:
+                # Les tickets déjà clos ne sont pas importés
+                if ticket.status != Ticket.Status.CLOSED:
+                    to_create.append(ticket)
+            elif ticket.updated_at > known[zammad_id][1]:
+                ticket.pk = known[zammad_id][0]
+                to_update.append(ticket)
+        
+        if to_create:
+            # update_conflicts: un ticket inséré entre-temps par une autre synchronisation est mis à jour
+            Ticket.objects.bulk_create(
+                to_create, update_conflicts=True, unique_fields=['zammad_id'], update_fields=SYNC_UPDATED_FIELDS
+            )
+        if to_update:
+            Ticket.objects.bulk_update(to_update, SYNC_UPDATED_FIELDS)
+        return to_create, len(to_update)
+    
+    def _since(self, cursor: SyncCursor) -> Optional[datetime]:
+        """Début de la fenêtre de synchronisation: curseur moins une marge pour le retard d'indexation"""
+        if not cursor.last_updated_at:
+            return None
+        return cursor.last_updated_at - timedelta(seconds=settings.ZAMMAD_SYNC_OVERLAP_SECONDS)
+    
+    def _delta_query(self, cursor: SyncCursor) -> str:
+        """Requête de recherche Zammad (syntaxe Elasticsearch): à la première exécution, tickets
+        des états suivis; ensuite, tous les tickets modifiés depuis le curseur (changements de
+        statut, clôtures comprises) moins la marge. Les tickets modifiés au même instant que le
+        curseur sont redemandés (bornes incluses), sans effet s'ils n'ont pas changé."""
+        since = self._since(cursor)
+        if since is None:
+            states = ' OR '.join(str(state_id) for state_id in settings.ZAMMAD_SYNC_STATE_IDS)
+            return f"state_id:({states})"
+        since = since.astimezone(dt_timezone.utc)
+        return f'updated_at:["{since.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]}Z" TO *]'
+    
+    def _latest_update(self, page: List[Dict]) -> Optional[datetime]:
+        return max(
+            (self._parse_datetime(data['updated_at']) for data in page if data.get('updated_at')),
+            default=None
+        )
+    
+    def _advance_cursor(self, cursor: SyncCursor, page: List[Dict]):
+        """Avance le curseur au plus grand updated_at de la page"""
+        latest = self._latest_update(page)
+        if latest and (cursor.last_updated_at is None or latest > cursor.last_updated_at):
+            cursor.last_updated_at = latest
+            cursor.save(update_fields=['last_updated_at'])
+    
     def _map_zammad_to_model(self, data: dict) -> Ticket:
         # Mapping des statuts Zammad vers Agent AI
         zammad_status = str(data.get('state', '')).lower()
@@ -49,17 +189,21 @@ class ZammadSyncService:
             'en attente de clôture': 'en_attente_de_cloture',
             'closed': 'cloture',
             'fermé': 'cloture',
-            'cloture': 'cloture'
+            'cloture': 'cloture',
+            'merged': 'cloture'
         }
         
         mapped_status = status_mapping.get(zammad_status, 'nouveau')
+        # Objet client, ou identifiant (souvent l'email) dans les résultats développés de la recherche
+        customer = data.get('customer') or {}
+        customer_email = customer.get('email', '') if isinstance(customer, dict) else str(customer)
         
         return Ticket(
             zammad_id=data['id'],
             title=data.get('title', ''),
             body=data.get('body', ''),
             status=mapped_status,  # Utiliser le statut mappé
-            customer_email=data.get('customer', {}).get('email', ''),
+            customer_email=customer_email if '@' in customer_email else '',
             created_at=self._parse_datetime(data.get('created_at')),
             updated_at=self._parse_datetime(data.get('updated_at'))
         )
@@ -70,6 +214,50 @@ class ZammadSyncService:
             return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
         return timezone.now()
     
+    def pre_analyze(self, tickets: List[Ticket], budget: int = None) -> List[int]:
+        """Confie les nouveaux tickets à l'analyse en arrière-plan, les plus urgents
+        d'abord, dans la limite de `budget` tickets par synchronisation.
+        Retourne les ids des jobs créés."""
+        from .analysis_jobs import AnalysisJobService
+        from .urgency import UrgencyScorer
+        
+        budget = settings.SYNC_PRE_ANALYSIS_BUDGET if budget is None else budget
+        scorer = UrgencyScorer()
+        ranked = sorted(tickets, key=lambda ticket: scorer.score(ticket)['score'], reverse=True)
+        
+        jobs = AnalysisJobService()
+        queued = []
+        for ticket in ranked[:budget]:
+            try:
+                job, created = jobs.enqueue(ticket.zammad_id, source='sync')
+                if created:
+                    queued.append(job.id)
+            except Exception as e:
+                logger.warning(f"Pré-analyse du ticket {ticket.zammad_id} non planifiée: {e}")
+        
+        if len(ranked) > budget:
+            logger.info(f"Pré-analyse: {len(ranked) - budget} tickets hors budget, analysés à l'ouverture")
+        logger.info(f"Pré-analyse: {len(queued)} tickets mis en file")
+        return queued
+    
+    def get_or_create_ticket(self, ticket_id: int) -> Ticket:
+        """Ticket local créé à partir de Zammad s'il n'existe pas encore"""
+        ticket_data = self.api.get_ticket_details(ticket_id)
+        articles = self.api.get_ticket_articles(ticket_id)
+        
+        ticket, created = Ticket.objects.get_or_create(
+            zammad_id=ticket_data['id'],
+            defaults={
+                'title': ticket_data['title'],
+                'body': articles[0]['body'] if articles else '',
+                'status': 'open',
+                'customer_email': '',
+                'created_at': timezone.now(),
+                'updated_at': timezone.now()
+            }
+        )
+        return ticket
+    
     def mark_ticket_processed(self, ticket_id: int):
         try:
             ticket = Ticket.objects.get(zammad_id=ticket_id)
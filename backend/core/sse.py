@@ -0,0 +1,44 @@
+# backend/core/sse.py
+"""
+Server-Sent Events: renderer DRF et mise en forme des événements
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Permet à la négociation de contenu DRF d'accepter `Accept: text/event-stream`"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Utilisé uniquement pour les réponses d'erreur (authentification, 404...)
+        return format_sse('error', data)
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Un événement SSE: `event:` puis `data:` en JSON sur une seule ligne"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events: Iterable[Dict[str, Any]]) -> StreamingHttpResponse:
+    """Réponse streaming à partir d'événements {'event': ..., 'data': ...}"""
+    def stream() -> Iterator[str]:
+        # Commentaire initial: ouvre le flux immédiatement côté navigateur et proxies
+        yield ": stream\n\n"
+        for item in events:
+            if item.get('event') is None:
+                # Maintien de la connexion pendant une attente sans événement
+                yield ": ping\n\n"
+                continue
+            yield format_sse(item['event'], item['data'])
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Désactive la mise en tampon de nginx pour que chaque événement parte immédiatement
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,100 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from .services.llm_json import LLMJSONError, extract_json, validate
+from .services.ticket_analyzer import _JSONStringFieldStream
+
+
+class ExtractJSONTests(SimpleTestCase):
+    def test_plain_object(self):
+        self.assertEqual(extract_json('{"a": 1}'), {'a': 1})
+
+    def test_markdown_fence_and_surrounding_text(self):
+        self.assertEqual(extract_json('```json\n{"a": 1}\n```'), {'a': 1})
+        self.assertEqual(extract_json('Voici le JSON: {"a": [1, 2]} merci'), {'a': [1, 2]})
+
+    def test_trailing_commas_and_python_literals(self):
+        self.assertEqual(
+            extract_json('Réponse: {"a": [1, 2,], "b": True, "c": False, "d": None,}'),
+            {'a': [1, 2], 'b': True, 'c': False, 'd': None}
+        )
+
+    def test_string_values_are_not_relaxed(self):
+        text = 'Réponse: {"a": "value with , } inside", "b": "x: True", "c": [1,]}'
+        self.assertEqual(extract_json(text), {'a': 'value with , } inside', 'b': 'x: True', 'c': [1]})
+
+    def test_escaped_quote_inside_string(self):
+        self.assertEqual(extract_json('Résultat {"a": "dit \\"ok, }\\"",}'), {'a': 'dit "ok, }"'})
+
+    def test_truncated_response_is_closed(self):
+        self.assertEqual(extract_json('{"a": {"b": ["x", "y'), {'a': {'b': ['x', 'y']}})
+        self.assertEqual(extract_json('{"a": 1, "b": [1, 2,'), {'a': 1, 'b': [1, 2]})
+
+    def test_typographic_quotes_as_delimiters(self):
+        self.assertEqual(extract_json('{“a”: “b”}'), {'a': 'b'})
+
+    def test_typographic_quotes_inside_valid_values_are_kept(self):
+        self.assertEqual(extract_json('Texte {"a": "le “bon” choix",}'), {'a': 'le “bon” choix'})
+
+    def test_empty_or_missing_json(self):
+        with self.assertRaises(LLMJSONError):
+            extract_json('   ')
+        with self.assertRaises(LLMJSONError) as context:
+            extract_json('aucun objet ici')
+        self.assertEqual(context.exception.fragment, 'aucun objet ici')
+
+    def test_unrepairable_fragment_is_reported(self):
+        with self.assertRaises(LLMJSONError) as context:
+            extract_json('avant {"a" 1} après')
+        self.assertEqual(context.exception.fragment, '{"a" 1}')
+
+
+class ValidateTests(SimpleTestCase):
+    def test_defaults_and_normalized_choices(self):
+        data, errors = validate({'intention': 'Aide', 'category': 'Technique', 'priority': 'HIGH'}, 'ticket_analysis')
+        self.assertEqual(errors, [])
+        self.assertEqual(data['category'], 'technique')
+        self.assertEqual(data['priority'], 'high')
+        self.assertEqual(data['priority_label'], 'Normal')
+        self.assertEqual(data['urgency_indicators'], [])
+
+    def test_value_outside_choices_uses_default(self):
+        data, errors = validate({'intention': 'x', 'category': 'inconnue', 'priority': 'low'}, 'ticket_analysis')
+        self.assertEqual(errors, [])
+        self.assertEqual(data['category'], 'technique')
+
+    def test_missing_or_mistyped_required_fields(self):
+        _, errors = validate({'category': 'autre', 'priority': 3}, 'ticket_analysis')
+        self.assertEqual(errors, ['intention manquant ou invalide', 'priority manquant ou invalide'])
+
+    def test_boolean_given_as_string(self):
+        data, errors = validate({'should_create': 'False'}, 'kb_article')
+        self.assertEqual(errors, [])
+        self.assertIs(data['should_create'], False)
+
+    def test_non_object(self):
+        data, errors = validate(['a'], 'ticket_reply')
+        self.assertEqual(data, {})
+        self.assertEqual(errors, ['objet JSON attendu, reçu list'])
+
+
+class JSONStringFieldStreamTests(SimpleTestCase):
+    def feed_all(self, chunks, field='response_text'):
+        stream = _JSONStringFieldStream(field)
+        return [stream.feed(chunk) for chunk in chunks]
+
+    def test_field_value_streamed_across_chunks(self):
+        parts = self.feed_all(['{"response_', 'text": "Bon', 'jour", "solution_steps": ["x"]}'])
+        self.assertEqual(parts, ['', 'Bon', 'jour'])
+
+    def test_escapes_split_between_chunks(self):
+        parts = self.feed_all(['{"response_text": "a\\', 'nb \\"c\\', '" \\u00', 'e9"}'])
+        self.assertEqual(''.join(parts), 'a\nb "c" é')
+
+    def test_stops_at_closing_quote(self):
+        stream = _JSONStringFieldStream('response_text')
+        self.assertEqual(stream.feed('{"response_text": "fin", "other": "'), 'fin')
+        self.assertEqual(stream.feed('pas relayé"}'), '')
+
+    def test_other_fields_ignored(self):
+        parts = self.feed_all(['{"intention": "x", "response_text" : ', '"ok"}'])
+        self.assertEqual(''.join(parts), 'ok')
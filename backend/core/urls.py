@@ -14,12 +14,19 @@ urlpatterns = [
     path('admin/users/<int:user_id>/toggle/', views.toggle_user_status, name='toggle_user_status'),
     path('admin/users/<int:user_id>/reset-password/', views.reset_password, name='reset_password'),
     path('admin/dashboard/stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('admin/llm/status/', views.llm_status, name='llm_status'),
+    path('admin/tickets/bulk-analysis/', views.start_bulk_analysis, name='start_bulk_analysis'),
+    path('admin/tickets/bulk-analysis/<int:job_id>/', views.bulk_analysis_status, name='bulk_analysis_status'),
+    path('admin/analysis/queue/', views.analysis_queue_stats, name='analysis_queue_stats'),
     path('tickets/sync/', views.sync_tickets, name='sync_tickets'),
     path('tickets/', views.list_tickets, name='list_tickets'),
     path('tickets/<int:ticket_id>/processed/', views.mark_ticket_processed, name='mark_processed'),
     path('tickets/<int:ticket_id>/', views.ticket_detail, name='ticket_detail'),
     path('tickets/<int:ticket_id>/internal-article/', views.create_internal_article, name='create_internal_article'),
     path('tickets/<int:ticket_id>/analyze/', views.analyze_ticket_from_zammad, name='analyze_ticket'),
+    path('tickets/<int:ticket_id>/analyze/stream/', views.analyze_ticket_stream, name='analyze_ticket_stream'),
+    path('analysis/jobs/<int:job_id>/', views.analysis_job_status, name='analysis_job_status'),
+    path('analysis/jobs/<int:job_id>/stream/', views.analysis_job_stream, name='analysis_job_stream'),
     path('analysis/<int:analysis_id>/update/', views.update_ai_response, name='update_ai_response'),
     path('analysis/<int:analysis_id>/validate/', views.validate_response, name='validate_response'),
     path('analysis/<int:analysis_id>/send/', views.send_to_zammad, name='send_to_zammad'),
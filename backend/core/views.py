@@ -1,4 +1,5 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -11,15 +12,27 @@ from .permissions import IsAdmin
 from .services.zammad_sync import ZammadSyncService
 from .models import User, Ticket
 from .serializers import LoginSerializer, UserSerializer, CreateUserSerializer, TicketSerializer
-from .services.zammad_api import ZammadAPIService
-from .services.ticket_analyzer import TicketAnalyzerService
-from django.utils import timezone
+from .services.clients import get_zammad_api
+from .services.ticket_analyzer import TicketAnalyzerService, current_analysis_result
+from django.conf import settings
 import logging
 import uuid
 import threading
 from .services.knowledge_base_service import KnowledgeBaseService
 from .models import ClientLocation
 from .services.ai_lead_generator import AILeadGenerator
+from .services.circuit_breaker import get_llm_circuit_breaker
+from .services.rate_limiter import get_llm_rate_limiter
+from .services.llm_cache import LLMResponseCache
+from .services.llm_client import get_llm_single_flight
+from .services.llm_usage import LLMUsageTracker
+from .services.llm_json import StructuredOutputStats
+from .services.triage_classifier import TriageStats
+from .services.answer_cache import AnswerCacheStats
+from .services.bulk_analysis import BulkAnalysisConflict, BulkAnalysisService
+from .services.analysis_jobs import AnalysisJobService
+from .models import AnalysisJob, BulkAnalysisJob
+from .sse import EventStreamRenderer, sse_response
 
 
 
@@ -118,14 +131,14 @@ def reset_password(request, user_id):
 @permission_classes([IsAuthenticated])
 def sync_tickets(request):
     sync_service = ZammadSyncService()
-    count = sync_service.sync_new_tickets()
-    return Response({'synced': count})
+    count = sync_service.sync_new_tickets(full=_flag_requested(request, 'full'))
+    return Response({'synced': count, 'updated': sync_service.updated_count, 'fetched': sync_service.fetched_count})
 
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Changé de IsAuthenticated à AllowAny
 def list_tickets(request):
-    api = ZammadAPIService()
-    tickets = api.get_tickets()
+    api = get_zammad_api()
+    tickets = list(api.get_tickets())
     return Response(tickets)
 
 
@@ -147,7 +160,7 @@ def analyze_ticket(request, ticket_id):
     try:
         ticket = Ticket.objects.get(zammad_id=ticket_id)
         analyzer = TicketAnalyzerService()
-        result = analyzer.analyze_ticket(ticket)
+        result = analyzer.analyze_ticket(ticket, force=_force_requested(request))
         
         if result['success']:
             return Response({
@@ -191,7 +204,7 @@ from .serializers import TicketAnalysisSerializer
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Changé de IsAuthenticated à AllowAny
 def ticket_detail(request, ticket_id):
-    api = ZammadAPIService()
+    api = get_zammad_api()
     ticket = api.get_ticket_details(ticket_id)
     articles = api.get_ticket_articles(ticket_id)
     return Response({
@@ -203,7 +216,11 @@ def ticket_detail(request, ticket_id):
 def update_ai_response(request, analysis_id):
     try:
         analysis = TicketAnalysis.objects.get(id=analysis_id)
-        analysis.ai_response = request.data.get('ai_response', analysis.ai_response)
+        ai_response = request.data.get('ai_response', analysis.ai_response)
+        if ai_response != analysis.ai_response:
+            # Réponse modifiée: à valider de nouveau avant d'être publiée ou réutilisée
+            analysis.published = False
+        analysis.ai_response = ai_response
         analysis.save()
         return Response(TicketAnalysisSerializer(analysis).data)
     except TicketAnalysis.DoesNotExist:
@@ -233,51 +250,114 @@ def send_to_zammad(request, analysis_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def ticket_detail(request, ticket_id):
-    api = ZammadAPIService()
+    api = get_zammad_api()
     ticket = api.get_ticket_details(ticket_id)
     articles = api.get_ticket_articles(ticket_id)
+    
+    # Analyse déjà calculée (pré-analyse après sync ou analyse précédente): servie sans appel LLM,
+    # avec la réponse éventuellement modifiée par un agent
+    analysis_obj = TicketAnalysis.objects.filter(ticket__zammad_id=ticket_id).first()
+    stored = current_analysis_result(analysis_obj) if analysis_obj else None
+    pending_job = AnalysisJobService.active_job(ticket_id)
     return Response({
         'ticket': ticket,
-        'articles': articles
+        'articles': articles,
+        'analysis': stored or None,
+        'analysis_job': AnalysisJobService.serialize(pending_job, include_result=False) if pending_job else None
     })
 
+def _flag_requested(request, name, default=False):
+    """Paramètre booléen en query string ou dans le corps ("false" et "0" valent False)"""
+    value = request.query_params.get(name, request.data.get(name, default))
+    return str(value).lower() in ('1', 'true', 'yes')
+
+def _force_requested(request):
+    """Paramètre `force`: réanalyse même si le ticket n'a pas changé"""
+    return _flag_requested(request, 'force')
+
+def _get_or_create_ticket_from_zammad(ticket_id):
+    """Ticket local créé à partir de Zammad s'il n'existe pas encore"""
+    return ZammadSyncService().get_or_create_ticket(ticket_id)
+
 @api_view(['GET', 'POST'])  # Ajouté GET
 @permission_classes([AllowAny])  # Changé de IsAuthenticated à AllowAny
 def analyze_ticket_from_zammad(request, ticket_id):
+    """Analyse du ticket; avec `async`, le travail est mis en file et l'endpoint
+    répond immédiatement (202) avec l'id du job à suivre"""
+    if _flag_requested(request, 'async'):
+        try:
+            job, created = AnalysisJobService().enqueue(
+                ticket_id, force=_force_requested(request), user=request.user
+            )
+            return Response({
+                **AnalysisJobService.serialize(job, include_result=False),
+                'created': created,
+                'poll_url': f'/api/analysis/jobs/{job.id}/',
+                'stream_url': f'/api/analysis/jobs/{job.id}/stream/'
+            }, status=202)
+        except Exception as e:
+            return Response({'error': str(e)}, status=400)
+    
     try:
         # Get ticket from Zammad
-        api = ZammadAPIService()
-        ticket_data = api.get_ticket_details(ticket_id)
-        articles = api.get_ticket_articles(ticket_id)
-        
-        # Create or get ticket in database
-        ticket, created = Ticket.objects.get_or_create(
-            zammad_id=ticket_data['id'],
-            defaults={
-                'title': ticket_data['title'],
-                'body': articles[0]['body'] if articles else '',
-                'status': 'open',
-                'customer_email': '',
-                'created_at': timezone.now(),
-                'updated_at': timezone.now()
-            }
-        )
+        ticket = _get_or_create_ticket_from_zammad(ticket_id)
         
         # Analyze with AI
-        from .services.ticket_analyzer import TicketAnalyzerService
         analyzer = TicketAnalyzerService()
-        result = analyzer.analyze_ticket(ticket)
+        result = analyzer.analyze_ticket(ticket, force=_force_requested(request))
         
         return Response(result)  # Retourner directement result
             
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def analyze_ticket_stream(request, ticket_id):
+    """Analyse en Server-Sent Events: analysis, response_delta, response, kb_suggestion, done"""
+    try:
+        ticket = _get_or_create_ticket_from_zammad(ticket_id)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+    
+    analyzer = TicketAnalyzerService()
+    return sse_response(analyzer.analyze_ticket_stream(ticket, force=_force_requested(request)))
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def analysis_job_status(request, job_id):
+    """État d'un job d'analyse, avec le résultat une fois terminé"""
+    try:
+        job = AnalysisJob.objects.get(id=job_id)
+        return Response(AnalysisJobService.serialize(job))
+    except AnalysisJob.DoesNotExist:
+        return Response({'error': 'Job non trouvé'}, status=404)
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def analysis_queue_stats(request):
+    """File des analyses en arrière-plan et temps d'attente par priorité attendue"""
+    try:
+        return Response(AnalysisJobService.queue_stats(hours=int(request.query_params.get('hours', 24))))
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def analysis_job_stream(request, job_id):
+    """Suivi d'un job en Server-Sent Events: status, puis done (résultat) ou error.
+    Flux de durée limitée: sur 'poll', le client continue par analysis_job_status"""
+    if not AnalysisJob.objects.filter(id=job_id).exists():
+        return Response({'error': 'Job non trouvé'}, status=404)
+    return sse_response(AnalysisJobService().events(job_id, poll_url=f'/api/analysis/jobs/{job_id}/'))
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_internal_article(request, ticket_id):
     try:
-        api = ZammadAPIService()
+        api = get_zammad_api()
         subject = request.data.get('subject', 'Note d\'analyse IA')
         body = request.data.get('body', '')
         
@@ -564,6 +644,78 @@ def dashboard_stats(request):
         return Response({'error': str(e)}, status=400)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def llm_status(request):
+    """État du fournisseur LLM: disjoncteur, limiteur de débit, cache et consommation"""
+    try:
+        breaker = get_llm_circuit_breaker()
+        return Response({
+            'circuit_breaker': breaker.snapshot(),
+            'rate_limiter': get_llm_rate_limiter().snapshot(),
+            'cache': LLMResponseCache.stats(),
+            'coalescing': get_llm_single_flight().snapshot(),
+            'structured_output': StructuredOutputStats.snapshot(),
+            'triage_classifier': TriageStats.snapshot(),
+            'answer_cache': AnswerCacheStats.snapshot(),
+            'usage': LLMUsageTracker().summary(hours=int(request.query_params.get('hours', 24))),
+            'task_routes': settings.LLM_TASK_ROUTES,
+        })
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def start_bulk_analysis(request):
+    """Lance (ou reprend avec `resume`) l'analyse en masse des tickets en arrière-plan"""
+    try:
+        service = BulkAnalysisService()
+        resume_id = request.data.get('resume')
+        if resume_id:
+            job = service.resumable_job(int(resume_id))
+            if job is None:
+                return Response({'error': 'Job non trouvé, terminé ou en cours'}, status=404)
+        else:
+            limit = request.data.get('limit')
+            job = service.create_job(
+                workers=int(request.data.get('workers') or 0) or None,
+                batch_size=int(request.data.get('batch_size') or 0) or None,
+                limit=int(limit) if limit else None,
+                include_stale=_flag_requested(request, 'include_stale', default=True),
+                reanalyze_all=_flag_requested(request, 'reanalyze_all'),
+                user=request.user,
+            )
+
+        thread = threading.Thread(target=service.run, args=(job,))
+        thread.daemon = True
+        thread.start()
+
+        return Response({
+            'job_id': job.id,
+            'message': 'Analyse en masse lancée',
+            'status': 'running',
+            'total': job.total
+        })
+    except BulkAnalysisConflict as e:
+        return Response({'error': str(e), 'job_id': e.job.id if e.job else None}, status=409)
+    except (TypeError, ValueError) as e:
+        return Response({'error': f'Paramètre invalide: {e}'}, status=400)
+    except Exception as e:
+        return Response({'error': str(e)}, status=400)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def bulk_analysis_status(request, job_id):
+    """Progression et débit d'un job d'analyse en masse"""
+    try:
+        job = BulkAnalysisJob.objects.get(id=job_id)
+        return Response(BulkAnalysisService.serialize(job))
+    except BulkAnalysisJob.DoesNotExist:
+        return Response({'error': 'Job non trouvé'}, status=404)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_knowledge_article(request):
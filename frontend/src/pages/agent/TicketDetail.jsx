@@ -15,12 +15,53 @@ const TicketDetail = () => {
 
   useEffect(() => {
     api.get(`/tickets/${id}/`)
-      .then((res) => setData(res.data))
+      .then((res) => {
+        setData(res.data);
+        // Analyse déjà calculée (pré-analyse après synchronisation): affichée sans relancer le LLM
+        if (res.data.analysis?.analysis) {
+          setAnalysis(res.data.analysis.analysis);
+          setKbSuggestion(res.data.analysis.kb_suggestion || null);
+        }
+      })
       .catch((err) => console.error("Error fetching ticket:", err));
   }, [id]);
 
   const analyzeTicket = async () => {
     setLoading(true);
+    if (window.EventSource) {
+      // Streaming: classification, puis texte de la réponse au fil de l'eau, puis suggestion KB
+      const source = new EventSource(`${import.meta.env.VITE_API_BASE_URL}/tickets/${id}/analyze/stream/`);
+      const finish = () => {
+        source.close();
+        setLoading(false);
+      };
+      source.addEventListener("analysis", (e) => {
+        setAnalysis({ ...JSON.parse(e.data), ai_response: { response: "", solution: [] } });
+      });
+      source.addEventListener("response_delta", (e) => {
+        const { text } = JSON.parse(e.data);
+        setAnalysis((prev) => prev && {
+          ...prev,
+          ai_response: { ...prev.ai_response, response: prev.ai_response.response + text },
+        });
+      });
+      source.addEventListener("response", (e) => {
+        const aiResponse = JSON.parse(e.data);
+        setAnalysis((prev) => prev && { ...prev, ai_response: aiResponse });
+      });
+      source.addEventListener("kb_suggestion", (e) => setKbSuggestion(JSON.parse(e.data)));
+      source.addEventListener("done", (e) => {
+        setAnalysis(JSON.parse(e.data).analysis);
+        notify.success("Analyse terminée avec succès !");
+        finish();
+      });
+      source.addEventListener("error", (e) => {
+        notify.error("Erreur lors de l'analyse du ticket");
+        console.error("Error analyzing ticket:", e.data || e);
+        finish();
+      });
+      return;
+    }
     try {
       const response = await api.post(`/tickets/${id}/analyze/`);
       setAnalysis(response.data.analysis);